@@ -0,0 +1,167 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import os
+import re
+import json
+from datetime import datetime
+from periodic_runner_main import INTRADAY_FILES as Intraday_data_files
+
+# Index of the artifacts written by periodic_runner_main.py and returns_main.py (plots, stats, latest custom days
+# csvs, raw and processed parquets), so the dashboard doesn't scan and parse the folders on every rerun.
+folder_input_pq = Intraday_data_files+'_pq'
+folder_processed_pq = Intraday_data_files+'_processed_folder_pq'
+folder_stats_and_plots = Intraday_data_files+'_stats_and_plots_folder'
+catalog_folders = (folder_stats_and_plots, folder_processed_pq, folder_input_pq)
+catalog_path = Intraday_data_files+'_catalog.json'
+
+raw_pattern = re.compile(r"Intraday_data_([^_]+)_([^_]+)_(\d{4}-\d{2}-\d{2})_to_(\d{4}-\d{2}-\d{2})\.parquet")
+processed_pattern = re.compile(r"([^_]+)_([^_]+?)(_filtered_dates)?_(events_tagged_target_tz_nonevents|events_tagged_target_tz|session_bars)\.parquet")
+processed_kinds = {'events_tagged_target_tz':'events_tagged',
+                   'events_tagged_target_tz_nonevents':'nonevents',
+                   'session_bars':'session_bars'}
+
+def _parquet_time_range(path):
+    # min/max of the first column (the timestamp/date column of the processed parquets) from the row group
+    # statistics, without reading the data.
+    try:
+        parquet_file=pq.ParquetFile(path)
+    except Exception:
+        return (None,None)
+    field_type=parquet_file.schema_arrow.field(0).type
+    if not (pa.types.is_timestamp(field_type) or pa.types.is_date(field_type)):
+        return (None,None)
+    mins,maxs=[],[]
+    for row_group in range(parquet_file.metadata.num_row_groups):
+        stats=parquet_file.metadata.row_group(row_group).column(0).statistics
+        if stats is None or not stats.has_min_max:
+            return (None,None)
+        mins.append(stats.min)
+        maxs.append(stats.max)
+    if not mins:
+        return (None,None)
+    return (str(min(mins)),str(max(maxs)))
+
+def _csv_date_range(path):
+    # The latest custom days csvs start with their Date column.
+    try:
+        dates=pd.read_csv(path,usecols=[0]).iloc[:,0]
+    except Exception:
+        return (None,None)
+    if dates.empty:
+        return (None,None)
+    return (str(dates.min()),str(dates.max()))
+
+def parse_artifact(folder,name):
+    """
+    Catalog entry of an artifact file from its name, or None if the file is not a known artifact.
+
+    Returns:
+        dict: name, path, kind, ticker, interval, return_type, session, filtered_dates, start, end and mtime.
+    """
+    path=os.path.join(folder,name)
+    artifact={'name':name,'path':path,'kind':None,'ticker':None,'interval':None,
+              'return_type':None,'session':None,'filtered_dates':False,'start':None,'end':None}
+
+    if folder==folder_stats_and_plots:
+        content=name.split('_')
+        if name.endswith('.png'):
+            # {ticker}_{interval}_{Returns|Volatility}_Distribution.png
+            artifact.update(kind='plot',ticker=content[0],interval=content[1],return_type=content[2])
+        elif name.endswith('_Distribution.json'):
+            # histogram/KDE data of the same plot, drawn by the dashboard
+            artifact.update(kind='chart_data',ticker=content[0],interval=content[1],return_type=content[2])
+        elif name.endswith('_ecdf_index.parquet'):
+            # sorted session samples of the same plot, for percentile lookups
+            artifact.update(kind='ecdf_index',ticker=content[0],interval=content[1],return_type=content[2])
+        elif name.endswith('.csv') and 'latest_custom_days' in name:
+            # {session}_latest_custom_days_Volatility_Returns_{interval}_{ticker}[_stats].csv
+            if name.endswith('_stats.csv'):
+                content=content[:-1]
+                artifact['kind']='latest_custom_days_stats'
+            else:
+                artifact['kind']='latest_custom_days'
+                (artifact['start'],artifact['end'])=_csv_date_range(path)
+            artifact.update(ticker=content[-1].replace('.csv',''),interval=content[-2],return_type=content[-4],
+                            session=" ".join(content[0:-7]))
+        elif name.endswith('_stats.csv'):
+            # {ticker}_{interval}_{Returns|Volatility_Returns}_stats.csv
+            artifact.update(kind='stats',ticker=content[0],interval=content[1],return_type=content[2])
+        else:
+            return None
+
+    elif folder==folder_input_pq:
+        match=raw_pattern.fullmatch(name)
+        if not match:
+            return None
+        artifact.update(kind='raw',ticker=match.group(1),interval=match.group(2),
+                        start=match.group(3),end=match.group(4))
+
+    else:
+        if name=='events_store.parquet':
+            artifact['kind']='events_store'
+        elif name=='event_study_cube.parquet':
+            artifact['kind']='event_study_cube'
+        else:
+            match=processed_pattern.fullmatch(name)
+            if not match:
+                return None
+            artifact.update(kind=processed_kinds[match.group(4)],ticker=match.group(1),interval=match.group(2),
+                            filtered_dates=bool(match.group(3)))
+        (artifact['start'],artifact['end'])=_parquet_time_range(path)
+
+    artifact['mtime']=os.path.getmtime(path)
+    return artifact
+
+def build_catalog(catalog_path=catalog_path,folders=catalog_folders,write=True):
+    """
+    Scans the artifact folders and (if write) saves the catalog as json.
+
+    Returns:
+        list: Catalog entries, see parse_artifact.
+    """
+    artifacts=[]
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            if os.path.isfile(os.path.join(folder,name)):
+                artifact=parse_artifact(folder,name)
+                if artifact is not None:
+                    artifacts.append(artifact)
+    if write:
+        with open(catalog_path,'w') as f:
+            json.dump({'generated':datetime.now().isoformat(timespec='seconds'),
+                       'folders':list(folders),'artifacts':artifacts},f,indent=1)
+        print(f"Artifact catalog saved at: {catalog_path} ({len(artifacts)} artifacts)")
+    return artifacts
+
+def catalog_version(catalog_path=catalog_path,folders=catalog_folders):
+    # Changes when the catalog is rewritten or files are added/removed in the folders. Used as cache key.
+    return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in (catalog_path,)+tuple(folders))
+
+def load_catalog(catalog_path=catalog_path,folders=catalog_folders):
+    """
+    Loads the catalog written by returns_main.py. If it is missing or the folders hold other files than the ones
+    catalogued (e.g. new raw data fetched since), the folders are scanned again in memory.
+
+    Returns:
+        list: Catalog entries, see parse_artifact.
+    """
+    if os.path.exists(catalog_path):
+        with open(catalog_path) as f:
+            catalog=json.load(f)
+        catalogued={(os.path.dirname(artifact['path']),artifact['name']) for artifact in catalog['artifacts']}
+        current=set()
+        for folder in folders:
+            if os.path.isdir(folder):
+                current.update((folder,name) for name in os.listdir(folder))
+        if list(folders)==catalog['folders'] and catalogued<=current and \
+                all(parse_artifact(folder,name) is None for (folder,name) in current-catalogued):
+            return catalog['artifacts']
+    print("Artifact catalog missing or stale, scanning the folders.")
+    return build_catalog(catalog_path,folders,write=False)
+
+def find_artifacts(catalog,**criteria):
+    # Catalog entries matching all the given fields, e.g. find_artifacts(catalog,kind='raw',ticker='ZN').
+    return [artifact for artifact in catalog if all(artifact.get(key)==value for key,value in criteria.items())]
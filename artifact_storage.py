@@ -0,0 +1,150 @@
+import pandas as pd
+import requests
+import os
+import json
+import threading
+from io import BytesIO
+from collections import OrderedDict
+
+# Where the dashboard reads the plots/stats from. 'local' (default) serves the files of the repo checkout,
+# 'remote' fetches them from remote_base_url (GitHub raw) and is only needed when the app runs without the files.
+default_backend = 'local'
+remote_base_url = "https://raw.githubusercontent.com/krishangguptafibonacciresearch/DistributionProject/main/"
+default_cache_bytes = 256 * 1024**2
+
+
+class LocalStorage:
+    """
+    Serves artifacts from the local checkout. Paths are relative to base_folder (the repo root).
+    """
+    def __init__(self,base_folder='.'):
+        self.base_folder=base_folder
+
+    def locate(self,path):
+        return os.path.join(self.base_folder,path)
+
+    def version(self,path):
+        # mtime: a file rewritten by returns_main.py gets a new cache key
+        try:
+            return os.stat(self.locate(path)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def read_bytes(self,path):
+        # Plain read instead of a memory map: returns_main.py rewrites the files in place, which would
+        # invalidate a mapping held by the cache.
+        with open(self.locate(path),'rb') as f:
+            return f.read()
+
+
+class RemoteStorage:
+    """
+    Serves artifacts over http(s) from base_url + path (e.g. GitHub raw). Opt-in, for deployments without the files.
+    """
+    def __init__(self,base_url=remote_base_url,timeout=10):
+        self.base_url=base_url
+        self.timeout=timeout
+
+    def locate(self,path):
+        return self.base_url+path.replace(os.sep,'/')
+
+    def version(self,path):
+        # No cheap freshness check: cached until evicted (the dashboard recreates the storage per catalog version).
+        return None
+
+    def read_bytes(self,path):
+        response=requests.get(self.locate(path),timeout=self.timeout)
+        if response.status_code==404:
+            raise FileNotFoundError(self.locate(path))
+        response.raise_for_status()
+        return response.content
+
+
+class LRUCache:
+    """
+    Least recently used cache bounded by the total size in bytes of its values. Thread safe (Streamlit
+    sessions run in threads).
+    """
+    def __init__(self,max_bytes=default_cache_bytes):
+        self.max_bytes=max_bytes
+        self.total_bytes=0
+        self._items=OrderedDict()   # key -> (value, size)
+        self._lock=threading.Lock()
+
+    def get(self,key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self,key,value,size):
+        with self._lock:
+            if key in self._items:
+                self.total_bytes-=self._items.pop(key)[1]
+            if size>self.max_bytes:
+                return   # larger than the whole cache: served but not kept
+            self._items[key]=(value,size)
+            self.total_bytes+=size
+            while self.total_bytes>self.max_bytes:
+                (_,(_,evicted_size))=self._items.popitem(last=False)
+                self.total_bytes-=evicted_size
+
+    def __len__(self):
+        return len(self._items)
+
+
+class ArtifactStore:
+    """
+    Reads the dashboard artifacts through a storage backend and keeps the decoded results (csv -> DataFrame,
+    image -> png bytes, json -> chart data) in a byte bounded LRU cache, keyed on (path, version).
+
+    Args:
+        backend (LocalStorage or RemoteStorage): Where the artifacts are read from.
+        max_bytes (int): Size of the cache in bytes.
+    """
+    def __init__(self,backend,max_bytes=default_cache_bytes):
+        self.backend=backend
+        self.cache=LRUCache(max_bytes)
+
+    def _get(self,kind,path,load,size):
+        key=(kind,path,self.backend.version(path))
+        value=self.cache.get(key)
+        if value is None:
+            value=load(path)
+            self.cache.put(key,value,size(value))
+        return value
+
+    def read_bytes(self,path):
+        return self._get('bytes',path,self.backend.read_bytes,len)
+
+    def read_image(self,path):
+        # The plots are saved as png already: served as is, no decoding/re-encoding.
+        return self.read_bytes(path)
+
+    def read_json(self,path):
+        # Shared, not copied: treat as read only. Sized by its file size.
+        def load(p):
+            raw=self.backend.read_bytes(p)
+            return (json.loads(raw),len(raw))
+        return self._get('json',path,load,lambda loaded: loaded[1])[0]
+
+    def read_csv(self,path,**kwargs):
+        # Returns a copy, the callers modify the frames.
+        df=self._get(('csv',tuple(sorted(kwargs.items()))),path,
+                     lambda p: pd.read_csv(BytesIO(self.backend.read_bytes(p)),**kwargs),
+                     lambda df: int(df.memory_usage(index=True,deep=True).sum()))
+        return df.copy()
+
+
+def get_artifact_store(backend=None,max_bytes=default_cache_bytes,**kwargs):
+    """
+    Artifact store for the given backend name ('local' or 'remote'). Default: the ARTIFACT_STORAGE environment
+    variable, else 'local'.
+    """
+    backend=backend or os.environ.get('ARTIFACT_STORAGE',default_backend)
+    if backend=='local':
+        return ArtifactStore(LocalStorage(**kwargs),max_bytes)
+    elif backend=='remote':
+        return ArtifactStore(RemoteStorage(**kwargs),max_bytes)
+    raise ValueError(f"Unknown artifact storage backend: {backend}. Choose 'local' or 'remote'.")
@@ -2,10 +2,12 @@
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import seaborn as sns
-import os
+import density_estimation
+import dataset_registry
+from streaming_stats import DistributionSummary
 from returns import Returns
 from returns_main import ticker_match_tuple
+from session_windows import SessionWindows
 
 def _calculate_return_bps(group):
         return (group["Close"].iloc[-1]-group["Open"].iloc[0]) * 16
@@ -38,13 +40,12 @@ def movement(movement_type, df):
     return df.reset_index(drop=True)
 
      
-def get_dataframe(interval,ticker_name,folder):
-    for file in os.scandir(folder):
-       if file.is_file():
-          if all(x in str(file.name) for x in [interval, ticker_name]) and file.name.endswith('.csv'):
-              df=pd.read_csv(os.path.join(folder,file.name))
-              print('Mydf:',df)
-              break
+def get_dataframe(interval,ticker_name,folder=None,columns=None,start=None,end=None):
+    # Raw bars of the ticker/interval (see dataset_registry.load), with the Datetime index as first column.
+    folders=dataset_registry.default_folders if folder is None else (folder,)
+    df=dataset_registry.load(ticker_name,interval,'raw',columns=columns,start=start,end=end,folders=folders)
+    df=df.reset_index()
+    print('Mydf:',df)
     return df
 
 def filter_dataframe(pre_df,filter_list="",day_dict="",timezone_column="",target_timezone="",interval="",ticker=""):
@@ -56,41 +57,20 @@ def filter_dataframe(pre_df,filter_list="",day_dict="",timezone_column="",target
         pre_df['Day']=pre_df['US/Eastern Timezone'].dt.day_name()
     
 
-    finaldf = []
     if filter_list:
-        pre_df['Group']="Not Allotted"
-
-        for se in filter_list:
-            start=se[0]
-            start_day=se[2]
-            next_time=se[1]
-            if next_time<=0:
-                next_time=1
-
-            ET_col=pre_df.columns[-3]
-            
-            unit = 'hours' if 'h' in interval else 'minutes' if 'm' in interval else None
-            condition = pre_df[ET_col].dt.hour == start if 'h' in interval else pre_df[ET_col].dt.minute == start
-            if start_day:
-                condition &= pre_df[ET_col].dt.day_name() == start_day
-            
-            start_times = pre_df[condition][ET_col]
-            if unit is not None: # interval is 'h' or 'm'
-                for index, time in enumerate(start_times):
-                    time_delta = pd.Timedelta(**{unit: next_time})
-                    current_df = pre_df[(pre_df[ET_col] >= time) & (pre_df[ET_col] < time + time_delta)]
-                    current_df.loc[:, 'Group'] = index
-                    finaldf.append(current_df)
-            else: # interval is 'd'
-                pre_df['Group']=pre_df.index
-                return pre_df.reset_index(drop=True)
-
-        
-        pre_df=pd.concat(finaldf)
-        pre_df=pre_df[pre_df['Group']!="Not Allotted"]
-        pre_df.drop_duplicates(inplace=True)
+        # filter_list: (start, next_time, start_day) sessions. start: hour (9) or 'HH:MM' ('09:30'), next_time:
+        # hours/minutes (as the interval) after the start, start_day: day name or "" for any day.
+        ET_col=pre_df.columns[-2]
+        unit = 'hours' if 'h' in interval else 'minutes' if 'm' in interval else None
+        if unit is None: # interval is 'd'
+            pre_df['Group']=pre_df.index
+            return pre_df.reset_index(drop=True)
+
+        sessions=[(start, pd.Timedelta(**{unit: max(next_time,1)}), start_day) for start,next_time,start_day in filter_list]
+        rows,groups=SessionWindows(pre_df[ET_col]).get_positions(sessions)
+        pre_df=pre_df.iloc[rows].assign(Group=groups)
         pre_df.reset_index(drop=True,inplace=True)
-        
+
     else:
         pre_df['Group']=pre_df.index
         print(pre_df)
@@ -117,12 +97,13 @@ def calculate_stats_and_plots(df,name,version,check_movement,interval,ticker,tar
     
     # Calculate statistics for given scenario
     my_pctiles=[0.1,0.25,0.5,0.75,0.9,0.95,0.99]
-    returns_stats=returns[name].describe(percentiles=my_pctiles)
+    returns_summary=DistributionSummary.from_values(returns[name])
+    returns_stats=returns_summary.describe(my_pctiles,name=name)
     print(returns_stats)
     current_bps=check_movement
-    percentile=(returns[name] <= current_bps).mean() * 100
+    percentile=returns_summary.ecdf.percentile(current_bps)
     percentile=round(percentile,2)
-    zscore= (current_bps-returns[name].mean())/returns[name].std()
+    zscore=returns_summary.ecdf.zscore(current_bps)
     zscore=round(zscore,2)
     print(f'Z Score for bps<={current_bps}: {zscore}')
     print(f'Prob bps<={round(current_bps,2)}: {percentile}%ile')
@@ -130,7 +111,9 @@ def calculate_stats_and_plots(df,name,version,check_movement,interval,ticker,tar
 
     # Plot the return probability along with ZScore
     plt.figure(figsize=(10, 6))
-    sns.kdeplot(data=returns, x=f"{name}",cumulative=True,fill=True,color='blue')
+    grid,_,cdf=density_estimation.get_kde(returns[name])
+    plt.plot(grid,cdf,color='blue')
+    plt.fill_between(grid,cdf,color='blue',alpha=0.25)
 
     plt.title(f'{name}', fontdict={'fontsize': 8, 'fontweight': 'bold'})# 'fontname': 'Arial'})
     plt.xlabel('Return(bps)')
@@ -201,6 +184,6 @@ def calculate_stats_and_plots(df,name,version,check_movement,interval,ticker,tar
     return custom_dic
 
 if __name__=='__main__':
-    df=(filter_dataframe(get_dataframe(interval='1h',ticker_name='ZN',folder='Intraday_data_files'),timezone_column='US/Eastern Timezone',target_timezone='US/Eastern'))
+    df=(filter_dataframe(get_dataframe(interval='1h',ticker_name='ZN'),timezone_column='US/Eastern Timezone',target_timezone='US/Eastern'))
     calculate_stats_and_plots(df=df,name='testing',version='No-Version',check_movement=1,interval='1h',ticker='ZN',target_column=
                               df.columns[-3])
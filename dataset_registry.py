@@ -0,0 +1,162 @@
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from artifact_storage import LRUCache
+from artifact_catalog import raw_pattern, processed_pattern, processed_kinds, folder_input_pq, folder_processed_pq
+
+# Registry of the bar datasets of the pipeline: the raw parquets of periodic_runner_main.py
+# (Intraday_data_{ticker}_{interval}_{start}_to_{end}.parquet) and the processed parquets of returns_main.py
+# ({ticker}_{interval}[_filtered_dates]_{suffix}.parquet), looked up by (ticker, interval, stage) from their parsed
+# file names instead of substring matches on the folder listing ('1m' in '15m'...). load reads only the requested
+# columns and, through the parquet row group statistics, only the row groups of the requested date range. The
+# loaded frames are memoized in process, keyed on the file mtime, so a rewritten file is read again.
+stage_time_columns = {'raw': 'Datetime',
+                      'events_tagged': 'timestamp',
+                      'nonevents': 'timestamp',
+                      'session_bars': 'date'}
+default_folders = (folder_input_pq, folder_processed_pq)
+default_cache_bytes = 512 * 1024**2
+row_group_size = 50_000     # rows per row group of the processed parquets, the unit of the date range pushdown
+
+def parse_dataset_name(name):
+    """
+    Dataset entry of a parquet from its name, or None if the file is not a bar dataset.
+
+    Returns:
+        dict: name, ticker, interval, stage (see stage_time_columns), filtered_dates, start and end (raw files).
+    """
+    match = raw_pattern.fullmatch(name)
+    if match:
+        return {'name': name, 'ticker': match.group(1), 'interval': match.group(2), 'stage': 'raw',
+                'filtered_dates': False, 'start': match.group(3), 'end': match.group(4)}
+    match = processed_pattern.fullmatch(name)
+    if match:
+        return {'name': name, 'ticker': match.group(1), 'interval': match.group(2),
+                'stage': processed_kinds[match.group(4)], 'filtered_dates': bool(match.group(3)),
+                'start': None, 'end': None}
+    return None
+
+def _to_bound(value, field_type):
+    # Date range bound comparable with the time column: tz-aware bounds are converted to the column timezone
+    # (and made naive for naive columns, which hold wall times), naive bounds are taken in the column timezone.
+    value = pd.Timestamp(value)
+    if pa.types.is_date(field_type):
+        return value.date()
+    tz = getattr(field_type, 'tz', None)
+    if tz is None:
+        return value.tz_localize(None) if value.tz is not None else value
+    return value.tz_convert(tz) if value.tz is not None else value.tz_localize(tz)
+
+
+class DatasetRegistry:
+    """
+    Finds and loads the bar datasets of the given folders.
+
+    Args:
+        folders (tuple): Folders with the raw and/or processed parquets.
+        max_bytes (int): Size of the in-process cache of the loaded frames, in bytes.
+    """
+    def __init__(self, folders=default_folders, max_bytes=default_cache_bytes):
+        self.folders = tuple(folders)
+        self.cache = LRUCache(max_bytes)
+        self._index = None
+        self._index_version = None
+        self._lock = threading.Lock()
+
+    def _folders_version(self):
+        # A file added to or removed from a folder changes the folder mtime.
+        return tuple(os.stat(folder).st_mtime_ns if os.path.isdir(folder) else None for folder in self.folders)
+
+    def index(self):
+        """
+        Parsed names of the datasets of the folders, rescanned when a folder changes.
+
+        Returns:
+            list: Dataset entries (see parse_dataset_name) with their path.
+        """
+        version = self._folders_version()
+        with self._lock:
+            if self._index is None or self._index_version != version:
+                datasets = []
+                for folder in self.folders:
+                    if not os.path.isdir(folder):
+                        continue
+                    for name in sorted(os.listdir(folder)):
+                        dataset = parse_dataset_name(name)
+                        if dataset is not None:
+                            datasets.append({**dataset, 'path': os.path.join(folder, name)})
+                (self._index, self._index_version) = (datasets, version)
+            return self._index
+
+    def find(self, ticker, interval, stage, filtered_dates=False):
+        """
+        Dataset of a (ticker, interval, stage). If several raw files match, the one ending last is taken.
+
+        Returns:
+            dict: Dataset entry with its path and mtime, or None if there is none.
+        """
+        datasets = [dataset for dataset in self.index() if dataset['ticker'] == ticker and
+                    dataset['interval'] == interval and dataset['stage'] == stage and
+                    dataset['filtered_dates'] == filtered_dates and os.path.exists(dataset['path'])]
+        if not datasets:
+            return None
+        dataset = max(datasets, key=lambda dataset: (dataset['end'] or '', dataset['name']))
+        return {**dataset, 'mtime': os.path.getmtime(dataset['path'])}
+
+    def load(self, ticker, interval, stage, columns=None, start=None, end=None, filtered_dates=False):
+        """
+        Reads a dataset, see find.
+
+        Args:
+            ticker (str): E.g. 'ZN'.
+            interval (str): E.g. '1h'.
+            stage (str): 'raw', 'events_tagged', 'nonevents' or 'session_bars'.
+            columns (list): Columns to read. Default: all. The index of the raw parquets (Datetime) is always read.
+            start (str or pd.Timestamp): Rows with a time column (stage_time_columns) >= start. Default: no bound.
+            end (str or pd.Timestamp): Rows with a time column < end. Default: no bound.
+            filtered_dates (bool): The processed parquets of the month_day_filter runs of returns_main.py.
+
+        Returns:
+            pd.DataFrame: The rows and columns read (a copy, the callers may modify it). Empty if there is no such
+                          dataset.
+        """
+        dataset = self.find(ticker, interval, stage, filtered_dates)
+        if dataset is None:
+            print(f"No {stage} dataset for {ticker} {interval}")
+            return pd.DataFrame(columns=columns)
+        path = dataset['path']
+        key = (path, os.stat(path).st_mtime_ns, tuple(columns) if columns is not None else None,
+               None if start is None else str(start), None if end is None else str(end))
+        df = self.cache.get(key)
+        if df is None:
+            df = self._read(path, stage, columns, start, end)
+            self.cache.put(key, df, int(df.memory_usage(index=True, deep=True).sum()))
+        return df.copy()
+
+    def _read(self, path, stage, columns, start, end):
+        filters = []
+        if start is not None or end is not None:
+            time_column = stage_time_columns[stage]
+            field_type = pq.read_schema(path).field(time_column).type
+            if start is not None:
+                filters.append((time_column, '>=', _to_bound(start, field_type)))
+            if end is not None:
+                filters.append((time_column, '<', _to_bound(end, field_type)))
+        return pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filters or None)
+
+
+# One registry (and cache) per set of folders, shared by the callers of the process.
+_registries = {}
+_registries_lock = threading.Lock()
+
+def get_dataset_registry(folders=default_folders):
+    with _registries_lock:
+        if tuple(folders) not in _registries:
+            _registries[tuple(folders)] = DatasetRegistry(folders)
+        return _registries[tuple(folders)]
+
+def load(ticker, interval, stage, columns=None, start=None, end=None, filtered_dates=False, folders=default_folders):
+    # E.g. load('ZN', '1h', 'raw', columns=['Open', 'High', 'Low', 'Close'], start='2024-01-01')
+    return get_dataset_registry(folders).load(ticker, interval, stage, columns, start, end, filtered_dates)
@@ -0,0 +1,149 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from io import BytesIO
+import density_estimation
+from streaming_stats import DistributionSummary
+
+# Chart data of the session distribution plots: histogram bins, KDE grid, latest return and summary stats per
+# session, saved as json by Returns (output_mode 'chart_data'/'both') and drawn client side by the dashboard
+# (Vega-Lite). PNGs are rendered from it on demand only.
+max_hist_bins = 400   # cap of numpy's 'auto' bins, keeps the json small for 1m data
+chart_decimals = 6
+
+def get_chart_data_path(output_folder, tickersymbol_val, interval_val, return_type):
+    # return_type: 'Returns' or 'Volatility', as in the png names.
+    return os.path.join(output_folder, f"{tickersymbol_val}_{interval_val}_{return_type}_Distribution.json")
+
+def _round_list(values):
+    return [None if not np.isfinite(v) else round(float(v), chart_decimals) for v in values]
+
+def _round_value(value):
+    value = float(value)
+    return None if not np.isfinite(value) else round(value, chart_decimals)
+
+def get_histogram(values):
+    # Density histogram with numpy's 'auto' bins like sns.histplot, at most max_hist_bins bins.
+    edges = np.histogram_bin_edges(values, bins="auto")
+    if len(edges) > max_hist_bins + 1:
+        edges = np.histogram_bin_edges(values, bins=max_hist_bins)
+    density, edges = np.histogram(values, bins=edges, density=True)
+    return edges, density
+
+def get_session_chart_data(session, session_returns, latest_date, latest_return, latest_zscore, latest_percentile, label,
+                           kde_curve=None, stats=None):
+    """
+    Chart data of one session subplot.
+
+    Args:
+        session (str): Session name (subplot title).
+        session_returns (pd.Series or pd.DataFrame): Returns of the distribution.
+        latest_date, latest_return, latest_zscore, latest_percentile: Data of the red dot.
+        label (str): Annotation of the red dot.
+        kde_curve (tuple): (grid, pdf) of density_estimation.get_kde, computed if not given.
+        stats (dict): count, mean, median, std, perc95, perc99, skew and kurt (DistributionSummary.get_chart_stats),
+                      computed if not given.
+
+    Returns:
+        dict: session, hist (edges, density), kde (x, density), latest and stats.
+    """
+    values = pd.Series(np.ravel(session_returns), dtype=float).dropna()
+    edges, density = get_histogram(values.to_numpy())
+    kde_x, kde_density = kde_curve if kde_curve is not None else density_estimation.get_kde(values.to_numpy())[:2]
+    stats = stats if stats is not None else DistributionSummary.from_values(values.to_numpy()).get_chart_stats()
+    return {
+        "session": session,
+        "hist": {"edges": _round_list(edges), "density": _round_list(density)},
+        "kde": {"x": _round_list(kde_x), "density": _round_list(kde_density)},
+        "latest": {"date": str(latest_date), "return": _round_value(latest_return), "zscore": _round_value(latest_zscore),
+                   "percentile": _round_value(latest_percentile), "label": label},
+        "stats": {"count": int(stats["count"]), **{key: _round_value(stats[key])
+                                                   for key in ["mean", "median", "std", "perc95", "perc99", "skew", "kurt"]}},
+    }
+
+def save_chart_data(path, sessions_data, title, x_title, tickersymbol_val, interval_val, return_type):
+    chart_data = {"ticker": tickersymbol_val, "interval": interval_val, "return_type": return_type,
+                  "title": title, "x_title": x_title, "sessions": sessions_data}
+    with open(path, "w") as f:
+        json.dump(chart_data, f, separators=(",", ":"))
+    return chart_data
+
+def get_stats_text(stats):
+    # Text of the stats box of the plots.
+    fmt = lambda value, spec: "nan" if value is None else format(value, spec)
+    return (f"Mean: {fmt(stats['mean'], '.2f')}\nMedian: {fmt(stats['median'], '.2f')}\nStd: {fmt(stats['std'], '.1f')}\n"
+            f"95%ile: {fmt(stats['perc95'], '.1f')}\n99%ile: {fmt(stats['perc99'], '.1f')}\n"
+            f"Skew: {fmt(stats['skew'], '.1f')}\nKurt: {fmt(stats['kurt'], '.1f')}")
+
+def get_vega_lite_spec(session_data, x_title):
+    """
+    Vega-Lite spec of one session: density histogram, KDE line and the latest return (red rule and dot).
+    """
+    edges = session_data["hist"]["edges"]
+    hist_values = [{"bin_start": start, "bin_end": end, "density": density}
+                   for start, end, density in zip(edges[:-1], edges[1:], session_data["hist"]["density"])]
+    kde_values = [{"x": x, "density": density} for x, density in zip(session_data["kde"]["x"], session_data["kde"]["density"])]
+    latest = session_data["latest"]
+    latest_values = [] if latest["return"] is None else [{"x": latest["return"], "y": 0, "label": latest["label"]}]
+    x_encoding = {"type": "quantitative", "title": x_title}
+    return {
+        "title": {"text": session_data["session"], "subtitle": get_stats_text(session_data["stats"]).replace("\n", ", ")},
+        "layer": [
+            {"data": {"values": hist_values}, "mark": {"type": "bar", "color": "skyblue"},
+             "encoding": {"x": {"field": "bin_start", **x_encoding}, "x2": {"field": "bin_end"},
+                          "y": {"field": "density", "type": "quantitative", "title": "Density"},
+                          "tooltip": [{"field": "bin_start", "type": "quantitative"}, {"field": "bin_end", "type": "quantitative"},
+                                      {"field": "density", "type": "quantitative"}]}},
+            {"data": {"values": kde_values}, "mark": {"type": "line", "color": "darkblue", "strokeWidth": 2},
+             "encoding": {"x": {"field": "x", **x_encoding}, "y": {"field": "density", "type": "quantitative"}}},
+            {"data": {"values": latest_values}, "mark": {"type": "rule", "color": "red", "strokeDash": [6, 4]},
+             "encoding": {"x": {"field": "x", **x_encoding}, "tooltip": [{"field": "label", "type": "nominal"}]}},
+            {"data": {"values": latest_values}, "mark": {"type": "point", "color": "red", "filled": True, "size": 150},
+             "encoding": {"x": {"field": "x", **x_encoding}, "y": {"field": "y", "type": "quantitative"},
+                          "tooltip": [{"field": "label", "type": "nominal"}]}},
+        ],
+    }
+
+def render_png(chart_data, dpi=100):
+    """
+    Renders the distribution plot of the chart data with matplotlib (on demand, e.g. for downloads).
+
+    Returns:
+        BytesIO: The png image.
+    """
+    sessions_data = chart_data["sessions"]
+    if len(sessions_data) == 1:
+        fig, axes = plt.subplots(1, 1, figsize=(12, 8))
+        axes = [axes]
+    else:
+        fig, axes = plt.subplots(3, 2, figsize=(24, 18))
+        axes = axes.ravel()
+    for ax, session_data in zip(axes, sessions_data):
+        edges = np.array(session_data["hist"]["edges"], dtype=float)
+        if len(edges) > 1:
+            ax.bar(edges[:-1], np.array(session_data["hist"]["density"], dtype=float), width=np.diff(edges),
+                   align="edge", color="skyblue", linewidth=0)
+        ax.plot(session_data["kde"]["x"], session_data["kde"]["density"], color="darkblue", linewidth=2)
+        latest = session_data["latest"]
+        if latest["return"] is not None:
+            ax.scatter(latest["return"], 0, color="red", s=150, zorder=5)
+            ax.axvline(x=latest["return"], color="red", linestyle="--", linewidth=1.5, alpha=0.7)
+            ax.annotate(latest["label"], (latest["return"], 0), xytext=(10, 10), textcoords="offset points",
+                        color="red", fontweight="bold", fontsize=14)
+        ax.text(0.95, 0.95, get_stats_text(session_data["stats"]), transform=ax.transAxes, verticalalignment="top",
+                horizontalalignment="right", bbox=dict(boxstyle="round", facecolor="#FFFFF0", edgecolor="#2F4F4F", alpha=0.8),
+                color="#2F4F4F", fontsize=20)
+        ax.set_title(session_data["session"], fontsize=18)
+        ax.set_xlabel(chart_data["x_title"], fontsize=16)
+        ax.set_ylabel("Density", fontsize=16)
+    for ax in axes[len(sessions_data):]:
+        ax.set_visible(False)
+    fig.tight_layout()
+    fig.suptitle(chart_data["title"], fontsize=20, y=1.02, x=0.01, ha="left")
+    output = BytesIO()
+    fig.savefig(output, format="png", dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    output.seek(0)
+    return output
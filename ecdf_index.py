@@ -0,0 +1,129 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Empirical CDFs of the session distributions, saved by Returns next to the stats csvs (one parquet per
+# ticker/interval/return type, one ECDF per session) and built from the movement counts by ProbabilityMatrix.
+
+def get_ecdf_index_path(output_folder, tickersymbol_val, interval_val, return_type):
+    # return_type: 'Returns' or 'Volatility', as in the plot names.
+    return os.path.join(output_folder, f"{tickersymbol_val}_{interval_val}_{return_type}_ecdf_index.parquet")
+
+def _to_output(result, x):
+    # Scalars in, float out; arrays in, arrays out.
+    return float(result) if np.ndim(x) == 0 else result
+
+
+class ECDFIndex:
+    """
+    Empirical CDF of a sample, kept as its sorted distinct values and cumulative counts. Percentile, exceedance,
+    z-score and quantile queries are binary searches (O(log n)) instead of scans of the whole sample.
+
+    Args:
+        values (array like): Samples, NaNs are dropped.
+        counts (array like): Occurrences of each value (e.g. the hour x bps counts of the probability matrix
+                             cache). Default: 1 for each value.
+    """
+    def __init__(self, values, counts=None):
+        values = np.asarray(values, dtype=float).ravel()
+        counts = np.ones(len(values), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64).ravel()
+        keep = np.isfinite(values) & (counts > 0)
+        self.values, inverse = np.unique(values[keep], return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts[keep], minlength=len(self.values)).astype(np.int64)
+        self._cum_counts = np.concatenate(([0], np.cumsum(self.counts)))   # samples < values[i]: _cum_counts[i]
+        self.n = int(self._cum_counts[-1])
+
+        if self.n > 0:
+            self.mean = float((self.values * self.counts).sum() / self.n)
+            self.std = float(np.sqrt((self.counts * (self.values - self.mean) ** 2).sum() / (self.n - 1))) if self.n > 1 else np.nan
+        else:
+            self.mean, self.std = np.nan, np.nan
+
+    def __len__(self):
+        return self.n
+
+    def count_less_equal(self, x):
+        return self._cum_counts[np.searchsorted(self.values, x, side="right")]
+
+    def count_less(self, x):
+        return self._cum_counts[np.searchsorted(self.values, x, side="left")]
+
+    def percentile(self, x):
+        # % of samples <= x, i.e. (sample <= x).mean() * 100
+        if self.n == 0:
+            return _to_output(np.full(np.shape(x), np.nan), x)
+        return _to_output(self.count_less_equal(x) * 100 / self.n, x)
+
+    def exceedance(self, x):
+        # % of samples > x
+        if self.n == 0:
+            return _to_output(np.full(np.shape(x), np.nan), x)
+        return _to_output((self.n - self.count_less_equal(x)) * 100 / self.n, x)
+
+    def percentile_of_score(self, x, kind="rank"):
+        # Same as scipy.stats.percentileofscore(sample, x, kind).
+        if self.n == 0:
+            return _to_output(np.full(np.shape(x), np.nan), x)
+        left, right = self.count_less(x), self.count_less_equal(x)
+        if kind == "rank":
+            result = (left + right + (right > left)) * 50 / self.n
+        elif kind == "weak":
+            result = right * 100 / self.n
+        elif kind == "strict":
+            result = left * 100 / self.n
+        elif kind == "mean":
+            result = (left + right) * 50 / self.n
+        else:
+            raise ValueError(f"Invalid kind: {kind}. Choose 'rank', 'weak', 'strict' or 'mean'.")
+        return _to_output(result, x)
+
+    def zscore(self, x):
+        return _to_output((np.asarray(x, dtype=float) - self.mean) / self.std, x)
+
+    def quantile(self, q):
+        # Linear interpolation between the order statistics, computed as numpy's (and pandas') quantile.
+        if self.n == 0:
+            return _to_output(np.full(np.shape(q), np.nan), q)
+        position = np.asarray(q, dtype=float) * (self.n - 1)
+        lower = np.floor(position)
+        gamma = position - lower
+        value_at = lambda rank: self.values[np.searchsorted(self._cum_counts[1:], rank, side="right")]
+        lower_value, upper_value = value_at(lower), value_at(np.minimum(lower + 1, self.n - 1))
+        diff = upper_value - lower_value
+        result = np.where(gamma >= 0.5, upper_value - diff * (1 - gamma), lower_value + diff * gamma)
+        return _to_output(result, q)
+
+    def merge(self, other):
+        # ECDF of the union of both samples.
+        return ECDFIndex(np.concatenate([self.values, other.values]), np.concatenate([self.counts, other.counts]))
+
+    def to_frame(self):
+        return pd.DataFrame({"value": self.values, "count": self.counts})
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df["value"].to_numpy(), df["count"].to_numpy())
+
+
+def save_ecdf_indexes(path, ecdf_indexes):
+    """
+    Saves the ECDFs of the sessions of one distribution plot in one parquet (columns: session, value, count).
+
+    Args:
+        path (str): See get_ecdf_index_path.
+        ecdf_indexes (dict): {session: ECDFIndex}.
+    """
+    frames = [ecdf.to_frame().assign(session=session) for session, ecdf in ecdf_indexes.items()]
+    df = pd.concat(frames, ignore_index=True)[["session", "value", "count"]]
+    df.to_parquet(path, engine="pyarrow", index=False)
+
+def load_ecdf_indexes(path):
+    """
+    Args:
+        path (str or file-like): See get_ecdf_index_path, or the bytes of the parquet (the dashboard artifact store).
+
+    Returns:
+        dict: {session: ECDFIndex}, in the order the sessions were saved.
+    """
+    df = pd.read_parquet(path, engine="pyarrow")
+    return {session: ECDFIndex.from_frame(group) for session, group in df.groupby("session", sort=False)}
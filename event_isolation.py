@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+# Isolation filter of the event specific returns: keeps the occurrences of an event without any other major
+# event within +-N hours. The event names are classified into the major event types once, and each type keeps its
+# sorted timestamps, so "is there another event within +-N hours" is two binary searches per (occurrence, type)
+# instead of a scan of the whole calendar per occurrence. N can be set per event type.
+
+class EventTimeline:
+    """
+    Calendar of the major events: each row of event_ts is tagged with the first event type of event_list that
+    its name contains (case insensitive), rows without a type are dropped, as are repeated (timestamp, type) pairs.
+
+    Args:
+        event_ts (pd.DataFrame): 'timestamp' and 'events' (event name) columns.
+        event_list (list): Major event types, e.g. the events of the dashboard's tab 5.
+        start (pd.Timestamp): Events before start are left out. Default: all.
+    """
+    def __init__(self, event_ts, event_list, start=None):
+        self.event_types = [event.strip().lower() for event in event_list]
+
+        # Classified once per distinct name instead of once per row.
+        names = event_ts['events'].astype(str)
+        unique_names = names.unique()
+        name_types = {name: next((event for event in self.event_types if event in name.lower()), None)
+                      for name in unique_names}
+        timeline = pd.DataFrame({'timestamp': event_ts['timestamp'], 'events': names.map(name_types)})
+        timeline = timeline.dropna(subset=['events'])
+        timeline = timeline.drop_duplicates(subset=['timestamp', 'events'], keep='first')
+        if start is not None:
+            timeline = timeline[timeline['timestamp'] >= start]
+        self.timeline = timeline
+
+        # Sorted timestamps (int64 ns) of every event type.
+        times_ns = pd.DatetimeIndex(timeline['timestamp']).as_unit('ns').asi8
+        self.type_times = {event: np.sort(times_ns[(timeline['events'] == event).to_numpy()])
+                           for event in self.event_types}
+
+    def occurrences(self, selected_event):
+        # Rows of the types containing selected_event (case insensitive), in calendar order.
+        selected_event = selected_event.strip().lower()
+        return self.timeline[self.timeline['events'].map(lambda event: selected_event in event).astype(bool)]
+
+    def _gap_ns(self, event, gap_hours):
+        if isinstance(gap_hours, dict):
+            gaps = {key.strip().lower(): value for key, value in gap_hours.items()}
+            gap_hours = gaps.get(event, gaps.get('default', 0))
+        return int(pd.Timedelta(hours=gap_hours).value)
+
+    def is_isolated(self, occurrences, selected_event, gap_hours=2):
+        """
+        Args:
+            occurrences (pd.DataFrame): Rows of occurrences, e.g. from occurrences(selected_event).
+            selected_event (str): Type of the occurrences: events of the types containing it do not count.
+            gap_hours (float or dict): Half width of the window around each occurrence. A dict gives it per type
+                                       of the other event ({'Fed Interest Rate Decision': 6, 'default': 2}), types
+                                       not in it use 'default' (0 if not given).
+
+        Returns:
+            np.ndarray: True for the occurrences without an event of another type within +-gap_hours (inclusive).
+        """
+        selected_event = selected_event.strip().lower()
+        others = [event for event in self.event_types if event != selected_event]
+        times_ns = pd.DatetimeIndex(occurrences['timestamp']).as_unit('ns').asi8
+        isolated = np.ones(len(times_ns), dtype=bool)
+        for event in self.event_types:
+            # As the previous filter: a type is "other" if its name contains one of the other event types.
+            if not any(other in event for other in others):
+                continue
+            gap = self._gap_ns(event, gap_hours)
+            type_times = self.type_times[event]
+            nearby = (np.searchsorted(type_times, times_ns + gap, side='right') -
+                      np.searchsorted(type_times, times_ns - gap, side='left'))
+            isolated &= nearby == 0
+        return isolated
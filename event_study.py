@@ -0,0 +1,195 @@
+import os
+import numpy as np
+import pandas as pd
+from event_windows import EventWindowEngine
+from event_isolation import EventTimeline
+
+# Event study cube: returns of every (ticker, interval) of the pipeline around every occurrence of the major events,
+# for a grid of pre/post offsets, precomputed by returns_main.py into one long parquet (one row per occurrence x
+# instrument x offset). Tab 5 of the dashboard and notebooks read slices of it (parquet filters on event, ticker,
+# interval, offset) instead of recomputing windows on the bars.
+event_study_cube_file = 'event_study_cube.parquet'
+major_events = ['CPI', 'PPI', 'PCE Price Index', 'Non Farm Payrolls', 'ISM Manufacturing PMI', 'ISM Services PMI',
+                'S&P Global Manufacturing PMI', 'S&P Global Services PMI', 'Michigan',
+                'Jobless Claims', 'ADP', 'JOLTs', 'Challenger Job Cuts', 'Fed Interest Rate Decision',
+                'GDP Price Index QoQ Adv', 'Retail Sales', 'Fed Press Conference', 'FOMC Minutes']
+offset_hours = range(1, 25)                          # +-1h ... +-24h, intraday intervals
+offset_minutes = [1, 2, 3, 5, 10, 15, 30, 45]        # +-1m ... +-45m, minute intervals (multiples of the interval)
+offset_days = range(1, 6)                            # +-1d ... +-5d, daily intervals
+cube_columns = ['datetime', 'event', 'ticker', 'interval', 'offset_minutes', 'n_bars', 'Volatility Return', 'Return']
+
+def get_event_study_cube_path(processed_folder):
+    return os.path.join(processed_folder, event_study_cube_file)
+
+def get_offsets(interval):
+    """
+    Offset grid of an interval: whole days for daily bars, hours (and the minute offsets that are multiples of the
+    interval, for minute bars) for intraday bars. Negative offsets are windows before the event.
+
+    Returns:
+        list: pd.Timedelta offsets, sorted.
+    """
+    step = pd.Timedelta(interval)
+    if step >= pd.Timedelta(days=1):
+        offsets = [pd.Timedelta(days=days) for days in offset_days]
+    else:
+        offsets = [pd.Timedelta(hours=hours) for hours in offset_hours]
+        offsets += [pd.Timedelta(minutes=minutes) for minutes in offset_minutes
+                    if minutes < 60 and pd.Timedelta(minutes=minutes) % step == pd.Timedelta(0)]
+    return sorted([-offset for offset in offsets] + offsets)
+
+def format_offset(offset):
+    # -8h, +15m, +2d
+    minutes = int(offset / pd.Timedelta(minutes=1))
+    for unit, size in [('d', 24 * 60), ('h', 60), ('m', 1)]:
+        if minutes % size == 0:
+            return f"{minutes // size:+d}{unit}"
+
+def _get_bar_times(bars, interval):
+    # Daily bars are stamped 00:00 UTC of the trading day (see returns_main._get_tag_tolerance): keyed by that date.
+    times = pd.to_datetime(bars['US/Eastern Timezone'], utc=True)
+    if pd.Timedelta(interval) >= pd.Timedelta(days=1):
+        return times.dt.tz_localize(None).dt.normalize()
+    return times
+
+def get_event_anchors(timestamps, interval):
+    """
+    Start of the bar containing each event: the event hour for hourly bars, the interval for minute bars and the
+    US/Eastern date for daily bars (tz-naive, as the daily bar keys). The events are first rounded to the minute:
+    the workbook times are 10s before the releases (08:29:50 for an 08:30 release). The anchor of the cube windows
+    and of the ZN 1h windows of the dashboard (tab 5).
+
+    Returns:
+        pd.DatetimeIndex: UTC bar starts (tz-naive dates for daily bars).
+    """
+    timestamps = pd.DatetimeIndex(timestamps).tz_convert('UTC').round('min')
+    step = pd.Timedelta(interval)
+    if step >= pd.Timedelta(days=1):
+        return timestamps.tz_convert('US/Eastern').tz_localize(None).normalize()
+    step_ns = min(step, pd.Timedelta(hours=1)).value
+    # US/Eastern offsets are whole hours: flooring the UTC epoch is flooring the local time.
+    times_ns = timestamps.tz_convert('UTC').as_unit('ns').asi8
+    return pd.to_datetime(times_ns - times_ns % step_ns, utc=True)
+
+def get_window_bounds(anchors, offsets):
+    """
+    [start, end) windows of every (anchor, offset) pair, anchors varying slowest: [anchor + offset, anchor) before
+    the event, [anchor, anchor + offset) after it.
+
+    Returns:
+        tuple: (starts, ends) as pd.DatetimeIndex.
+    """
+    anchors = pd.DatetimeIndex(anchors)
+    deltas = pd.TimedeltaIndex(np.tile(np.array(offsets, dtype='timedelta64[ns]'), len(anchors)))
+    anchors = anchors.repeat(len(offsets))
+    before = deltas < pd.Timedelta(0)
+    return (anchors + deltas.where(before, pd.Timedelta(0)), anchors + deltas.where(~before, pd.Timedelta(0)))
+
+
+def get_event_window_returns(occurrences, bars, interval, bps_factor, offsets=None):
+    """
+    Window returns of one instrument around the event occurrences.
+
+    Args:
+        occurrences (pd.DataFrame): 'timestamp' (tz-aware) and 'events' (event type) columns, see EventTimeline.
+        bars (pd.DataFrame): Bars with 'US/Eastern Timezone', Open, High, Low and Close columns.
+        interval (str): Bar interval, e.g. '1m', '1h', '1d'.
+        bps_factor (float): Multiplies the price differences, as in ticker_match_tuple.
+        offsets (list): pd.Timedelta offsets. Default: get_offsets(interval).
+
+    Returns:
+        pd.DataFrame: datetime (UTC), event, offset_minutes, n_bars, Volatility Return and Return for the windows
+                      with bars.
+    """
+    offsets = get_offsets(interval) if offsets is None else offsets
+    bars = bars.dropna(subset=['US/Eastern Timezone']).dropna(subset=['Open', 'High', 'Low', 'Close'], how='all')
+    bars = bars.assign(bar_time=_get_bar_times(bars, interval)).drop_duplicates(subset=['bar_time'], keep='first')
+    engine = EventWindowEngine(bars, time_col='bar_time')
+
+    (starts, ends) = get_window_bounds(get_event_anchors(occurrences['timestamp'], interval), offsets)
+    windows = engine.window_returns(starts, ends, bps_factor=bps_factor)
+    (first, stop) = engine.locate(starts, ends)
+    cube = pd.DataFrame({
+        'datetime': pd.DatetimeIndex(occurrences['timestamp']).tz_convert('UTC').repeat(len(offsets)),
+        'event': np.repeat(occurrences['events'].to_numpy(), len(offsets)),
+        'offset_minutes': np.tile([int(offset / pd.Timedelta(minutes=1)) for offset in offsets], len(occurrences)),
+        'n_bars': (stop - first).astype(np.int32),
+        'Volatility Return': windows['Volatility Return'].to_numpy(),
+        'Return': windows['Return'].to_numpy(),
+    })
+    return cube.dropna(subset=['Volatility Return', 'Return']).reset_index(drop=True)
+
+
+def build_event_study_cube(events_data, ticker_match_tuple, processed_folder, event_list=major_events):
+    """
+    Builds and saves the event study cube from the processed bars of returns_main.py
+    ({ticker}_{interval}_events_tagged_target_tz.parquet, tickers without it are skipped).
+
+    Args:
+        events_data (pd.DataFrame): Events with 'datetime' (tz-aware) and 'events' columns, e.g. the events store.
+        ticker_match_tuple (tuple): (ticker, interval, bps factor) of every instrument.
+        processed_folder (str): Folder of the processed parquets, the cube is saved in it.
+        event_list (list): Event types, see EventTimeline.
+
+    Returns:
+        pd.DataFrame: The cube (columns: cube_columns).
+    """
+    timeline = EventTimeline(events_data.rename(columns={'datetime': 'timestamp'}), event_list)
+    occurrences = timeline.timeline.dropna(subset=['timestamp'])
+    frames = []
+    for tickersymbol, tickerinterval, ticker_bps_factor in ticker_match_tuple:
+        bars_path = os.path.join(processed_folder, f"{tickersymbol}_{tickerinterval}_events_tagged_target_tz.parquet")
+        if not os.path.exists(bars_path):
+            print(f"No processed bars for {tickersymbol} {tickerinterval}, skipped in the event study cube.")
+            continue
+        bars = pd.read_parquet(bars_path, columns=['US/Eastern Timezone', 'Open', 'High', 'Low', 'Close'],
+                               engine='pyarrow')
+        cube = get_event_window_returns(occurrences, bars, tickerinterval, ticker_bps_factor)
+        frames.append(cube.assign(ticker=tickersymbol, interval=tickerinterval))
+
+    cube = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=cube_columns)
+    cube = cube[cube_columns].sort_values(['ticker', 'interval', 'event', 'datetime', 'offset_minutes'],
+                                          kind='stable', ignore_index=True)
+    cube.to_parquet(get_event_study_cube_path(processed_folder), engine='pyarrow', index=False,
+                    row_group_size=100_000)
+    print(f"Event study cube: {len(cube)} windows saved at {get_event_study_cube_path(processed_folder)}")
+    return cube
+
+def load_event_study_cube(path, event=None, ticker=None, interval=None, offset=None, columns=None):
+    """
+    Slice of the event study cube. The filters are pushed down to the parquet reader, so only the matching row
+    groups are read.
+
+    Args:
+        path (str): See get_event_study_cube_path.
+        event (str or list): Event type(s), lower case as in EventTimeline (e.g. 'cpi'). Default: all.
+        ticker (str or list): Default: all.
+        interval (str or list): Default: all.
+        offset (pd.Timedelta or list): Window offset(s). Default: all.
+        columns (list): Columns to read. Default: all.
+
+    Returns:
+        pd.DataFrame: Matching rows, with 'Absolute Return'.
+    """
+    filters = []
+    for column, value in [('event', event), ('ticker', ticker), ('interval', interval), ('offset_minutes', offset)]:
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple)) else [value]
+        if column == 'offset_minutes':
+            values = [int(pd.Timedelta(value) / pd.Timedelta(minutes=1)) for value in values]
+        filters.append((column, 'in', list(values)))
+    cube = pd.read_parquet(path, engine='pyarrow', columns=columns, filters=filters or None)
+    if 'Return' in cube.columns:
+        cube.insert(cube.columns.get_loc('Return'), 'Absolute Return', cube['Return'].abs())
+    return cube
+
+def get_event_study_matrix(cube, value='Return'):
+    """
+    Occurrences x offsets matrix of one (event, ticker, interval) slice of the cube, e.g. the return path around
+    each CPI release.
+
+    Returns:
+        pd.DataFrame: index datetime, columns offset_minutes.
+    """
+    return cube.pivot_table(index='datetime', columns='offset_minutes', values=value, aggfunc='first')
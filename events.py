@@ -1,6 +1,9 @@
 import pandas as pd
 from preprocessing import ManipulateTimezone
 import os
+import re
+import json
+import hashlib
 class Events:
     """Combines Events from Economic Events sheet and converts the timestamp to US/Eastern.
     """
@@ -84,7 +87,7 @@ class Events:
             df['tier']=self.assign_tier(df,tier_dic)
         
         else: #only apply tiers for nan values
-            df.loc[:,'tier'] = df.loc[:,'tier'].fillna(df.apply(lambda row: self.assign_tier_helper(row, tier_dic), axis=1))
+            df.loc[:,'tier'] = df.loc[:,'tier'].fillna(self.get_tiers(df,tier_dic))
   
         df=df[['datetime','events','year','tier']]
 
@@ -121,37 +124,144 @@ class Events:
             raise ValueError(e)
 
 
+    @staticmethod
+    def _keyword_pattern(keywords):
+        # One regex alternation matching any of the keywords as a plain substring (keywords stripped and lowered).
+        return '|'.join(re.escape(str(keyword).strip().lower()) for keyword in keywords)
+
+    @staticmethod
+    def _normalized_events(finaldf):
+        return finaldf['events'].astype(str).str.strip().str.lower()
+
+    def get_tiers(self, finaldf,tier_dic):
+        # Tier of the first keyword of tier_dic (in order) contained in the event, 4 if none.
+        # Consecutive keywords sharing a tier are one alternation; applying the runs from last to first lets the
+        # earliest matching keyword win.
+        myevents = self._normalized_events(finaldf)
+        runs = []
+        for event_key,tier in tier_dic.items():
+            if runs and runs[-1][1]==tier:
+                runs[-1][0].append(event_key)
+            else:
+                runs.append(([event_key],tier))
+
+        tiers = pd.Series(4,index=finaldf.index)  # Default value if no match found
+        for event_keys,tier in runs[::-1]:
+            tiers = tiers.mask(myevents.str.contains(self._keyword_pattern(event_keys),regex=True),tier)
+        return tiers
+
     def assign_tier(self, finaldf,tier_dic):
-        finaldf['tier'] = finaldf.apply(lambda row: self.assign_tier_helper(row,tier_dic), axis=1)
+        finaldf['tier'] = self.get_tiers(finaldf,tier_dic)
         return finaldf['tier']
-        
-    def assign_tier_helper(self, row,tier_dic):
-        myevent = str(row['events']).strip().lower()
-        for event_key in tier_dic:
-            if str(event_key).strip().lower() in myevent:
-                return tier_dic[event_key]
-        return 4  # Default value if no match found
 
     def assign_flag(self,finaldf, flag_dic):
         if not flag_dic:  # Check if dic is empty
             return finaldf
-        # Apply the helper function row-wise
-        finaldf = finaldf.apply(lambda row: self.assign_flag_helper(row, flag_dic), axis=1)
-        return finaldf
-
-    def assign_flag_helper(self, row, flag_dic):
-        myevent = str(row['events']).strip().lower()
+        # One alternation per flag, all rows at once
+        finaldf = finaldf.copy()
+        myevents = self._normalized_events(finaldf)
         for flag_key, flag_condition in flag_dic.items():
-            row[flag_key] = 0
-            for event_key in flag_condition:
-                if str(event_key).strip().lower() in myevent:
-                    row[flag_key] = 1
-                    break      
-        if row['IND_Tier1']==0 and row['IND_Tier2']==0 and row['IND_Tier3']==0:
-            row['IND_Tier4']=1
-        else:
-            row['IND_Tier4']=0        
-        return row
+            if len(flag_condition)==0:
+                finaldf[flag_key] = 0
+            else:
+                finaldf[flag_key] = myevents.str.contains(self._keyword_pattern(flag_condition),regex=True).astype(int)
+        finaldf['IND_Tier4'] = ((finaldf['IND_Tier1']==0) & (finaldf['IND_Tier2']==0) & (finaldf['IND_Tier3']==0)).astype(int)
+        return finaldf.infer_objects()  # same column dtypes as the former row-wise apply
 
     def save_sheet(self,sheet,name='combined.csv'):
         sheet.to_csv(name,index=False)
+
+
+# Compiled events store: the combined, tiered and flagged events with tz-aware UTC timestamps, kept next to the
+# processed data. The manifest records the sources (events workbook + trading economics csvs) and the settings it
+# was built from, so the workbook is only parsed again when one of them changes.
+events_store_file='events_store.parquet'
+events_store_manifest_file='events_store_manifest.json'
+
+def _file_fingerprint(path,previous=None):
+    # mtime/size first; the file is only hashed again when they changed.
+    stat=os.stat(path)
+    if previous and previous.get('mtime_ns')==stat.st_mtime_ns and previous.get('size')==stat.st_size:
+        return previous
+    with open(path,'rb') as f:
+        digest=hashlib.sha256(f.read()).hexdigest()
+    return {'mtime_ns':stat.st_mtime_ns,'size':stat.st_size,'sha256':digest}
+
+def get_events_sources(excel,new_events_folder=None):
+    # The events workbook and the trading economics csvs that Events.append_new_events may pick up.
+    sources=[excel]
+    if new_events_folder and os.path.isdir(new_events_folder):
+        sources+=sorted(file.path for file in os.scandir(new_events_folder)
+                        if file.is_file() and file.name.endswith('.csv') and 'trad_eco_cal' in file.name)
+    return sources
+
+def read_events_store(store_folder,columns=None):
+    """
+    Reads the compiled events store without checking its sources (e.g. for the dashboard).
+
+    Args:
+        store_folder (str): Folder containing events_store.parquet.
+        columns (list): Columns to read. Default reads all.
+
+    Returns:
+        pd.DataFrame or None: The events store, or None if it was not built yet.
+    """
+    store_path=os.path.join(store_folder,events_store_file)
+    if not os.path.exists(store_path):
+        return None
+    return pd.read_parquet(store_path,columns=columns,engine='pyarrow')
+
+def load_events_store(excel,store_folder,tier_dic={},flag_dic={},default_tz='Asia/Kolkata',**kwargs):
+    """
+    Loads the compiled events store, rebuilding it with Events only when the events workbook, the trading
+    economics csvs in new_events_folder or the tier/flag settings changed since the last build.
+
+    Args:
+        excel (str): Path to the economic events workbook.
+        store_folder (str): Folder for events_store.parquet and its manifest.
+        tier_dic (dict): Event -> tier, passed to Events.
+        flag_dic (dict): Flag column -> events, passed to Events.
+        default_tz (str): Timezone of the workbook timestamps. Default is "Asia/Kolkata".
+        **kwargs: new_events_folder, add_new_events_dic and change_tiers, passed to Events.
+
+    Returns:
+        pd.DataFrame: datetime (tz-aware UTC), events (categorical), year, tier and the flag columns.
+    """
+    store_path=os.path.join(store_folder,events_store_file)
+    manifest_path=os.path.join(store_folder,events_store_manifest_file)
+    manifest={}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest=json.load(f)
+
+    settings=json.dumps({'tier_dic':tier_dic,'flag_dic':flag_dic,'default_tz':default_tz,
+                         'add_new_events_dic':kwargs.get('add_new_events_dic'),
+                         'change_tiers':kwargs.get('change_tiers')},sort_keys=True,default=str)
+    old_sources=manifest.get('sources',{})
+    sources={path:_file_fingerprint(path,old_sources.get(path))
+             for path in get_events_sources(excel,kwargs.get('new_events_folder'))}
+
+    up_to_date=(os.path.exists(store_path) and manifest.get('settings')==settings and
+                {path:source['sha256'] for path,source in sources.items()}==
+                {path:source.get('sha256') for path,source in old_sources.items()})
+    if up_to_date:
+        print(f'Events store up to date: {store_path}')
+        events_store=pd.read_parquet(store_path,engine='pyarrow')
+    else:
+        print(f'Building events store from {excel}')
+        myevents=Events(excel,dict(tier_dic),flag_dic,**kwargs)
+        events_store=myevents.combined_excel.reset_index(drop=True)
+
+        # The new events csvs append naive IST strings to the tz-aware workbook timestamps: convert both via their
+        # string form, naive values being localized to default_tz.
+        events_store['datetime']=events_store['datetime'].astype(str)
+        myeventsobject=ManipulateTimezone(events_store)
+        events_store=myeventsobject.change_timezone(events_store,'datetime',default_tz,'UTC')
+        events_store['events']=events_store['events'].astype('category')
+        events_store.to_parquet(store_path,index=False,engine='pyarrow')
+
+    # Refresh the manifest also when only mtimes moved, so the sources are not hashed again next time.
+    if not up_to_date or sources!=old_sources:
+        with open(manifest_path,'w') as f:
+            json.dump({'settings':settings,'sources':sources},f,indent=2)
+    return events_store
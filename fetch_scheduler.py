@@ -0,0 +1,156 @@
+import os
+import time
+import random
+import requests
+import pandas as pd
+from io import StringIO
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Downloads every (ticker, interval) of a run as its own request, a few at a time, with retries and a timeout per
+# request. A request is a tuple (ticker, interval, start, end), start/end as 'YYYY-MM-DD' strings or None (no
+# bound). The source is pluggable: 'yahoo' (default) or 'http', a fixture server used instead of Yahoo in tests.
+default_source = 'yahoo'
+default_max_workers = 4
+default_retries = 3
+default_backoff = 1.0    # seconds before the first retry, doubled after each failed attempt
+default_timeout = 30     # seconds per request
+price_columns = ['Close', 'High', 'Low', 'Open', 'Volume']
+
+
+class EmptyResponseError(ValueError):
+    # Yahoo logs its failures (rate limits, outages) instead of raising them and answers with an empty frame.
+    pass
+
+def _is_retryable(error):
+    # Timeouts, connection errors, 5xx answers and empty Yahoo answers may succeed on a retry. Anything else (a 404
+    # for a missing ticker, a bad interval...) fails the same way every time.
+    if isinstance(error, EmptyResponseError):
+        return True
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, (requests.Timeout, requests.ConnectionError, TimeoutError, ConnectionError))
+
+def _is_intraday(interval):
+    return interval[-1] in ('m', 'h')
+
+def _tidy(data, interval):
+    # One frame per ticker: Datetime index (UTC for intraday intervals, plain dates for daily and longer ones, as
+    # yf.download) and the price columns sorted by name, as the frames of the previous multi-ticker download.
+    if isinstance(data.columns, pd.MultiIndex):
+        data.columns = data.columns.get_level_values(0)
+    data = data[[col for col in data.columns if col in price_columns + ['Adj Close']]].sort_index(axis=1)
+    if getattr(data.index, 'tz', None) is not None:
+        data.index = data.index.tz_convert('UTC') if _is_intraday(interval) else data.index.tz_localize(None)
+    data.index.name = 'Datetime'
+    data.columns.name = None
+    return data
+
+
+class YahooSource:
+    """
+    Fetches one ticker from Yahoo Finance. Uses Ticker.history, which keeps its state per ticker, instead of
+    yf.download, which shares it between concurrent calls.
+    """
+    def fetch(self, ticker, interval, start, end, timeout):
+        import yfinance as yf
+        data = yf.Ticker(ticker).history(start=start, end=end, interval=interval, actions=False, timeout=timeout)
+        if data is None or data.empty:
+            # Yahoo logs the failures instead of raising them: an empty answer is retried as well.
+            raise EmptyResponseError(f'No data returned for {ticker} {interval} ({start} to {end})')
+        return _tidy(data, interval)
+
+
+class HttpSource:
+    """
+    Fetches {base_url}/{ticker}_{interval}.csv (Datetime index column + price columns) and keeps the rows between
+    start (inclusive) and end (exclusive), as Yahoo does. A fixture folder can be served with
+    "python -m http.server".
+    """
+    def __init__(self, base_url='http://localhost:8000'):
+        self.base_url = base_url.rstrip('/')
+
+    def fetch(self, ticker, interval, start, end, timeout):
+        response = requests.get(f'{self.base_url}/{quote(ticker)}_{interval}.csv', timeout=timeout)
+        response.raise_for_status()
+        data = pd.read_csv(StringIO(response.text), index_col=0)
+        data.index = pd.to_datetime(data.index, utc=_is_intraday(interval))
+        if start is not None:
+            data = data[data.index >= pd.Timestamp(start, tz=data.index.tz)]
+        if end is not None:
+            data = data[data.index < pd.Timestamp(end, tz=data.index.tz)]
+        return _tidy(data, interval)
+
+
+def get_price_source(source=None, **kwargs):
+    """
+    Price source for the given name ('yahoo' or 'http'). Default: the PRICE_SOURCE environment variable, else
+    'yahoo'. For 'http', the base url is the PRICE_SOURCE_URL environment variable unless given.
+    """
+    source = source or os.environ.get('PRICE_SOURCE', default_source)
+    if source == 'yahoo':
+        return YahooSource(**kwargs)
+    elif source == 'http':
+        if 'base_url' not in kwargs and 'PRICE_SOURCE_URL' in os.environ:
+            kwargs['base_url'] = os.environ['PRICE_SOURCE_URL']
+        return HttpSource(**kwargs)
+    raise ValueError(f"Unknown price source: {source}. Choose 'yahoo' or 'http'.")
+
+
+class FetchScheduler:
+    """
+    Runs the fetch requests concurrently on a bounded thread pool (the downloads wait on the network, not the
+    CPU). A request failing with a transient error (see _is_retryable) is retried after backoff, 2*backoff,
+    4*backoff... seconds (plus up to 10% jitter so the retries do not hit the server together). Other errors are
+    raised at once.
+
+    Args:
+        source (YahooSource or HttpSource): Where the prices are fetched from. Default: get_price_source().
+        max_workers (int): Maximum number of requests in flight.
+        retries (int): Retries after the first attempt.
+        backoff (float): Seconds before the first retry.
+        timeout (float): Timeout of each request, in seconds.
+    """
+    def __init__(self, source=None, max_workers=default_max_workers, retries=default_retries,
+                 backoff=default_backoff, timeout=default_timeout):
+        self.source = source if source is not None else get_price_source()
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+    def _fetch_with_retries(self, request):
+        (ticker, interval, start, end) = request
+        for attempt in range(self.retries + 1):
+            try:
+                return self.source.fetch(ticker, interval, start, end, self.timeout)
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                if attempt == self.retries:
+                    print(f'Fetching {ticker} {interval} failed after {attempt + 1} attempts: {e}')
+                    return pd.DataFrame()
+                delay = self.backoff * 2**attempt * (1 + 0.1 * random.random())
+                print(f'Fetching {ticker} {interval} failed ({e}), retrying in {delay:.1f}s')
+                time.sleep(delay)
+
+    def fetch_all(self, fetch_requests):
+        """
+        Args:
+            fetch_requests (list): (ticker, interval, start, end) tuples. Duplicates are fetched once.
+
+        Returns:
+            dict: {request: DataFrame}. Empty DataFrame for the requests that still failed after the retries.
+
+        Raises:
+            Exception: The first error that is not retried (e.g. requests.HTTPError 404 from HttpSource).
+        """
+        fetch_requests = list(dict.fromkeys(fetch_requests))
+        if len(fetch_requests) == 0:
+            return {}
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(fetch_requests)))) as executor:
+            futures = {executor.submit(self._fetch_with_retries, request): request for request in fetch_requests}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+        return {request: results[request] for request in fetch_requests}
@@ -1,7 +1,7 @@
 import datetime
 from datetime import timedelta
 import pandas as pd
-import yfinance as yf
+from fetch_scheduler import FetchScheduler
 from preprocessing import ManipulateTimezone
 class Intraday:
     """
@@ -44,36 +44,43 @@ class Intraday:
         self.symbols = [i[0] for i in list(self.dict_symbols.values())]
         print('Your Ticker Dictionary:',self.dict_symbols)
 
-    def fetch_data_yfinance(self,specific_tickers=[]): 
-        """ Extracts Intraday data for specific tickers from Yahoo Finance.
+    def get_fetch_requests(self,specific_tickers=[]):
+        """ (ticker, interval, start, end) requests of the FetchScheduler for the tickers of this object.
+        start_intraday/end_intraday are days before today, -1 for no bound.
         """
         today = datetime.datetime.now()
-        data=pd.DataFrame()
-        if self.start_intraday!=-1 and self.end_intraday!=-1: 
-            # Both start and end date is specified
-            end=(today-timedelta(days=self.end_intraday)).strftime("%Y-%m-%d")
-            start = (today - timedelta(days=self.start_intraday)).strftime("%Y-%m-%d")
-            data = yf.download(tickers=self.tickers, start=start, end=end, interval=self.interval)
+        start = (today - timedelta(days=self.start_intraday)).strftime("%Y-%m-%d") if self.start_intraday!=-1 else None
+        end = (today - timedelta(days=self.end_intraday)).strftime("%Y-%m-%d") if self.end_intraday!=-1 else None
+        tickers = specific_tickers if specific_tickers!=[] else self.tickers
+        return [(ticker, self.interval, start, end) for ticker in tickers]
 
-        elif self.start_intraday==-1 and self.end_intraday==-1:
-            # Neither start nor end date is specified
-            data = yf.download(tickers=self.tickers, interval=self.interval)
-        # Return data for specific tickers as a dictionary 
-        try:        
-            if specific_tickers!=[]:
-                alltickerdata={}
-                stackeddata=data.stack(level=0,future_stack=False)
-                stackeddata.index.names=['Datetime','Price']
-                for col in stackeddata.columns:
-                    col_data=stackeddata[col].unstack()
-                    col_data.columns.name = None
-                    alltickerdata[col]=col_data
-                return alltickerdata
-            else:
-                return data
-        except Exception as e:
-            print(e)
-            return data
+    def fetch_data_yfinance(self,specific_tickers=[],scheduler=None,fetched=None):
+        """ Extracts Intraday data for specific tickers from Yahoo Finance, one concurrent request per ticker
+        (see fetch_scheduler.py).
+
+        Args:
+            specific_tickers (list): Tickers to return. Default: all the tickers of the object.
+            scheduler (FetchScheduler): Runs the requests. Default: FetchScheduler().
+            fetched (dict): Results of a FetchScheduler.fetch_all already run for these requests (e.g. for all
+                            the intervals of periodic_runner_main.py at once). Missing requests are fetched.
+
+        Returns:
+            dict: {ticker: DataFrame with a Datetime index and the price columns} if specific_tickers is given,
+                  else one DataFrame with (Price, Ticker) columns as yf.download.
+        """
+        fetch_requests = self.get_fetch_requests(specific_tickers)
+        fetched = dict(fetched) if fetched is not None else {}
+        missing = [request for request in fetch_requests if request not in fetched]
+        if missing!=[]:
+            scheduler = scheduler if scheduler is not None else FetchScheduler()
+            fetched.update(scheduler.fetch_all(missing))
+
+        alltickerdata={request[0]:fetched[request] for request in fetch_requests if not fetched[request].empty}
+        if specific_tickers!=[]:
+            return alltickerdata
+        if alltickerdata=={}:
+            return pd.DataFrame()
+        return pd.concat(alltickerdata,axis=1,names=['Ticker','Price']).swaplevel(axis=1).sort_index(axis=1)
         
     @classmethod
     def data_acquisition(self,cleandata):
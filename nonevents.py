@@ -5,38 +5,68 @@ class Nonevents:
     Filters the data based on events and non events
 
     """
+    # Rows within +/- window of an event of the given tier are removed. Tier1 removes the entire day.
+    default_tier_windows={'IND_Tier2':pd.Timedelta(minutes=30),
+                          'IND_Tier3':pd.Timedelta(minutes=15),
+                          'IND_FED':pd.Timedelta(minutes=30)}
+
     def __init__(self,dataframe):
         self.dataframe=dataframe    #dataframe contains the event time stamps, sessions, tiers only. No price data included (filtered_df is this).
 
-    def filter_nonevents(self,df):
+    @staticmethod
+    def flag_time_window(timestamps,event_flags,time_window):
+        """
+        Flags every timestamp lying within +/- time_window of a flagged event.
+
+        Sorted-interval sweep: the event windows are sorted and merged (running max of the window ends),
+        then each row finds the last window starting at or before it with np.searchsorted.
+        O((rows + events) log events) instead of one full-frame mask per event.
+
+        Args:
+            timestamps (np.ndarray): datetime64 values of the rows (need not be sorted).
+            event_flags (np.ndarray): Boolean array, True where the row is an event of the tier.
+            time_window (pd.Timedelta): Half-width of the window around each event.
+
+        Returns:
+            np.ndarray: 0/1 flags, one per row.
+        """
+        window=np.timedelta64(pd.Timedelta(time_window))
+        event_times=np.sort(timestamps[event_flags])
+        event_times=event_times[~np.isnat(event_times)]
+        if len(event_times)==0:
+            return np.zeros(len(timestamps),dtype=int)
+
+        starts=event_times-window
+        ends=np.maximum.accumulate(event_times+window) # merged windows: a row is covered if it is before the furthest end so far
+
+        window_index=np.searchsorted(starts,timestamps,side='right')-1
+        covered=(window_index>=0) & (timestamps<=ends[np.clip(window_index,0,None)]) #NaT compares False
+        return covered.astype(int)
+
+    def filter_nonevents(self,df,tier_windows=None):
+        if tier_windows is None:
+            tier_windows=self.default_tier_windows
+
         df['timestamp'] = pd.to_datetime(df['timestamp'])  # Ensure timestamp is datetime
         df['date'] = df['timestamp'].dt.date  # Extract date
         df['IND_NE_remove'] = 0  # Initialize with 0
 
         # Flag 'ind_ne' for entire day when IND_Tier1 is 1
-        tier1_dates = df.loc[df['IND_Tier1'] == 1, 'date'].unique()
+        tier1_dates = df.loc[(df['IND_Tier1'] == 1).fillna(False), 'date'].unique()
         df.loc[df['date'].isin(tier1_dates), 'IND_NE_remove'] = 1
 
         # Handle time windows for IND_Tier2, IND_Tier3, and IND_FED
-        def flag_time_window(tier_col, time_window):
-            flags = np.zeros(len(df), dtype=int)
-            for _, row in df.iterrows():
-                if row[tier_col] == 1:
-                    start_time = row['timestamp'] - time_window
-                    end_time = row['timestamp'] + time_window
-                    within_window = (df['timestamp'] >= start_time) & (df['timestamp'] <= end_time)
-                    flags |= (within_window).values #bit-wise or
-            return flags
-
-        # Apply time-based flagging
-        df['ind_tier2'] = flag_time_window('IND_Tier2', pd.Timedelta(minutes=30))
-        df['ind_tier3'] = flag_time_window('IND_Tier3', pd.Timedelta(minutes=15))
-        df['ind_fed'] = flag_time_window('IND_FED', pd.Timedelta(minutes=30))
+        timestamps=df['timestamp'].values
+        window_cols=[]
+        for tier_col,time_window in tier_windows.items():
+            window_col=f'{tier_col.lower()}_window'
+            df[window_col]=self.flag_time_window(timestamps,(df[tier_col]==1).fillna(False).to_numpy(dtype=bool),time_window)
+            window_cols.append(window_col)
 
         # Combine all flags
-        df['IND_NE_remove'] = df[['IND_NE_remove', 'ind_tier2', 'ind_tier3', 'ind_fed']].max(axis=1)
+        df['IND_NE_remove'] = df[['IND_NE_remove']+window_cols].max(axis=1)
 
         # Clean up intermediate columns
-        df.drop(['ind_tier2', 'ind_tier3', 'ind_fed', 'date'], axis=1, inplace=True)
-        
+        df.drop(window_cols+['date'], axis=1, inplace=True)
+
         return df
@@ -3,10 +3,24 @@ import os
 import shutil #deleting directories
 import pandas as pd
 from intradaydata import Intraday
+from fetch_scheduler import FetchScheduler
 from intradaydata_investing import Intraday_Investing
 from preprocessing import ManipulateTimezone
 from tzlocal import get_localzone  # Automatically detects system timezone
 
+DEFAULT_YAHOO_SYMBOLS={
+    "ZN=F":["ZN","10-Year T-Note Futures"],
+    "ZB=F":["ZB","30-Year T-Bond Futures"],
+    "ZF=F":["ZF","5-Year US T-Note Futures"],
+    "ZT=F":["ZT","2-Year US T-Note Futures"],
+    "DX-Y.NYB":["DXY","US Dollar Index"],
+    "CL=F":["CL","Crude Oil futures"],
+    "GC=F":["GC","Gold futures"],
+    "NQ=F":["NQ","Nasdaq 100 futures"],
+    "^DJI":["DJI","Dow Jones Industrial Average"],
+    "^GSPC":["GSPC","S&P 500"]
+}
+
 def _add_target_tz_col(intraday_csv,current_tz='UTC',final_tz='US/Eastern',tickerinterval=''):
     
     new_col=final_tz+' Timezone'
@@ -32,11 +46,12 @@ def _save_data(Intraday_data_files,
               return_interval, 
               IntradayObject,
               mysymboldict,
-              website='yahoo finance'
+              website='yahoo finance',
+              fetched=None
              ):
     
     if website=='yahoo finance':
-        alldatadict=IntradayObject.fetch_data_yfinance(specific_tickers=IntradayObject.tickers) #Get dictionary of specific intraday data that we want to store
+        alldatadict=IntradayObject.fetch_data_yfinance(specific_tickers=IntradayObject.tickers,fetched=fetched) #Get dictionary of specific intraday data that we want to store
         fetched_tz='UTC'
     elif website=='investing':
         alldatadict={list(mysymboldict.values())[0][0]:IntradayObject.fetch_data_investing()}
@@ -132,31 +147,42 @@ def _save_data(Intraday_data_files,
         # final_stats_csv.to_csv(stored_csv_path_stats)
         
    
+def prefetch_yfinance(cases,scheduler=None):
+    """ Fetches the Yahoo Finance data of all the runner cases at once: every (ticker, interval) is its own
+    request and they run concurrently (see fetch_scheduler.py), instead of one case after the other.
+
+    Args:
+        cases (list): runner keyword arguments (start, end, ticker_interval, dic) of the yahoo finance cases.
+        scheduler (FetchScheduler): Default: FetchScheduler().
+
+    Returns:
+        dict: FetchScheduler.fetch_all results, passed to runner as fetched.
+    """
+    fetch_requests=[]
+    for case in cases:
+        my_intraday_obj=Intraday(start_intraday=case['start'],
+                                end_intraday=case['end'],
+                                interval=case['ticker_interval'])
+        my_intraday_obj.update_dict_symbols(DEFAULT_YAHOO_SYMBOLS if case.get('dic','default')=='default' else case['dic'])
+        fetch_requests+=my_intraday_obj.get_fetch_requests()
+    scheduler=scheduler if scheduler is not None else FetchScheduler()
+    return scheduler.fetch_all(fetch_requests)
+
 def runner(start,
            end,
            ticker_interval,
            Intraday_data_files,
            Daily_backup_files,
            dic='default',
-           mywebsite='yahoo finance'
+           mywebsite='yahoo finance',
+           fetched=None
           ):
     if mywebsite=='yahoo finance':
         my_intraday_obj=Intraday(start_intraday=start,
                                 end_intraday=end,
                                 interval=ticker_interval)
         if dic=='default':
-            mysymboldict={
-            "ZN=F":["ZN","10-Year T-Note Futures"],
-            "ZB=F":["ZB","30-Year T-Bond Futures"],
-            "ZF=F":["ZF","5-Year US T-Note Futures"],
-            "ZT=F":["ZT","2-Year US T-Note Futures"],
-            "DX-Y.NYB":["DXY","US Dollar Index"],
-            "CL=F":["CL","Crude Oil futures"],
-            "GC=F":["GC","Gold futures"],
-            "NQ=F":["NQ","Nasdaq 100 futures"],
-            "^DJI":["DJI","Dow Jones Industrial Average"],
-            "^GSPC":["GSPC","S&P 500"]
-            }
+            mysymboldict=DEFAULT_YAHOO_SYMBOLS
         else:
             mysymboldict=dic
 
@@ -167,7 +193,8 @@ def runner(start,
         return_interval=ticker_interval,
         IntradayObject=my_intraday_obj,
         mysymboldict=mysymboldict,
-        website=mywebsite
+        website=mywebsite,
+        fetched=fetched
         )
 
     elif mywebsite=='investing':
@@ -206,44 +233,40 @@ if __name__=='__main__':
     os.makedirs('temp',exist_ok=True) # Temporary file to hold new Intraday data. Later gets renamed to "Intraday_data_files" after new and old data gets Merged
     
     
-    # Case:1
-    runner(start=-1,
-           end=-1,
-           ticker_interval='1m',
-           dic='default',
-           Intraday_data_files=INTRADAY_FILES,
-           Daily_backup_files=DAILY_FILES
-          )
+    yahoo_cases=[
+        # Case:1
+        dict(start=-1,
+             end=-1,
+             ticker_interval='1m',
+             dic='default'),
 
-    
-    # Case:2
-    runner(start=710,
-           end=-10,
-           ticker_interval='1h',
-           dic={"ZN=F":["ZN","10-Year T-Note Futures"]},
-           Intraday_data_files=INTRADAY_FILES,
-           Daily_backup_files=DAILY_FILES
-          )
-    
+        # Case:2
+        dict(start=710,
+             end=-10,
+             ticker_interval='1h',
+             dic={"ZN=F":["ZN","10-Year T-Note Futures"]}),
 
-    # Case:3
-    runner(start=15,
-           end=-3,
-           ticker_interval='15m',
-           dic={"ZN=F":["ZN","10-Year T-Note Futures"]},
-           Intraday_data_files=INTRADAY_FILES,
-           Daily_backup_files=DAILY_FILES
-          )
-    
+        # Case:3
+        dict(start=15,
+             end=-3,
+             ticker_interval='15m',
+             dic={"ZN=F":["ZN","10-Year T-Note Futures"]}),
+
+        # Case:4
+        dict(start=-1,
+             end=-1,
+             ticker_interval='1d',
+             dic={"ZN=F":["ZN","10-Year T-Note Futures"]}),
+    ]
 
-    # Case:4
-    runner(start=-1,
-           end=-1,
-           ticker_interval='1d',
-           dic={"ZN=F":["ZN","10-Year T-Note Futures"]},
-           Intraday_data_files=INTRADAY_FILES,
-           Daily_backup_files=DAILY_FILES
-          )
+    # The (ticker, interval) requests of cases 1-4 are downloaded concurrently, then merged and saved case by case.
+    fetched=prefetch_yfinance(yahoo_cases)
+    for case in yahoo_cases:
+        runner(**case,
+               Intraday_data_files=INTRADAY_FILES,
+               Daily_backup_files=DAILY_FILES,
+               fetched=fetched
+              )
     
     # Case:5: FGBL from investing.com
     runner(
@@ -7,7 +7,8 @@ class ManipulateTimezone:
     def __init__(self,data):
         self.dataframe=pd.DataFrame(data)
 
-    def _check_timezone(self, checkdf="", tz_col="", default_tz = "Asia/Kolkata", target_tz = "US/Eastern"):
+    def _check_timezone(self, checkdf="", tz_col="", default_tz = "Asia/Kolkata", target_tz = "US/Eastern",
+                        ambiguous="raise", nonexistent="raise"):
         """
         Checks the timezone of a timestamp column in the DataFrame and 
         converts it to target timezone
@@ -16,6 +17,8 @@ class ManipulateTimezone:
             dataframe (pd.DataFrame): Instrument Data with intra-day data in a Pandas DataFrame.
             tz_col (str, optional): Name of the column containing datetime values.
                                     If not provided, the method will attempt to detect it.
+            ambiguous (str): DST policy for naive times that occur twice in default_tz (see Series.dt.tz_localize).
+            nonexistent (str): DST policy for naive times that do not exist in default_tz (see Series.dt.tz_localize).
 
         Returns:
             pd.DataFrame: DataFrame with the timezone converted to US/Eastern.
@@ -34,15 +37,24 @@ class ManipulateTimezone:
             raise ValueError("No timestammp column found. Please specify the 'tz_col' argument.")
 
         # Convert column to datetime format
-        dataframe[tz_col]=pd.to_datetime(dataframe[tz_col])
+        timestamps=pd.to_datetime(dataframe[tz_col])
 
-        # Apply timezone conversion
-        dataframe[tz_col]=dataframe[tz_col].apply(
-            lambda tz_info:self._convert_timezone(tz_info,default_tz,target_tz))
+        # Apply timezone conversion on the whole column
+        if isinstance(timestamps.dtype, pd.DatetimeTZDtype):
+            # Already tz-aware: only convert
+            dataframe[tz_col]=timestamps.dt.tz_convert(target_tz)
+        elif pd.api.types.is_datetime64_dtype(timestamps):
+            # Naive: the times are in default_tz
+            dataframe[tz_col]=timestamps.dt.tz_localize(
+                default_tz, ambiguous=ambiguous, nonexistent=nonexistent).dt.tz_convert(target_tz)
+        else:
+            # Object column (mixed UTC offsets or naive and tz-aware values): one timestamp at a time
+            dataframe[tz_col]=timestamps.apply(
+                lambda tz_info:self._convert_timezone(tz_info,default_tz,target_tz,ambiguous,nonexistent))
         return dataframe
     
     @staticmethod
-    def _convert_timezone(tz_info, default_tz, target_tz):
+    def _convert_timezone(tz_info, default_tz, target_tz, ambiguous="raise", nonexistent="raise"):
         """
         Converts a single timestamp to the target timezone.
 
@@ -50,18 +62,20 @@ class ManipulateTimezone:
             tz_info (pd.Timestamp): A timestamp value.
             default_tz (str): The default timezone to localize naive timestamps.
             target_tz (str): The target timezone for conversion.
+            ambiguous (str): DST policy for ambiguous naive times (see pd.Timestamp.tz_localize).
+            nonexistent (str): DST policy for nonexistent naive times (see pd.Timestamp.tz_localize).
 
         Returns:
             pd.Timestamp: Timestamp converted to the target timezone.
         """
         if tz_info.tzinfo is None:  # Check if timezone is missing
-            tz_info = tz_info.tz_localize(default_tz)
+            tz_info = tz_info.tz_localize(default_tz, ambiguous=ambiguous, nonexistent=nonexistent)
         tz_info=tz_info.tz_convert(target_tz)
         return tz_info
     
 
-    def change_timezone(self,checkdf,tz_col, default_tz,target_tz):
-        return self._check_timezone(checkdf,tz_col, default_tz,target_tz)
+    def change_timezone(self,checkdf,tz_col, default_tz,target_tz,ambiguous="raise",nonexistent="raise"):
+        return self._check_timezone(checkdf,tz_col, default_tz,target_tz,ambiguous,nonexistent)
     
 
     @staticmethod
@@ -69,8 +83,15 @@ class ManipulateTimezone:
         # Convert 1d interval dataframe to datetime. It adds  00:00:00 by default since no time value.
         day_interval_dataframe[target_col] = pd.to_datetime(day_interval_dataframe[target_col], errors='coerce')
 
-        # Change time of rows to 23:59:59
-        day_interval_dataframe[target_col] = day_interval_dataframe[target_col].apply(lambda x: x.replace(hour=23, minute=59, second=59))
+        # Change time of rows to 23:59:59 (wall time, sub-second part kept like Timestamp.replace)
+        timestamps = day_interval_dataframe[target_col]
+        tz = timestamps.dt.tz
+        if tz is not None:
+            timestamps = timestamps.dt.tz_localize(None)
+        timestamps = timestamps.dt.normalize() + pd.Timedelta(hours=23, minutes=59, seconds=59) + (timestamps - timestamps.dt.floor('s'))
+        if tz is not None:
+            timestamps = timestamps.dt.tz_localize(tz, ambiguous="raise", nonexistent="raise")
+        day_interval_dataframe[target_col] = timestamps
         
         return day_interval_dataframe
     
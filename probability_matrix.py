@@ -1,33 +1,119 @@
-import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import os
-from returns_main import folder_processed_pq
-import re
+from periodic_runner_main import INTRADAY_FILES as Intraday_data_files
+import hashlib
+import json
+import density_estimation
+import dataset_registry
+from ecdf_index import ECDFIndex
+from streaming_stats import DistributionSummary
+
+folder_processed_pq = Intraday_data_files+'_processed_folder_pq'
+folder_prob_matrix_cache = Intraday_data_files+'_prob_matrix_cache'
+prob_matrix_cache_hrs = 120 # horizons precomputed by returns_main.py; longer requests are computed on the fly
+prob_matrix_versions = ['Absolute','Up','Down','No-Version']
+prob_matrix_cache_manifest = 'prob_matrix_cache_manifest.json'
+
+# Bars of the Probability Matrix: the non-event bars of returns_main.py or all the raw bars (see dataset_registry).
+prob_matrix_stages = {'Non-Event':'nonevents', 'All data':'raw'}
+prob_matrix_columns = ['Open','High','Low','Close']
+
+def _get_source_path(interval,ticker_name,data_type):
+    dataset=dataset_registry.get_dataset_registry().find(ticker_name,interval,prob_matrix_stages.get(data_type,'raw'))
+    return None if dataset is None else dataset['path']
+
+def _load_source(interval,ticker_name,data_type):
+    return dataset_registry.load(ticker_name,interval,prob_matrix_stages.get(data_type,'raw'),columns=prob_matrix_columns)
+
+# Content hash of a source parquet, memoized on (path, mtime, size) so Streamlit reruns don't rehash the file.
+_file_hash_memo={}
+def _file_hash(path):
+    stat=os.stat(path)
+    memo_key=(path,stat.st_mtime_ns,stat.st_size)
+    if memo_key not in _file_hash_memo:
+        sha=hashlib.sha256()
+        with open(path,'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        _file_hash_memo[memo_key]=sha.hexdigest()
+    return _file_hash_memo[memo_key]
+
+def _read_cache_manifest(cache_folder):
+    manifest_path=os.path.join(cache_folder,prob_matrix_cache_manifest)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def update_prob_matrix_cache(interval,ticker_name,data_type,max_hrs=prob_matrix_cache_hrs,cache_folder=folder_prob_matrix_cache):
+    """
+    Precomputes the hour x bps movement counts of every version (and of max(high-open, open-low)) for
+    one (ticker, interval, data type) and stores them as parquets in the cache folder. The entry is
+    keyed by the content hash of the source parquet and is only rebuilt when that hash changes.
+
+    Returns:
+        dict: Manifest entry of the cache, or None if no source data was found.
+    """
+    source_path=_get_source_path(interval,ticker_name,data_type)
+    if source_path is None:
+        print(f"No source data for the Probability Matrix cache: {ticker_name} {interval} {data_type}")
+        return None
+
+    os.makedirs(cache_folder,exist_ok=True)
+    source_hash=_file_hash(source_path)
+    manifest=_read_cache_manifest(cache_folder)
+    cache_key=f'{ticker_name}_{interval}_{data_type}'
+
+    entry=manifest.get(cache_key)
+    if (entry is not None and entry['source_hash']==source_hash and entry['max_hrs']>=max_hrs
+            and all(os.path.exists(os.path.join(cache_folder,fname)) for fname in entry['files'].values())):
+        print(f"Probability Matrix cache up to date: {cache_key}")
+        return entry
+
+    my_matrix=ProbabilityMatrix(_load_source(interval,ticker_name,data_type))
+    files={}
+    for ver in prob_matrix_versions+['OH_OL']:
+        fname=f"{ticker_name}_{interval}_{'_'.join(data_type.split())}_{ver}_prob_counts.parquet"
+        my_matrix.calc_prob_counts(max_hrs,ver).to_parquet(os.path.join(cache_folder,fname),engine='pyarrow')
+        files[ver]=fname
+
+    entry={'source':os.path.basename(source_path),
+           'source_hash':source_hash,
+           'max_hrs':max_hrs,
+           'files':files}
+    manifest[cache_key]=entry
+    with open(os.path.join(cache_folder,prob_matrix_cache_manifest),'w') as f:
+        json.dump(manifest,f,indent=2)
+    print(f"Probability Matrix cache saved for {cache_key} at: {cache_folder}")
+    return entry
+
+def load_prob_matrix_cache(interval,ticker_name,data_type,versions,target_hrs,cache_folder=folder_prob_matrix_cache):
+    """
+    Looks up the precomputed movement counts for the given versions.
+
+    Returns:
+        dict: {version: counts DataFrame} (plus 'OH_OL'), or None if the cache is missing,
+              stale wrt the source parquet or does not cover target_hrs.
+    """
+    entry=_read_cache_manifest(cache_folder).get(f'{ticker_name}_{interval}_{data_type}')
+    if entry is None or entry['max_hrs']<target_hrs:
+        return None
+
+    source_path=_get_source_path(interval,ticker_name,data_type)
+    if source_path is None or _file_hash(source_path)!=entry['source_hash']:
+        return None
+
+    cached_counts={}
+    for ver in list(versions)+['OH_OL']:
+        fname=entry['files'].get(ver)
+        if fname is None or not os.path.exists(os.path.join(cache_folder,fname)):
+            return None
+        cached_counts[ver]=pd.read_parquet(os.path.join(cache_folder,fname),engine='pyarrow')
+    return cached_counts
 
 def GetMatrix(target_bps,target_hrs,interval,ticker_name , data_type , version='NA'):
-    df=pd.DataFrame()
-
-    # used when unfiltered intraday data is to be taken,
-    pattern = re.compile(r"Intraday_data_ZN_1h_2022-12-20_to_(\d{4}-\d{2}-\d{2})\.parquet")
-
-    # Scan the desired folder for the non-events file with 1 hr interval and converted to target timezone
-    if(data_type == 'Non-Event'):
-      for file in os.scandir(folder_processed_pq):
-        if file.is_file():
-            print(file.name)
-            if all(x in str(file.name) for x in [interval, ticker_name, 'nonevents','target_tz']) and file.name.endswith('.parquet'):
-              print("data used for Probabilty Matrix: " , file.name)
-              df=pd.read_parquet(os.path.join(folder_processed_pq,file.name))
-    else:
-       for file in os.scandir("Intraday_data_files_pq"):
-          if file.is_file():
-            match = pattern.match(file.name)
-            if match:
-               print("data used for Probabilty Matrix: " , file.name)
-               df = pd.read_parquet(os.path.join("Intraday_data_files_pq" , file.name))
-
     # Store probability, graph and probability matrix for all the three versions
     if version=='NA':
         version_dic={'Absolute':{},
@@ -38,7 +124,20 @@ def GetMatrix(target_bps,target_hrs,interval,ticker_name , data_type , version='
        version_dic={version:{} , 
                     "OH_OL_plot":{}}
 
-    my_matrix=ProbabilityMatrix(df)
+    # Look up the counts precomputed by returns_main.py; read and process the parquet only if the cache is missing or stale.
+    cached_counts=load_prob_matrix_cache(interval,ticker_name,data_type,
+                                         [ver for ver in version_dic if ver != "OH_OL_plot"],target_hrs)
+    if cached_counts is not None:
+        print("Probability Matrix served from cache: " , ticker_name , interval , data_type)
+        df=pd.DataFrame()
+    else:
+        source_path=_get_source_path(interval,ticker_name,data_type)
+        df=pd.DataFrame()
+        if source_path is not None:
+            print("data used for Probabilty Matrix: " , os.path.basename(source_path))
+            df=_load_source(interval,ticker_name,data_type)
+
+    my_matrix=ProbabilityMatrix(df,cached_counts=cached_counts)
     for ver in list(version_dic.keys()):
         print(ver)
         if(ver != "OH_OL_plot"):
@@ -52,9 +151,10 @@ def GetMatrix(target_bps,target_hrs,interval,ticker_name , data_type , version='
         
     
 class ProbabilityMatrix:
-    def __init__(self, df):
+    def __init__(self, df, cached_counts=None):
         self.df = df
         self.N=len(df)
+        self.cached_counts = cached_counts # {version: hour x bps counts} from load_prob_matrix_cache
         self.less_than_equal_percentile=None 
         self.greater_than_percentile=None
         self.greater_than_prob_matrix = None
@@ -67,7 +167,9 @@ class ProbabilityMatrix:
     def _plot_prob(self,bps_df,percentile,percentiles,target_bps,target_hrs,version):
       # Plot the histogram
       plt.figure(figsize=(10, 6))
-      sns.kdeplot(bps_df['bps'], color='blue', fill=True, cumulative=True) #Now shows cumulative probability i.e cdf
+      grid,_,cdf=density_estimation.get_kde(bps_df['bps'])
+      plt.plot(grid,cdf,color='blue') #Now shows cumulative probability i.e cdf
+      plt.fill_between(grid,cdf,color='blue',alpha=0.25)
 
       # Add title and labels
       plt.title(f'Probability Distribution for BPS ({version}): {target_bps} bps in {target_hrs} hrs')
@@ -136,32 +238,47 @@ class ProbabilityMatrix:
       return plt
     
 
+    def _calc_oh_ol_all_hours(self, target_hrs):
+      # max(high-open, open-low) for every start bar and every horizon 1..target_hrs in one sweep.
+      # The window [i, i+hrs] is the window [i, i+hrs-1] plus one bar, so the running High max / Low min
+      # only need one np.fmax/np.fmin per horizon (fmax/fmin skip NaNs like pandas max/min do).
+      open_arr = self.df['Open'].to_numpy(dtype=float)
+      high_arr = self.df['High'].to_numpy(dtype=float)
+      low_arr = self.df['Low'].to_numpy(dtype=float)
+      N = len(open_arr)
+
+      running_high = high_arr.copy()
+      running_low = low_arr.copy()
+      bps_oh_ol_dic = {}
+      for hrs in range(1, target_hrs + 1):
+        if hrs >= N:
+          bps_oh_ol_dic[hrs] = np.array([], dtype=float)
+          continue
+        running_high = np.fmax(running_high[:N - hrs], high_arr[hrs:])
+        running_low = np.fmin(running_low[:N - hrs], low_arr[hrs:])
+
+        n_windows = max(N - hrs - 1, 0) # same start bars as the original row loop
+        open_price = open_arr[:n_windows]
+        bps_oh_ol_dic[hrs] = np.maximum((running_high[:n_windows] - open_price) * 16,
+                                        (open_price - running_low[:n_windows]) * 16)
+      return bps_oh_ol_dic
+
     def calc_prob_helper(self ,hrs):
-      data_df = self.df.copy()
-      bps_oh_ol = []
-      for i in range(len(data_df)-hrs-1):
-        open_price = data_df['Open'].iloc[i]
-        max_high = data_df.iloc[i:i+hrs+1]['High'].max()
-        min_low = data_df.iloc[i:i+hrs+1]['Low'].min()
-        bps_oh_ol.append(max((max_high-open_price)*16 , (open_price - min_low)*16))
-      return bps_oh_ol
+      return self._calc_oh_ol_all_hours(hrs)[hrs]
        
 
-    def calc_prob(self,target_bps,target_hrs,version):
-      if version not in ['Absolute','Up','Down','No-Version']:
-        raise ValueError("Invalid version. Use 'Down', 'Absolute', 'Up' or 'No-Version'.")
-
-      bps_movements = []
-      bps_oh_ol_movements = []
-
+    def _calc_movements(self,target_hrs,version):
       prob_matrix_list=[]
       prob_matrix2_list = [] # for bps_oh_ol
 
+      # Rolling extrema for all the horizons at once, instead of calling calc_prob_helper for every hour.
+      bps_oh_ol_all_hours = self._calc_oh_ol_all_hours(target_hrs)
+
       for i in range(1, target_hrs + 1):
           bps = (self.df['Open'].iloc[:self.N - i].values - self.df['Close'].iloc[i:self.N].values) * 16  #Get it checked.
           bps=self._round_off(bps)
 
-          bps_oh_ol = self.calc_prob_helper(i)  # for the distribution of max(abs(open-high) , (abs(open-low))
+          bps_oh_ol = bps_oh_ol_all_hours[i]  # for the distribution of max(abs(open-high) , (abs(open-low))
           bps_oh_ol = self._round_off(bps_oh_ol)
 
           if version=='Down': #Where the movement is down movement,consider only those values; Convert the values to positive (but down movements)
@@ -174,26 +291,72 @@ class ProbabilityMatrix:
 
           # Store the number of hours and corresponding movements for that many hours in a dictionary;
           # Append the dictionary to the list for prob matrix
-          prob_matrix_list.append({i:bps.tolist()})
-          prob_matrix2_list.append({i:bps_oh_ol.tolist()})
+          prob_matrix_list.append({i:bps})
+          prob_matrix2_list.append({i:bps_oh_ol})
+      return prob_matrix_list, prob_matrix2_list
+
+    def _movement_counts(self,prob_matrix_list):
+      # Movements are rounded to half-points, so every hour is fully described by its counts per bps level.
+      # NaN movements (if any) collapse into a single last level.
+      all_movements = np.concatenate([np.asarray(list(dic.values())[0], dtype=float) for dic in prob_matrix_list])
+      unique_bps = np.unique(all_movements)
+      counts = {}
+      for dic in prob_matrix_list:
+          hour, bps_values = list(dic.items())[0]
+          bins = np.searchsorted(unique_bps, np.asarray(bps_values, dtype=float))
+          counts[str(hour)] = np.bincount(bins, minlength=len(unique_bps))
+      return pd.DataFrame(counts, index=pd.Index(unique_bps, name='bps'))
+
+    def _movements_from_counts(self,counts_df,target_hrs):
+      # Rebuild the per-hour movement lists (order within an hour does not matter downstream).
+      unique_bps = counts_df.index.to_numpy(dtype=float)
+      return [{i:np.repeat(unique_bps, counts_df[str(i)].to_numpy())} for i in range(1, target_hrs + 1)]
+
+    def calc_prob_counts(self,max_hrs,version):
+      """Hour x bps movement counts for hours 1..max_hrs; version 'OH_OL' gives the max(high-open, open-low) counts."""
+      if version=='OH_OL':
+        _, prob_matrix2_list = self._calc_movements(max_hrs,'No-Version')
+        return self._movement_counts(prob_matrix2_list)
+      prob_matrix_list, _ = self._calc_movements(max_hrs,version)
+      return self._movement_counts(prob_matrix_list)
+
+    def _get_movements(self,target_hrs,version):
+      if self.cached_counts is not None and version in self.cached_counts and 'OH_OL' in self.cached_counts:
+        return (self._movements_from_counts(self.cached_counts[version],target_hrs),
+                self._movements_from_counts(self.cached_counts['OH_OL'],target_hrs))
+      return self._calc_movements(target_hrs,version)
+
+    def _get_ecdf_index(self,movements,target_hrs,version):
+      # ECDF of the movements of hours 1..target_hrs, straight from the cached counts when available.
+      if self.cached_counts is not None and version in self.cached_counts:
+        counts_df=self.cached_counts[version]
+        return ECDFIndex(counts_df.index.to_numpy(dtype=float),
+                         counts_df[[str(i) for i in range(1, target_hrs + 1)]].sum(axis=1).to_numpy())
+      return ECDFIndex(movements)
 
-          # Store all the movements untill i<= number of hours for final percentile
-          bps_movements.extend(bps)
-          bps_oh_ol_movements.extend(bps_oh_ol)
+    def calc_prob(self,target_bps,target_hrs,version):
+      if version not in ['Absolute','Up','Down','No-Version']:
+        raise ValueError("Invalid version. Use 'Down', 'Absolute', 'Up' or 'No-Version'.")
+
+      prob_matrix_list, prob_matrix2_list = self._get_movements(target_hrs,version)
+
+      # Store all the movements untill i<= number of hours for final percentile
+      bps_movements = np.concatenate([np.asarray(list(dic.values())[0], dtype=float) for dic in prob_matrix_list])
+      bps_oh_ol_movements = np.concatenate([np.asarray(list(dic.values())[0], dtype=float) for dic in prob_matrix2_list])
 
-      bps_movements=np.array(bps_movements)
       bps_df = pd.DataFrame(bps_movements, columns=['bps'])
 
-      bps_oh_ol = np.array(bps_oh_ol)
       bps_oh_ol_df = pd.DataFrame(bps_oh_ol_movements, columns=['bps'])
 
-      percentile1 = (bps_df['bps'] <= target_bps).mean() * 100
+      ecdf1 = self._get_ecdf_index(bps_movements,target_hrs,version)
+      percentile1 = ecdf1.percentile(target_bps)
       print(f"Percentile (wrt all {version} movements) for {abs(target_bps)} bps: {percentile1}%ile")
-      percentiles1 = bps_df.describe(percentiles=[0.1,0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1])
+      percentiles1 = DistributionSummary.from_ecdf(ecdf1).describe([0.1,0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1]).to_frame('bps')
 
-      percentile2 = (bps_oh_ol_df['bps'] <= target_bps).mean() * 100
+      ecdf2 = self._get_ecdf_index(bps_oh_ol_movements,target_hrs,'OH_OL')
+      percentile2 = ecdf2.percentile(target_bps)
       print(f"Percentile (wrt all max movements from open) for {abs(target_bps)} bps: {percentile2}%ile")
-      percentiles2 = bps_oh_ol_df.describe(percentiles=[0.1,0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1])
+      percentiles2 = DistributionSummary.from_ecdf(ecdf2).describe([0.1,0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1]).to_frame('bps')
       
       prob_matrix=self._calc_prob_matrix(prob_matrix_list,bps_movements,version)
       prob_matrix2 = self._calc_prob_matrix(prob_matrix2_list,bps_oh_ol_movements,'Absolute')
@@ -206,56 +369,50 @@ class ProbabilityMatrix:
 
     def _calc_prob_matrix_helper(self, prob_matrix_list, unique_hrs_array, unique_bps_array):
         # Convert to NumPy arrays and sort
-        unique_bps_array = np.sort(np.array(unique_bps_array))
+        unique_bps_array = np.sort(np.asarray(unique_bps_array, dtype=float))
         unique_hrs_array = sorted(unique_hrs_array)
 
-        # Initialize an empty list for each hour (fixes shallow copy issue)
-        total_bps_array_for_all_hours = [[] for _ in unique_hrs_array]
+        # Histogram/prefix-sum backend: bin every hour's movements once against the sorted bps levels,
+        # accumulate the bins over the hours (hour h pools all the movements of hours 1..h) and read
+        # Pr(bps <= level) for every level off the cumulative counts.
+        running_counts = np.zeros(len(unique_bps_array), dtype=np.int64)
+        running_total = 0
 
-        # Find the corresponding BPS movements for every hour
-        total_bps = []
-        for dic in prob_matrix_list:
-            total_bps.extend(list(dic.values())[0])  # Flatten values
-            hour = list(dic.keys())[0]
-            
-            if hour in unique_hrs_array:
-                hour_index = unique_hrs_array.index(hour)
-                total_bps_array_for_all_hours[hour_index] = total_bps.copy()  # Store a copy
+        # Initialize an empty array for each hour
+        percentile_bps_array_for_all_hours = [np.full(len(unique_bps_array), np.nan) for _ in unique_hrs_array]
 
-        # Store the percentiles for all hours
-        percentile_bps_array_for_all_hours = []
-
-        for total_bps in total_bps_array_for_all_hours:
-            # Convert total_bps to NumPy array
-            bps_values = np.array(total_bps)
+        for dic in prob_matrix_list:
+            hour, bps_values = list(dic.items())[0]
+            bps_values = np.asarray(bps_values, dtype=float)
 
-            # Compute percentiles for each unique BPS value
-            percentile_bps_array = 100 - np.array([
-                np.mean(bps_values <= target_bps) * 100
-                for target_bps in unique_bps_array
-            ])
+            # NaN movements never satisfy bps <= level but still count in the denominator
+            running_total += len(bps_values)
+            bps_values = bps_values[~np.isnan(bps_values)]
 
-            # Round and convert to string format with '%'
-            percentile_bps_array = np.char.add(np.round(percentile_bps_array, 2).astype(str), '%')
+            # Index of the largest level <= value; values below the smallest level fall in no bin
+            bins = np.searchsorted(unique_bps_array, bps_values, side='right') - 1
+            running_counts += np.bincount(bins[bins >= 0], minlength=len(unique_bps_array))
 
-            # Append the computed array for this hour
-            percentile_bps_array_for_all_hours.append(percentile_bps_array)
+            if hour in unique_hrs_array and running_total > 0:
+                hour_index = unique_hrs_array.index(hour)
+                less_than_equal = np.cumsum(running_counts) / running_total * 100
+                percentile_bps_array_for_all_hours[hour_index] = np.round(100 - less_than_equal, 2)
 
         return percentile_bps_array_for_all_hours
 
 
     def _calc_prob_matrix(self, prob_matrix_list, all_movements,version):
         # Unique movements (index) and hours (columns)
-        unique_bps = sorted(list(set(all_movements)))
+        all_movements = np.asarray(all_movements, dtype=float)
+        unique_bps = np.unique(all_movements[~np.isnan(all_movements)])
         all_hours = [list(dic.keys())[0] for dic in prob_matrix_list]
 
-        # Create an empty DataFrame for the probability matrix
-        prob_matrix = pd.DataFrame(columns=all_hours, index=unique_bps)
-
         # Apply the helper function to get percentile
         percentile_bps_array=self._calc_prob_matrix_helper(prob_matrix_list, all_hours,unique_bps)
-        for index,col in enumerate(prob_matrix):
-          prob_matrix[col]=percentile_bps_array[index]
+
+        # Probability matrix of Pr(bps > index) in % for every hour, stored as floats
+        prob_matrix = pd.DataFrame(np.column_stack(percentile_bps_array) if percentile_bps_array else None,
+                                   index=unique_bps, columns=sorted(all_hours), dtype=float)
         
         prob_matrix.index.name=f'bps Pr(bps ({version}) > )'
         prob_matrix.columns.name=f'hrs'
@@ -1,14 +1,18 @@
 import os
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from events import Events
-from scipy.stats import percentileofscore
+import distribution_charts
+import density_estimation
+from ecdf_index import get_ecdf_index_path, save_ecdf_indexes
+from streaming_stats import DistributionSummary, SessionStats, stats_percentiles
 from datetime import datetime
 
 class Returns:
     def __init__(
-        self, output_folder="stats_and_plots_folder", dataframe=pd.DataFrame()
+        self, output_folder="stats_and_plots_folder", dataframe=pd.DataFrame(), output_mode="png"
     ):
         self.colors = {
             "deep_black": "#000000",
@@ -29,8 +33,19 @@ class Returns:
         ]
         self.output_folder = output_folder
         self.dataframe = dataframe
+        # "png": static 300 dpi plots, "chart_data": histogram/KDE json for the dashboard charts only, "both".
+        if output_mode not in ("png", "chart_data", "both"):
+            raise ValueError(f"Invalid output_mode: {output_mode}. Choose 'png', 'chart_data' or 'both'.")
+        self.output_mode = output_mode
         os.makedirs(self.output_folder, exist_ok=True)
 
+        # Hour -> session lookup table used by get_sessions, built from get_session so both always agree.
+        self.session_categories = self.sessions[:-1] + ["Other"]
+        self.session_code_by_hour = np.array(
+            [self.session_categories.index(self.get_session(pd.Timestamp(2000, 1, 1, hour))) for hour in range(24)]
+        )
+        self._intraday_data = None
+
     def get_session(self, timestamp):
         hour = timestamp.hour
         # minute = timestamp.minute
@@ -47,6 +62,29 @@ class Returns:
         else:
             return "Other"
 
+    def get_sessions(self, timestamps):
+        """
+        Vectorized get_session for a whole datetime Series: one table lookup indexed by dt.hour.
+
+        Returns:
+            pd.Categorical: Session of every timestamp ("Other" for hours outside the sessions and NaT).
+        """
+        hours = timestamps.dt.hour.to_numpy(dtype=float, na_value=np.nan)
+        codes = np.full(len(hours), self.session_categories.index("Other"))
+        valid = ~np.isnan(hours)
+        codes[valid] = self.session_code_by_hour[hours[valid].astype(int)]
+        return pd.Categorical.from_codes(codes, categories=self.session_categories)
+
+    def _get_intraday_data(self):
+        # Unfiltered intraday data (for the red dot) with session and date labels.
+        # Computed once per Returns object and shared by both plotting paths.
+        if self._intraday_data is None:
+            intraday_data = self.dataframe.copy()
+            intraday_data['session'] = self.get_sessions(intraday_data['timestamp'])
+            intraday_data['date'] = intraday_data['timestamp'].dt.date
+            self._intraday_data = intraday_data
+        return self._intraday_data
+
 
     def filter_date(
         self,
@@ -59,7 +97,7 @@ class Returns:
         self.month_day_filter=month_day_filter
         df = filter_df.copy()
         if to_sessions == True:
-            df["session"] = df["timestamp"].apply(self.get_session)
+            df["session"] = self.get_sessions(df["timestamp"])
 
         if month_day_filter == []:
             if start_date == end_date == "":
@@ -88,22 +126,14 @@ class Returns:
                 & (df["timestamp"].dt.day <= day2)
             ]
         finaldf["year"] = (finaldf["timestamp"].dt.year).astype("Int64")
-        finaldf = finaldf.sort_values("timestamp")
+        finaldf = finaldf.sort_values("timestamp", kind="stable")
         
 
         return finaldf
     
     def get_descriptive_stats(self,target_csv,target_column):
-        
-        stats_csv=target_csv[target_column].describe(percentiles=[0.1,0.25,0.5,0.75,0.95,0.99])
-
-        # Add additional statistics to the DataFrame
-        stats_csv.loc['mean'] = target_csv[target_column].mean()
-        stats_csv.loc['skewness'] = target_csv[target_column].skew()
-        stats_csv.loc['kurtosis'] = target_csv[target_column].kurtosis()
-
-        stats_csv.index.name = 'Volatility of Returns Statistic'
-        return stats_csv
+        # describe (10/25/50/75/95/99%) + skewness and kurtosis, in one pass (see streaming_stats)
+        return DistributionSummary.from_values(target_csv[target_column]).get_descriptive_stats(name=target_column)
 
     # Close Price when the session ended - Open Price when the session started
     def _calculate_return_bps(self, group,bps_factor):
@@ -111,14 +141,99 @@ class Returns:
     def _calculate_return_bps2(self, group,bps_factor):
         return (group["Close"].iloc[-1]-group["Open"].iloc[0]) * bps_factor
 
+    def get_session_bars(self, df, bps_factor, target_column='timestamp', by_session=True, by_date=True):
+        """
+        Aggregates the bars into one OHLC bar per date (and session) in a single groupby pass.
+
+        Args:
+            df (pd.DataFrame): Bars with Open, High, Low, Close (and session if by_session).
+            bps_factor (int): Multiplier converting price moves to bps.
+            target_column (str): Column to group on.
+            by_session (bool): Group by session as well.
+            by_date (bool): Group by the date of target_column; if False, group by target_column itself.
+
+        Returns:
+            pd.DataFrame: date (or target_column), [session], open, high, low, close, [volume], n_bars,
+                          return (close-open), abs_return and volatility (high-low) in bps.
+        """
+        keys = [df[target_column].dt.date.rename("date") if by_date else df[target_column]]
+        if by_session:
+            keys.append("session")
+        grouped = df.groupby(keys, observed=True)
+
+        # first/last with skipna=False: same rows as iloc[0]/iloc[-1] of each group
+        bars = pd.DataFrame({
+            "open": grouped["Open"].first(skipna=False),
+            "high": grouped["High"].max(),
+            "low": grouped["Low"].min(),
+            "close": grouped["Close"].last(skipna=False),
+        })
+        if "Volume" in df.columns and pd.api.types.is_numeric_dtype(df["Volume"]): # some sources store volume as text e.g. '132.15K'
+            bars["volume"] = grouped["Volume"].sum()
+        bars["n_bars"] = grouped.size()
+        bars["return"] = (bars["close"] - bars["open"]) * bps_factor
+        bars["abs_return"] = bars["return"].abs()
+        bars["volatility"] = bps_factor * (bars["high"] - bars["low"])
+        return bars.reset_index()
+
+    def get_session_bar_store(self, ne_filtered_df, bps_factor, tagged_df=None):
+        """
+        Builds the columnar session-bar store: one row per date x session, plus an "All day" row per date.
+
+        Columns:
+            date, session,
+            open, high, low, close, [volume], n_bars, return, abs_return, volatility: all the bars of the
+                unfiltered intraday data (self.dataframe, used for the red dot),
+            ne_*: the same for the non-event bars only (used for the distributions),
+            n_events, IND_*: number of events and event flags of the (date, session), if tagged_df is given.
+
+        Returns:
+            pd.DataFrame: Session-bar store sorted by date and session.
+        """
+        def _with_all_day(by_session, by_date):
+            # session rows + "All day" rows with the session column as plain strings
+            session_rows = by_session.assign(session=by_session["session"].astype(str))
+            day_rows = by_date.assign(session="All day")
+            return pd.concat([session_rows, day_rows], ignore_index=True)
+
+        def _bars(df, prefix):
+            bars = _with_all_day(self.get_session_bars(df, bps_factor),
+                                 self.get_session_bars(df, bps_factor, by_session=False))
+            return bars.rename(columns={col: prefix + col for col in bars.columns if col not in ["date", "session"]})
+
+        store = _bars(self._get_intraday_data(), "").merge(
+            _bars(ne_filtered_df, "ne_"), on=["date", "session"], how="outer"
+        )
+
+        if tagged_df is not None:
+            flag_cols = [col for col in tagged_df.columns if str(col).startswith("IND_")]
+            date_key = tagged_df["timestamp"].dt.date.rename("date")
+
+            def _events(keys):
+                grouped = tagged_df.groupby(keys, observed=True)
+                events = grouped[flag_cols].max()
+                events.insert(0, "n_events", grouped["events"].count())
+                return events.reset_index()
+
+            events = _with_all_day(_events([date_key, "session"]), _events([date_key]))
+            store = store.merge(events, on=["date", "session"], how="left")
+            store["n_events"] = store["n_events"].fillna(0).astype(int)
+            store[flag_cols] = store[flag_cols].fillna(0).astype(int)
+
+        for col in ["n_bars", "ne_n_bars"]:
+            store[col] = store[col].fillna(0).astype(int)
+        store["session"] = pd.Categorical(store["session"], categories=self.session_categories + ["All day"])
+        return store.sort_values(["date", "session"]).reset_index(drop=True)
+
+    def _get_store_returns(self, session_bars, session, column, ne=True):
+        # [date, return] of one session from the session-bar store; ne=True takes the non-event bars.
+        rows = session_bars[(session_bars["session"] == session) & (session_bars["ne_n_bars" if ne else "n_bars"] > 0)]
+        return pd.DataFrame({"date": rows["date"].to_numpy(), "return": rows[column].to_numpy()})
+
     def get_daily_session_returns(self, df,bps_factor,target_column='timestamp',columns='NA'):
         
         if columns=='NA':
-            returns = (
-                df.groupby([df[target_column].dt.date, "session"], group_keys=False)
-                .apply(self._calculate_return_bps, bps_factor=bps_factor,include_groups=False)
-                .reset_index()
-            )
+            returns = self.get_session_bars(df, bps_factor, target_column)[["date", "session", "abs_return"]]
             returns.columns = ["date", "session", "return"]
         else:
             returns.columns=columns
@@ -127,37 +242,37 @@ class Returns:
     def get_daily_returns(self, df, bps_factor,target_column='timestamp',columns='NA'):
         
         if columns=='NA':
-            daily_returns_all = (
-            df.groupby(df[target_column].dt.date)
-            .apply(self._calculate_return_bps,bps_factor)
-            .reset_index()
-        )
+            daily_returns_all = self.get_session_bars(df, bps_factor, target_column, by_session=False)[["date", "abs_return"]]
             daily_returns_all.columns = ["date", "return"]
         else:
-            daily_returns_all = (
-            df.groupby(df[target_column])
-                .apply(self._calculate_return_bps2,bps_factor)
-                .reset_index()
-            )
+            daily_returns_all = self.get_session_bars(df, bps_factor, target_column, by_session=False, by_date=False)
+            daily_returns_all = daily_returns_all[[target_column, "return"]]
              
             daily_returns_all.columns = columns
 
         return daily_returns_all
 
-    def plot_daily_session_returns(self, filtered_df, tickersymbol_val, interval_val,bps_factor):
+    def plot_daily_session_returns(self, filtered_df, tickersymbol_val, interval_val,bps_factor, session_bars=None, session_stats=None):
 
         start_date = (filtered_df["timestamp"].dt.date.tolist())[0]
         end_date = (filtered_df["timestamp"].dt.date.tolist())[-1]
       
         sessions = self.sessions
 
-        #fetching the intraday data to make the red dot.
-        intraday_data = self.dataframe.copy()
-        intraday_data['session'] = intraday_data['timestamp'].apply(self.get_session)
-        intraday_data['date'] = intraday_data['timestamp'].dt.date
+        # Session-bar store (non-event bars + intraday bars for the red dot); every session takes its slice of it.
+        if session_bars is None:
+            session_bars = self.get_session_bar_store(filtered_df, bps_factor)
+        # Summaries (moments + ECDF) of every session and metric, the stats below are read from them.
+        if session_stats is None:
+            session_stats = SessionStats.from_session_bars(session_bars)
 
-        plt.figure(figsize=(24, 18))
-        sns.set_style("darkgrid")
+        write_png = self.output_mode in ("png", "both")
+        sessions_chart_data = []
+        session_ecdfs = {}
+
+        if write_png:
+            plt.figure(figsize=(24, 18))
+            sns.set_style("darkgrid")
         list_stats = []
 
         if 'd' in interval_val:
@@ -165,18 +280,17 @@ class Returns:
 
         for i, session in enumerate(sessions, 1):
 
-            plt.subplot(3, 2, i)
+            if write_png:
+                plt.subplot(3, 2, i)
 
             latest_return = -1
             latest_date = None
 
             if session != "All day":
-                daily_session_returns = self.get_daily_session_returns(filtered_df,bps_factor)
-                session_returns = daily_session_returns[daily_session_returns["session"] == session]["return"]
+                session_returns = self._get_store_returns(session_bars, session, "ne_abs_return")["return"]
 
                 # take unfiltered intraday day for the red dot so that actual movement is compared to non-evemt distro.
-                session_ret_intraday = self.get_daily_session_returns(intraday_data , bps_factor)
-                session_ret_intraday = session_ret_intraday[session_ret_intraday['session'] == session]
+                session_ret_intraday = self._get_store_returns(session_bars, session, "abs_return", ne=False)
                 latest_return = session_ret_intraday['return'].iloc[-1]
                 latest_date = session_ret_intraday['date'].iloc[-1]
                 print('latest date for red dot' , latest_date)
@@ -184,107 +298,113 @@ class Returns:
 
             else:
 
-                daily_returns_all = self.get_daily_returns(filtered_df,bps_factor)
+                daily_returns_all = self._get_store_returns(session_bars, "All day", "ne_abs_return")
                 session_returns = daily_returns_all["return"]
 
-                daily_ret_intraday = self.get_daily_returns(intraday_data ,bps_factor)
                 latest_return = session_returns.iloc[-1]
                 latest_date = daily_returns_all["date"].iloc[-1]
                 print('latest date for red dot' , latest_date)
 
+            summary = session_stats.get(session, "ne_abs_return")
+
             # Calculate the percentile of the latest return
-            latest_percentile = percentileofscore(
-                session_returns.squeeze(), latest_return, kind="rank"
-            )
+            session_ecdfs[session] = summary.ecdf
+            latest_percentile = summary.ecdf.percentile_of_score(latest_return, kind="rank")
 
             # Calculate descriptive stats
-            mean = session_returns.mean()
-            median = session_returns.median()
-            perc95 = session_returns.quantile(0.95)
-            perc99 = session_returns.quantile(0.99)
-            std = session_returns.std()
-            skew = session_returns.skew()
-            kurt = session_returns.kurtosis()
+            chart_stats = summary.get_chart_stats()
+            mean, median, std = chart_stats["mean"], chart_stats["median"], chart_stats["std"]
+            perc95, perc99 = chart_stats["perc95"], chart_stats["perc99"]
+            skew, kurt = chart_stats["skew"], chart_stats["kurt"]
             zscore=(latest_return-mean)/std
             latest_zscore=round(zscore,2)
+            latest_label=f"({latest_date}, Return:{latest_return:.2f}, Zscore: {latest_zscore}, %ile:{latest_percentile:.1f}%)"
 
-            sns.histplot(
-                session_returns, kde=True, stat="density", linewidth=0, color="skyblue"
-            )
-            sns.kdeplot(session_returns, color="darkblue", linewidth=2)
+            kde_grid, kde_pdf, _ = density_estimation.get_kde(session_returns)
+
+            if write_png:
+                sns.histplot(
+                    session_returns, stat="density", linewidth=0, color="skyblue"
+                )
+                plt.plot(kde_grid, kde_pdf, color="darkblue", linewidth=2)
 
            
-            # Add the latest return as a red point
-            plt.scatter(latest_return, 0, color="red", s=150, zorder=5)
-            plt.annotate(
-                f"({latest_date}, Return:{latest_return:.2f}, Zscore: {latest_zscore}, %ile:{latest_percentile:.1f}%)",
-                (latest_return, 0),
-                xytext=(10, 10),  # Offset text slightly more for clarity
-                textcoords="offset points",
-                color="red",
-                fontweight="bold",
-                fontsize=14,  # Increased font size for readability
-            )
+                # Add the latest return as a red point
+                plt.scatter(latest_return, 0, color="red", s=150, zorder=5)
+                plt.annotate(
+                    latest_label,
+                    (latest_return, 0),
+                    xytext=(10, 10),  # Offset text slightly more for clarity
+                    textcoords="offset points",
+                    color="red",
+                    fontweight="bold",
+                    fontsize=14,  # Increased font size for readability
+                )
 
-            # Add a red dotted vertical line to highlight the latest return
-            plt.axvline(
-                x=latest_return,
-                color="red",
-                linestyle="--",
-                linewidth=1.5,
-                alpha=0.7,
-                label="Latest Return",
-            )
-            plt.title(f"{session}", fontsize=18)
-            plt.xlabel("Session return in TV bps", fontsize=16)
-            plt.ylabel("Density", fontsize=16)
+                # Add a red dotted vertical line to highlight the latest return
+                plt.axvline(
+                    x=latest_return,
+                    color="red",
+                    linestyle="--",
+                    linewidth=1.5,
+                    alpha=0.7,
+                    label="Latest Return",
+                )
+                plt.title(f"{session}", fontsize=18)
+                plt.xlabel("Session return in TV bps", fontsize=16)
+                plt.ylabel("Density", fontsize=16)
 
            
-            stats_text = f"Mean: {mean:.2f}\nMedian: {median:.2f}\nStd: {std:.1f}\n95%ile: {perc95:.1f}\n99%ile: {perc99:.1f}\nSkew: {skew:.1f}\nKurt: {kurt:.1f}"
-            plt.text(
-                0.95,
-                0.95,
-                stats_text,
-                transform=plt.gca().transAxes,
-                verticalalignment="top",
-                horizontalalignment="right",
-                bbox=dict(
-                    boxstyle="round",
-                    facecolor=self.colors["ivory"],
-                    edgecolor=self.colors["dark_slate_gray"],
-                    alpha=0.8,
-                ),
-                color=self.colors["dark_slate_gray"],
-                fontsize=20,
-            )
-
-            list_stats.append(
-                session_returns.describe(
-                    percentiles=[0.05, 0.25, 0.5, 0.68, 0.90, 0.95, 0.99, 0.997]
+                stats_text = f"Mean: {mean:.2f}\nMedian: {median:.2f}\nStd: {std:.1f}\n95%ile: {perc95:.1f}\n99%ile: {perc99:.1f}\nSkew: {skew:.1f}\nKurt: {kurt:.1f}"
+                plt.text(
+                    0.95,
+                    0.95,
+                    stats_text,
+                    transform=plt.gca().transAxes,
+                    verticalalignment="top",
+                    horizontalalignment="right",
+                    bbox=dict(
+                        boxstyle="round",
+                        facecolor=self.colors["ivory"],
+                        edgecolor=self.colors["dark_slate_gray"],
+                        alpha=0.8,
+                    ),
+                    color=self.colors["dark_slate_gray"],
+                    fontsize=20,
                 )
-            )
-        plt.tight_layout()
+
+            sessions_chart_data.append(distribution_charts.get_session_chart_data(
+                session, session_returns, latest_date, latest_return, latest_zscore, latest_percentile, latest_label,
+                kde_curve=(kde_grid, kde_pdf), stats=chart_stats
+            ))
+
+            list_stats.append(summary.describe(stats_percentiles))
         month_to_name = (lambda a, b, c: f"Dates filtered: {datetime.strptime(str(a), '%m').strftime('%B')}: {b}-{c}")
         if self.month_day_filter==[]:
             filtered_string=""
         else:
             filtered_string = month_to_name(self.month_day_filter[0],self.month_day_filter[1], self.month_day_filter[2])
-        plt.suptitle(
-            f"Distribution of Returns {tickersymbol_val} with interval of {interval_val}: ABS(End - Start) across trading sessions: {start_date} to {end_date}.{filtered_string}",
-            fontsize=20,
-            y=1.02,
-            x=0.01,
-            ha='left'
-        )
-        plt.savefig(
-            os.path.join(
-                self.output_folder,
-                f"{tickersymbol_val}_{interval_val}_Returns_Distribution.png", #_{start_date}_{end_date}
-            ),
-            dpi=300,
-            bbox_inches="tight",
-        )
-        plt.close()
+        title = f"Distribution of Returns {tickersymbol_val} with interval of {interval_val}: ABS(End - Start) across trading sessions: {start_date} to {end_date}.{filtered_string}"
+        if write_png:
+            plt.tight_layout()
+            plt.suptitle(
+                title,
+                fontsize=20,
+                y=1.02,
+                x=0.01,
+                ha='left'
+            )
+            plt.savefig(
+                os.path.join(
+                    self.output_folder,
+                    f"{tickersymbol_val}_{interval_val}_Returns_Distribution.png", #_{start_date}_{end_date}
+                ),
+                dpi=300,
+                bbox_inches="tight",
+            )
+            plt.close()
+        self._save_chart_data(sessions_chart_data, title, tickersymbol_val, interval_val, "Returns")
+        save_ecdf_indexes(get_ecdf_index_path(self.output_folder, tickersymbol_val, interval_val, "Returns"), session_ecdfs)
 
         df_stats = pd.concat(list_stats, axis=1)
         df_stats.columns = sessions
@@ -299,49 +419,55 @@ class Returns:
 
     
 
+    def _save_chart_data(self, sessions_chart_data, title, tickersymbol_val, interval_val, return_type):
+        # Chart data for the dashboard. Without png output the png of a previous run would be stale: removed.
+        if self.output_mode in ("chart_data", "both"):
+            distribution_charts.save_chart_data(
+                distribution_charts.get_chart_data_path(self.output_folder, tickersymbol_val, interval_val, return_type),
+                sessions_chart_data, title, "Session return in TV bps", tickersymbol_val, interval_val, return_type,
+            )
+        if self.output_mode == "chart_data":
+            png_path = os.path.join(self.output_folder, f"{tickersymbol_val}_{interval_val}_{return_type}_Distribution.png")
+            if os.path.exists(png_path):
+                os.remove(png_path)
+
     def get_daily_session_volatility_returns(self, df,bps_factor , target_col = 'timestamp'):
         
-        session_volatility_df = df.groupby([df[target_col].dt.date, "session"]).agg(
-            {"High": ["max"], "Low": ["min"]}
-        )
-        session_volatility_df["return"] = bps_factor * (
-            session_volatility_df["High"]["max"] - session_volatility_df["Low"]["min"]
-        )
-        session_volatility_df = session_volatility_df.reset_index()
+        session_volatility_df = self.get_session_bars(df, bps_factor, target_col)[["date", "session", "high", "low", "volatility"]]
         session_volatility_df.columns = ["date", "session", "high", "low", "return"]
-        session_volatility_df = session_volatility_df.sort_values(["date", "session"])
         return session_volatility_df
 
     def get_daily_volatility_returns(self, df,bps_factor , target_col = 'timestamp'):
-        all_df = df.groupby([df[target_col].dt.date]).agg(
-            {"High": ["max"], "Low": ["min"]}
-        )
-        all_df["return"] = bps_factor * (all_df["High"]["max"] - all_df["Low"]["min"])
-        all_df = all_df.reset_index()
+        all_df = self.get_session_bars(df, bps_factor, target_col, by_session=False)[["date", "high", "low", "volatility"]]
         all_df.columns = ["date", "high", "low", "return"]
-        all_df = all_df.sort_values(["date"])
         return all_df
 
     def plot_daily_session_volatility_returns(
-        self, filtered_df, tickersymbol_val, interval_val,bps_factor
+        self, filtered_df, tickersymbol_val, interval_val,bps_factor, session_bars=None, session_stats=None
     ):
                 
         start_date = (filtered_df["timestamp"].dt.date.tolist())[0]
         end_date = (filtered_df["timestamp"].dt.date.tolist())[-1]
 
-        #fetching intraday data for the red dot.
-        # intraday_data = self.fetch_intraday_data(tickersymbol_val , interval_val)
-        intraday_data = self.dataframe.copy()
-        intraday_data['session'] = intraday_data['timestamp'].apply(self.get_session)
-        intraday_data['date'] = intraday_data['timestamp'].dt.date
+        # Session-bar store (non-event bars + intraday bars for the red dot); every session takes its slice of it.
+        if session_bars is None:
+            session_bars = self.get_session_bar_store(filtered_df, bps_factor)
+        # Summaries (moments + ECDF) of every session and metric, the stats below are read from them.
+        if session_stats is None:
+            session_stats = SessionStats.from_session_bars(session_bars)
 
         latest_return = -1
         latest_date = None
+
+        write_png = self.output_mode in ("png", "both")
+        sessions_chart_data = []
+        session_ecdfs = {}
         
         # Analyze distributions
         list_stats = []
-        plt.figure(figsize=(24, 18))
-        sns.set_style("darkgrid")
+        if write_png:
+            plt.figure(figsize=(24, 18))
+            sns.set_style("darkgrid")
 
         skip_sessions=False
         if 'd' in interval_val:
@@ -352,21 +478,22 @@ class Returns:
             
         for i, session in enumerate(sessions, 1):
 
-            if skip_sessions==False:
+            if skip_sessions==False and write_png:
                 plt.subplot(3, 2, i)
 
+            summary = session_stats.get(session, "ne_volatility")
+
             if session == "All day":
 
-                all_volatility_df = self.get_daily_volatility_returns(filtered_df,bps_factor=bps_factor)
+                all_volatility_df = self._get_store_returns(session_bars, "All day", "ne_volatility")
                 session_returns = all_volatility_df["return"]
-                latest_custom_days_return = all_volatility_df.iloc[:].loc[  #-15
-                    :, ["date", "return"]
-                ]
+                latest_custom_days_return = all_volatility_df.loc[:, ["date", "return"]] #-15
 
-                latest_custom_days_return['ZScore wrt All Days']=(latest_custom_days_return['return']-session_returns.mean())/session_returns.std()
-                latest_custom_days_return['ZScore wrt Given Days']=(latest_custom_days_return['return']-latest_custom_days_return['return'].mean())/latest_custom_days_return['return'].std()
+                # The given days are all the days of the session: both z-scores use its summary.
+                latest_custom_days_return['ZScore wrt All Days']=(latest_custom_days_return['return']-summary.mean)/summary.moments.std
+                latest_custom_days_return['ZScore wrt Given Days']=(latest_custom_days_return['return']-summary.mean)/summary.moments.std
                 
-                latest_custom_days_return_stats=self.get_descriptive_stats(latest_custom_days_return,'return')
+                latest_custom_days_return_stats=summary.get_descriptive_stats(name='return')
                 latest_custom_days_return_stats.name=f'(Session:{session}, Interval:{interval_val}, Symbol:{tickersymbol_val})'
 
                 latest_custom_days_return.rename(columns={'date':'Date','return':f'Volatility of Returns (Session:{session}, Interval:{interval_val}, Symbol:{tickersymbol_val})'},inplace=True)
@@ -378,7 +505,7 @@ class Returns:
                 )
                 
                 # data for the red dot.
-                vol_ret_all_day_intraday = self.get_daily_volatility_returns(intraday_data , bps_factor)
+                vol_ret_all_day_intraday = self._get_store_returns(session_bars, "All day", "volatility", ne=False)
                 latest_date = vol_ret_all_day_intraday['date'].iloc[-1]
                 latest_return = vol_ret_all_day_intraday['return'].iloc[-1]
 
@@ -388,24 +515,23 @@ class Returns:
                 
             else:
 
-                session_volatility_df = self.get_daily_session_volatility_returns(filtered_df,bps_factor)
-                
+                session_volatility_df = self._get_store_returns(session_bars, session, "ne_volatility")
+
                 # distribution is a plot of session_returns.
-                session_returns = session_volatility_df.loc[session_volatility_df["session"] == session, ["return"]]
+                session_returns = session_volatility_df.loc[:, ["return"]]
                 
                 # latest_return = session_returns.iloc[-1, 0]
                 # latest_date = session_volatility_df.loc[
                 #     session_volatility_df["session"] == session, "date"
                 # ].iloc[-1]
 
-                latest_custom_days_return = session_volatility_df.loc[session_volatility_df['session']==session].iloc[:].loc[ 
-                    :, ["date", "return"]
-                ] #-15
+                latest_custom_days_return = session_volatility_df.loc[:, ["date", "return"]] #-15
                
-                latest_custom_days_return['ZScore wrt All Days']=(latest_custom_days_return['return']-session_returns['return'].mean())/session_returns['return'].std()
-                latest_custom_days_return['ZScore wrt Given Days']=(latest_custom_days_return['return']-latest_custom_days_return['return'].mean())/latest_custom_days_return['return'].std()
+                # The given days are all the days of the session: both z-scores use its summary.
+                latest_custom_days_return['ZScore wrt All Days']=(latest_custom_days_return['return']-summary.mean)/summary.moments.std
+                latest_custom_days_return['ZScore wrt Given Days']=(latest_custom_days_return['return']-summary.mean)/summary.moments.std
 
-                latest_custom_days_return_stats=self.get_descriptive_stats(latest_custom_days_return,'return')
+                latest_custom_days_return_stats=summary.get_descriptive_stats(name='return')
                 latest_custom_days_return_stats.name=f'(Session:{session}, Interval:{interval_val}, Symbol:{tickersymbol_val})'
                 
                 latest_custom_days_return.rename(columns={'date':'Date','return':f'Volatility of Returns (Session:{session}, Interval:{interval_val}, Symbol:{tickersymbol_val})'},inplace=True)
@@ -420,116 +546,118 @@ class Returns:
                 latest_zscore=latest_custom_days_return['ZScore wrt All Days'].iloc[-1]
                 
                 # Data for the red dot.
-                session_vol_ret_intraday = self.get_daily_session_volatility_returns(intraday_data , bps_factor)
-                session_vol_ret_intraday = session_vol_ret_intraday[session_vol_ret_intraday['session'] == session]
+                session_vol_ret_intraday = self._get_store_returns(session_bars, session, "volatility", ne=False)
                 latest_return = session_vol_ret_intraday['return'].iloc[-1]
                 latest_date = session_vol_ret_intraday['date'].iloc[-1]
 
             # Calculate the percentile of the latest return
-            latest_percentile = percentileofscore(session_returns.squeeze(), latest_return, kind="rank")
+            session_ecdfs[session] = summary.ecdf
+            latest_percentile = summary.ecdf.percentile_of_score(latest_return, kind="rank")
 
             # Descriptive Statistics
-            mean = session_returns.mean()
-            median = session_returns.median()
-            std = session_returns.std()
-            perc95 = session_returns.quantile(0.95)
-            perc99 = session_returns.quantile(0.99)
-            skew = session_returns.skew()
-            kurt = session_returns.kurtosis()
+            chart_stats = summary.get_chart_stats()
+            mean, median, std = chart_stats["mean"], chart_stats["median"], chart_stats["std"]
+            perc95, perc99 = chart_stats["perc95"], chart_stats["perc99"]
+            skew, kurt = chart_stats["skew"], chart_stats["kurt"]
 
             # zscore=(session_returns-mean)/std
             latest_zscore=round(latest_zscore,2)
+            latest_label=f"({latest_date}, VoltyReturn:{latest_return:.2f}, Zscore:{latest_zscore}, {latest_percentile:.1f}%ile)"
 
-            sns.histplot(
-                session_returns, kde=True,stat="density",linewidth=0, color="skyblue"
-            )
-            sns.kdeplot(session_returns, color="darkblue", linewidth=2)
-            # Add the latest return as a red point
-            plt.scatter(latest_return, 0, color="red", s=150, zorder=5)
-            #plt.scatter(mean,0,color='black',s=150,zorder=5)
-
-            plt.annotate(
-                f"({latest_date}, VoltyReturn:{latest_return:.2f}, Zscore:{latest_zscore}, {latest_percentile:.1f}%ile)",
-                (latest_return, 0),
-                xytext=(10, 10),  # Offset text slightly more for clarity
-                textcoords="offset points",
-                color="red",
-                fontweight="bold",
-                fontsize=14,  # Increased font size for readability
-            )
-            # Add a red dotted vertical line to highlight the latest return
-            plt.axvline(
-                x=latest_return,
-                color="red",
-                linestyle="--",
-                linewidth=1.5,
-                alpha=0.7,
-                label="Latest Volty. Return",
-            )
+            kde_grid, kde_pdf, _ = density_estimation.get_kde(session_returns)
+
+            if write_png:
+                sns.histplot(
+                    session_returns, stat="density",linewidth=0, color="skyblue"
+                )
+                plt.plot(kde_grid, kde_pdf, color="darkblue", linewidth=2)
+                # Add the latest return as a red point
+                plt.scatter(latest_return, 0, color="red", s=150, zorder=5)
+                #plt.scatter(mean,0,color='black',s=150,zorder=5)
+
+                plt.annotate(
+                    latest_label,
+                    (latest_return, 0),
+                    xytext=(10, 10),  # Offset text slightly more for clarity
+                    textcoords="offset points",
+                    color="red",
+                    fontweight="bold",
+                    fontsize=14,  # Increased font size for readability
+                )
+                # Add a red dotted vertical line to highlight the latest return
+                plt.axvline(
+                    x=latest_return,
+                    color="red",
+                    linestyle="--",
+                    linewidth=1.5,
+                    alpha=0.7,
+                    label="Latest Volty. Return",
+                )
 
 
-            plt.title(f"{session}", fontsize=18)
-            plt.xlabel("Session return in TV bps", fontsize=16)
-            plt.ylabel("Density", fontsize=16)
-            plt.legend("", frameon=False)
+                plt.title(f"{session}", fontsize=18)
+                plt.xlabel("Session return in TV bps", fontsize=16)
+                plt.ylabel("Density", fontsize=16)
+                plt.legend("", frameon=False)
 
             
 
 
-            if isinstance(session_returns, pd.DataFrame):
-                mean, median, std, perc95, perc99, skew, kurt = [
-                    x.iloc[0] for x in [mean, median, std, perc95, perc99, skew, kurt]
-                ]
-
-            list_stats.append(
-                session_returns.describe(
-                    percentiles=[0.05, 0.25, 0.5, 0.68, 0.90, 0.95, 0.99, 0.997]
+            sessions_chart_data.append(distribution_charts.get_session_chart_data(
+                session, session_returns, latest_date, latest_return, latest_zscore, latest_percentile, latest_label,
+                kde_curve=(kde_grid, kde_pdf), stats=chart_stats
+            ))
+
+            list_stats.append(summary.describe(stats_percentiles))
+
+            if write_png:
+                stats_text = f"Mean: {mean:.2f}\nMedian: {median:.2f}\nStd: {std:.1f}\n95%ile: {perc95:.1f}\n99%ile: {perc99:.1f}\nSkew: {skew:.1f}\nKurt: {kurt:.1f}\n"
+                plt.text(
+                    0.95,
+                    0.95,
+                    stats_text,
+                    transform=plt.gca().transAxes,
+                    verticalalignment="top",
+                    horizontalalignment="right",
+                    bbox=dict(
+                        boxstyle="round",
+                        facecolor=self.colors["ivory"],
+                        edgecolor=self.colors["dark_slate_gray"],
+                        alpha=0.8,
+                    ),
+                    color=self.colors["dark_slate_gray"],
+                    fontsize=20,
                 )
-            )
-
-            stats_text = f"Mean: {mean:.2f}\nMedian: {median:.2f}\nStd: {std:.1f}\n95%ile: {perc95:.1f}\n99%ile: {perc99:.1f}\nSkew: {skew:.1f}\nKurt: {kurt:.1f}\n"
-            plt.text(
-                0.95,
-                0.95,
-                stats_text,
-                transform=plt.gca().transAxes,
-                verticalalignment="top",
-                horizontalalignment="right",
-                bbox=dict(
-                    boxstyle="round",
-                    facecolor=self.colors["ivory"],
-                    edgecolor=self.colors["dark_slate_gray"],
-                    alpha=0.8,
-                ),
-                color=self.colors["dark_slate_gray"],
-                fontsize=20,
-            )
 
         
-        plt.tight_layout()
         month_to_name = lambda a, b, c: f"Dates filtered: {datetime.strptime(str(a), '%m').strftime('%B')}: {b}-{c}"
         if self.month_day_filter==[]:
             filtered_string=""
         else:
             filtered_string = month_to_name(self.month_day_filter[0],self.month_day_filter[1], self.month_day_filter[2])
-        plt.suptitle(
-            f"Distribution of Volatility {tickersymbol_val} with interval of {interval_val}: (High - Low) across trading sessions: {start_date} to {end_date}.{filtered_string}",
-            fontsize=20,
-            y=1.02,
-            x=0.01,
-            ha='left'
-        )
+        title = f"Distribution of Volatility {tickersymbol_val} with interval of {interval_val}: (High - Low) across trading sessions: {start_date} to {end_date}.{filtered_string}"
+        if write_png:
+            plt.tight_layout()
+            plt.suptitle(
+                title,
+                fontsize=20,
+                y=1.02,
+                x=0.01,
+                ha='left'
+            )
 
-        
-        plt.savefig(
-            os.path.join(
-                self.output_folder,
-                f"{tickersymbol_val}_{interval_val}_Volatility_Distribution.png",
-            ),
-            dpi=300,
-            bbox_inches="tight",
-        )
-        plt.close()
+            
+            plt.savefig(
+                os.path.join(
+                    self.output_folder,
+                    f"{tickersymbol_val}_{interval_val}_Volatility_Distribution.png",
+                ),
+                dpi=300,
+                bbox_inches="tight",
+            )
+            plt.close()
+        self._save_chart_data(sessions_chart_data, title, tickersymbol_val, interval_val, "Volatility")
+        save_ecdf_indexes(get_ecdf_index_path(self.output_folder, tickersymbol_val, interval_val, "Volatility"), session_ecdfs)
 
         df_stats = pd.concat(list_stats, axis=1)
         df_stats.columns = sessions
@@ -543,47 +671,79 @@ class Returns:
         #print(df_stats.round(1))
 
 
-    def tag_events(self, ev, pc):
-        events_df = ev.copy()
-        price_df = pc.copy()
-
-        # Prepare events DataFrame
-        events_df["timestamp"] = events_df["datetime"]
-       
-
-        # Prepare price DataFrame
-        price_df.index.name = None
-        price_df.reset_index(inplace=True)
-        price_df["timestamp"] = price_df["timestamp"]
-        price_df = price_df.sort_values("timestamp")
-        events_df = events_df.sort_values("timestamp")
-
-        # Outer merge based on timestamp
-        # print('pricedf',price_df)
-        # print('events_df',events_df)
+    def tag_events(self, ev, pc, tolerance=pd.Timedelta(0), direction="backward"):
+        """
+        Tags the price bars with the events in one sort-merge pass.
+
+        Every bar and every event keeps exactly one row, sorted by timestamp (an event sharing its timestamp with a
+        bar comes after the bar). Event rows keep the event timestamp, so the non-event windows and the event
+        counts are anchored at the actual event time. Each event is also attached to its containing bar with
+        pd.merge_asof:
+            event rows get bar_timestamp (NaT if no bar is within tolerance),
+            bar rows get bar_n_events, bar_events ("; " separated) and bar_tier (most important tier).
+
+        Args:
+            ev (pd.DataFrame): Events with a tz-aware 'datetime' column, event names, tier and IND_* flags.
+            pc (pd.DataFrame): Price bars with a 'timestamp' column.
+            tolerance (pd.Timedelta): Max distance between an event and its bar. 0 only attaches exact matches.
+            direction (str): 'backward' for bars stamped with their start (the last bar at or before the event),
+                             'forward' for bars stamped with their end (the first bar at or after the event).
+
+        Returns:
+            pd.DataFrame: Tagged data with naive timestamps. Event columns are nullable ints / categorical.
+        """
+        events_df = ev.drop(columns=["datetime", "index", "timestamp", "year", "session"], errors="ignore")
+        events_df.insert(0, "timestamp", ev["datetime"].dt.tz_localize(None))
+        price_df = pc.drop(columns=["index", "year", "session"], errors="ignore")
         price_df["timestamp"] = price_df["timestamp"].dt.tz_localize(None)
-        events_df['timestamp'] = events_df["timestamp"].dt.tz_localize(None)
-        
-        final_df = pd.merge(price_df, events_df, on="timestamp", how="outer")
 
-        # Sort the final DataFrame by timestamp
-        final_df = final_df.sort_values("timestamp")
-        final_df.dropna(how="all", inplace=True)
-        final_df.index = final_df["index"]
+        # Typed event columns: integer flags/tiers stay integers (nullable) on the bar rows, names are categorical.
+        for col in events_df.columns[1:]:
+            if pd.api.types.is_integer_dtype(events_df[col]):
+                events_df[col] = events_df[col].astype("Int64")
+            elif events_df[col].dtype == object:
+                events_df[col] = events_df[col].astype("category")
+
+        price_df = price_df.sort_values("timestamp", kind="stable", ignore_index=True)
+        events_df = events_df.dropna(how="all").sort_values("timestamp", kind="stable", ignore_index=True)
+
+        # Containing bar of every event (merge_asof needs keys without NaT).
+        bar_times = price_df.loc[price_df["timestamp"].notna(), ["timestamp"]]
+        bar_times["bar_timestamp"] = bar_times["timestamp"]
+        timed_events = events_df["timestamp"].notna()
+        attached = pd.merge_asof(
+            events_df.loc[timed_events, ["timestamp"]],
+            bar_times,
+            on="timestamp",
+            direction=direction,
+            tolerance=tolerance,
+        )
+        events_df["bar_timestamp"] = pd.NaT
+        events_df.loc[timed_events, "bar_timestamp"] = attached["bar_timestamp"].to_numpy()
+
+        # Events of every bar
+        attached_events = events_df[events_df["bar_timestamp"].notna()]
+        by_bar = attached_events.groupby("bar_timestamp")
+        price_df["bar_n_events"] = price_df["timestamp"].map(by_bar.size()).fillna(0).astype("Int64")
+        if "events" in events_df.columns:
+            names = attached_events["events"].dropna().astype(str)
+            price_df["bar_events"] = price_df["timestamp"].map(
+                names.groupby(attached_events.loc[names.index, "bar_timestamp"]).agg("; ".join)
+            ).astype("string")
+        if "tier" in events_df.columns:
+            price_df["bar_tier"] = price_df["timestamp"].map(by_bar["tier"].min()).astype("Int64")
+
+        # Both sides are sorted: the stable sort of the concatenation is a linear merge of the two runs.
+        final_df = pd.concat([price_df, events_df], ignore_index=True)
+        final_df = final_df.sort_values("timestamp", kind="stable", ignore_index=True)
         final_df.index.name = pc.index.name
-        final_df.drop("index", axis=1, inplace=True)
 
         final_df["year"] = (final_df["timestamp"].dt.year).astype("Int64")
-        final_df = final_df.sort_values("timestamp")
+        final_df["session"] = self.get_sessions(final_df["timestamp"])
 
         common_columns = ["timestamp", "year", "session"]
-        # Separate the columns of the two DataFrames
-        events_columns = [col for col in events_df.columns if col not in common_columns]
-        price_columns = [col for col in price_df.columns if col not in common_columns]
-        remove_columns = ["datetime", "index"]
-
+        bar_columns = [col for col in ["bar_n_events", "bar_events", "bar_tier"] if col in price_df.columns]
         # Combine the desired order
-        ordered_columns = common_columns + events_columns + price_columns
-        ordered_columns = [i for i in ordered_columns if i not in remove_columns]
-        final_df = final_df.reindex(columns=ordered_columns, fill_value="na")
-        return final_df
\ No newline at end of file
+        events_columns = [col for col in events_df.columns if col not in common_columns]
+        price_columns = [col for col in price_df.columns if col not in common_columns + bar_columns]
+        return final_df[common_columns + events_columns + price_columns + bar_columns]
@@ -1,14 +1,85 @@
 import pandas as pd
 from intradaydata import Intraday
 from preprocessing import ManipulateTimezone
-from events import Events
+from events import load_events_store
 from returns import Returns
+from streaming_stats import SessionStats
 from nonevents import Nonevents
 from periodic_runner_main import INTRADAY_FILES as Intraday_data_files
+from probability_matrix import update_prob_matrix_cache
+from artifact_catalog import build_catalog
+from event_study import build_event_study_cube
+from dataset_registry import get_dataset_registry, row_group_size
 import shutil
 import os
+import sys
+import json
+import time
+import hashlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tzlocal import get_localzone 
 
+# Per ticker/interval state of the last run (high-water mark, hashes), kept in the processed folder.
+returns_state_file = 'returns_state.json'
+
+def _frame_hash(df):
+    # Content hash of a dataframe (values only, the index is ignored).
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest()
+
+def _read_returns_state(state_path):
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path) as f:
+        return json.load(f)
+
+def _write_returns_state(state_path, returns_state):
+    with open(state_path, 'w') as f:
+        json.dump(returns_state, f, indent=2)
+
+def _get_source_tz(ticker_symbol):
+    # Timezone of the raw data: investing.com data (FGBL) is in the local timezone, yahoo finance data in UTC.
+    if ticker_symbol=='FGBL':
+        return get_localzone()
+    return 'UTC'
+
+def _get_tag_tolerance(interval):
+    # (tolerance, direction) attaching an event to the bar containing it in Returns.tag_events.
+    # Bars are stamped with their start (daily bars too: 00:00 UTC of the trading day), so the containing bar is
+    # the last bar at or before the event and less than one interval earlier.
+    return (pd.Timedelta(interval) - pd.Timedelta(1, 'ns'), 'backward')
+
+def _get_splice_start(high_water_mark, ticker_symbol):
+    # First day (target timezone) rewritten by _update_distribution_of_returns after the given high-water mark. Days
+    # before it cannot be affected by the new rows: Tier1 events remove their own day only and the other event
+    # windows are at most max_window long.
+    max_window = max(Nonevents.default_tier_windows.values())
+    high_water_mark_target_tz = ManipulateTimezone._convert_timezone(
+        pd.Timestamp(high_water_mark), _get_source_tz(ticker_symbol), "US/Eastern"
+    )
+    return (high_water_mark_target_tz - max_window).normalize()
+
+def _get_kept_rows(data, high_water_mark, ticker_symbol):
+    # Raw rows before the splice start of the high-water mark: their processed rows are kept as saved by the
+    # incremental update, so they must be unchanged. Later rows (e.g. a revised last bar) are redone by the splice.
+    splice_start = _get_splice_start(high_water_mark, ticker_symbol)
+    timestamps = pd.to_datetime(data['timestamp'])
+    if timestamps.dt.tz is None:
+        bound = splice_start.tz_convert(_get_source_tz(ticker_symbol)).tz_localize(None)
+    else:
+        bound = splice_start.tz_convert(timestamps.dt.tz)
+    return data[(timestamps < bound).to_numpy()]
+
+def _get_processed_path(processed_data_folder, ticker_symbol, interval, filtered_dates, suffix):
+    return os.path.join(
+        processed_data_folder,
+        f"{ticker_symbol}_{interval}{filtered_dates}_{suffix}.parquet",
+    )
+
+def _get_session_stats_path(processed_data_folder, ticker_symbol, interval, filtered_dates):
+    # Monthly summaries of the session-bar store (streaming_stats.SessionStats)
+    return _get_processed_path(processed_data_folder, ticker_symbol, interval, filtered_dates, "session_stats")
+
 def _change_event_tiers(
     events_data_folder,
     processed_data_folder,
@@ -69,30 +140,27 @@ def _change_event_tiers(
     events_excel_path = os.path.join(events_data_folder, events_data_path)
    
     
-    # Create Events class instance
+    # Load the compiled events store (UTC). The workbook is only parsed again when it, the new events csvs or
+    # the tier/flag settings changed.
     add_new_events_dic={'IST':['US']}
-    myevents = Events(events_excel_path, my_tier_dic, my_flag_dic,new_events_folder=folder_events,
-                      add_new_events_dic=add_new_events_dic,
-                      change_tiers=change_tiers_bool)
+    events_store = load_events_store(events_excel_path, processed_data_folder, my_tier_dic, my_flag_dic,
+                                     default_tz=default_tz, new_events_folder=folder_events,
+                                     add_new_events_dic=add_new_events_dic,
+                                     change_tiers=change_tiers_bool)
 
     # Save combined events
-    combined_excel = myevents.combined_excel
+    combined_excel = events_store.assign(datetime=events_store['datetime'].dt.tz_convert(default_tz))
     start_date=str(combined_excel.loc[0,combined_excel.columns[0]]).split()[0]
     end_date=str(combined_excel.loc[len(combined_excel)-1,combined_excel.columns[0]]).split()[0]
     combined_excel_path = os.path.join(
         processed_data_folder, f'{events_data_path.split(".", maxsplit=1)[0]}_{start_date}_to_{end_date}_combined.csv'
     )
 
-    myevents.save_sheet(combined_excel, combined_excel_path)
+    combined_excel.to_csv(combined_excel_path, index=False)
 
     # Manipulate the Timezone
-    myeventsobject = ManipulateTimezone(pd.read_csv(combined_excel_path))
-    combined_excel_target_tz = myeventsobject.change_timezone(
-        myeventsobject.dataframe,
-        "datetime",
-        default_tz,
-        target_tz,
-    )
+    combined_excel_target_tz = events_store.assign(datetime=events_store['datetime'].dt.tz_convert(target_tz))
+
     # Save combined events with new timezone
     start_date=str(combined_excel_target_tz.loc[0,combined_excel.columns[0]]).split()[0]
     end_date=str(combined_excel_target_tz.loc[len(combined_excel)-1,combined_excel.columns[0]]).split()[0]
@@ -101,44 +169,186 @@ def _change_event_tiers(
         processed_data_folder,
         f'{events_data_path.split(".", maxsplit=1)[0]}_{start_date}_to_{end_date}_combined_target_tz.csv',
     )
-    myevents.save_sheet(combined_excel_target_tz, combined_excel_target_tz_path)
+    combined_excel_target_tz.to_csv(combined_excel_target_tz_path, index=False)
 
     # Return the path to the final processed file
     return (combined_excel_target_tz, combined_excel_target_tz_path)
 
 # scans the intraday data folder for the raw data & calls the next function.
+# incremental=True only processes the rows added since the last run (high-water mark in returns_state.json) and
+# skips tickers whose rows did not change. The last days before the high-water mark are redone as well, so bars
+# revised there (e.g. the still-forming last bar of the previous fetch) are picked up. It falls back to a full run
+# when the events, the settings or the rows before those days changed, or when the processed parquets are missing.
+# max_workers>1 runs every (ticker, interval) in its own worker process, largest raw file first.
+# output_mode: "chart_data" writes the histogram/KDE json drawn by the dashboard, "png"/"both" the static plots.
 def scan_folder_and_calculate_returns(
         ticker_match_tuple,
         input_folder,
         processed_folder,
         output_folder,
         final_events_data,
+        incremental=False,
+        max_workers=1,
+        output_mode="chart_data",
         ):
    
+    state_path = os.path.join(processed_folder, returns_state_file)
+    returns_state = _read_returns_state(state_path)
+    events_hash = _frame_hash(final_events_data)
+    month_day_filter = [] #[12, 15, 31] 12: December, 15: Start Date, 31: End Date
+
+    tasks = []
+    registry = get_dataset_registry((input_folder,))
     for tickersymbol,tickerinterval,ticker_bps_factor in ticker_match_tuple:
-        file_path = 'NA'
-        for csvfile in os.scandir(input_folder):
-            if 'stats' in csvfile.name:
-                continue
-            if csvfile.is_file() and csvfile.name.endswith('.parquet') and (csvfile.name.split('_'))[2]==tickersymbol and (csvfile.name.split('_'))[3]==tickerinterval:
-                file_path = csvfile.path
-        if file_path=='NA':
+        dataset = registry.find(tickersymbol, tickerinterval, 'raw')
+        if dataset is None:
             continue
-        csvdata=pd.read_parquet(file_path , engine = 'pyarrow')
-        # csvdata['Datetime'] = pd.to_datetime(csvdata['Datetime'], utc=True) #redundant
-        # csvdata.set_index('Datetime', inplace=True) #also redundant
-        print(csvdata.columns)
-
-        if 'd' in tickerinterval: #Add time to DATE and make it "DATE + 23:59:00" if interval >=1d
-            csvdata=ManipulateTimezone.add_time_for_d_intervals(csvdata,csvdata.columns[0])
+        file_path = dataset['path']
+        tasks.append({
+            'tickersymbol': tickersymbol,
+            'tickerinterval': tickerinterval,
+            'ticker_bps_factor': ticker_bps_factor,
+            'file_path': file_path,
+            'processed_folder': processed_folder,
+            'output_folder': output_folder,
+            'previous_state': returns_state.get(f'{tickersymbol}_{tickerinterval}'),
+            'incremental': incremental,
+            'events_hash': events_hash,
+            'month_day_filter': month_day_filter,
+            'output_mode': output_mode,
+        })
+
+    def _collect(result):
+        # Runs in this process: the state file and the Probability Matrix cache manifest have a single writer.
+        (task, new_state, seconds, error) = result
+        timings.append((task, seconds, error))
+        if error is not None:
+            print(f"Failed {task['tickersymbol']} {task['tickerinterval']}:\n{error}")
+            return
+        returns_state[f"{task['tickersymbol']}_{task['tickerinterval']}"] = new_state
+        _write_returns_state(state_path, returns_state)
+
+        # Precompute the Probability Matrix counts so that the dashboard (tab 3, hourly data only) just does lookups.
+        if 'h' in task['tickerinterval']:
+            for data_type in ['Non-Event','All data']:
+                update_prob_matrix_cache(task['tickerinterval'], task['tickersymbol'], data_type)
+
+    timings = []
+    if max_workers<=1 or len(tasks)<=1:
+        for task in tasks:
+            _collect(_run_returns_task(task, final_events_data))
+    else:
+        # The events frame goes to every worker once through the initializer instead of with every task.
+        tasks.sort(key=lambda task: os.path.getsize(task['file_path']), reverse=True)
+        with ProcessPoolExecutor(
+            max_workers=min(max_workers, len(tasks)),
+            initializer=_init_returns_worker,
+            initargs=(final_events_data,),
+        ) as executor:
+            futures = [executor.submit(_run_returns_task, task) for task in tasks]
+            for future in as_completed(futures):
+                _collect(future.result())
+
+    print("Returns timings:")
+    for task, seconds, error in timings:
+        print(f"  {task['tickersymbol']} {task['tickerinterval']}: {seconds:.1f}s{'' if error is None else ' FAILED'}")
+    failed = [f"{task['tickersymbol']} {task['tickerinterval']}" for task, _, error in timings if error is not None]
+    if failed:
+        raise RuntimeError(f"Returns calculation failed for: {', '.join(failed)}")
+
+# Events frame of the worker process, set once by _init_returns_worker.
+_worker_events_data = None
+
+def _init_returns_worker(final_events_data):
+    global _worker_events_data
+    _worker_events_data = final_events_data
+
+def _run_returns_task(task, final_events_data=None):
+    # Runs one (ticker, interval) and returns (task, new state, seconds, traceback or None).
+    if final_events_data is None:
+        final_events_data = _worker_events_data
+    start_time = time.time()
+    try:
+        new_state = _calculate_returns_for_ticker(final_events_data, **task)
+        return (task, new_state, time.time()-start_time, None)
+    except Exception:
+        return (task, None, time.time()-start_time, traceback.format_exc())
 
+def _calculate_returns_for_ticker(
+        final_events_data,
+        tickersymbol,
+        tickerinterval,
+        ticker_bps_factor,
+        file_path,
+        processed_folder,
+        output_folder,
+        previous_state,
+        incremental,
+        events_hash,
+        month_day_filter,
+        output_mode="chart_data",
+        ):
+    """
+    Reads the raw parquet of one (ticker, interval) and writes its processed parquets, stats and plots
+    (incrementally when possible, see scan_folder_and_calculate_returns).
 
-        csvdata.dropna(inplace=True,axis=0,how='all')
-        csvdata['timestamp']=csvdata.index
-        csvdata.reset_index(drop=True,inplace=True) #df does not have a Datetime column anymore & index is 0,1,2,3...
-        print(csvdata.tail())
+    Returns:
+        dict: New state of the ticker/interval for returns_state.json.
+    """
+    csvdata=pd.read_parquet(file_path , engine = 'pyarrow')
+    # csvdata['Datetime'] = pd.to_datetime(csvdata['Datetime'], utc=True) #redundant
+    # csvdata.set_index('Datetime', inplace=True) #also redundant
+    print(csvdata.columns)
+
+    if 'd' in tickerinterval: #Add time to DATE and make it "DATE + 23:59:00" if interval >=1d
+        csvdata=ManipulateTimezone.add_time_for_d_intervals(csvdata,csvdata.columns[0])
+
+
+    csvdata.dropna(inplace=True,axis=0,how='all')
+    csvdata['timestamp']=csvdata.index
+    csvdata.reset_index(drop=True,inplace=True) #df does not have a Datetime column anymore & index is 0,1,2,3...
+    print(csvdata.tail())
+
+    high_water_mark = csvdata['timestamp'].max()
+    kept_rows = _get_kept_rows(csvdata, high_water_mark, tickersymbol)
+    new_state = {
+        'high_water_mark': str(high_water_mark),
+        'n_rows': len(csvdata),
+        'rows_hash': _frame_hash(csvdata),
+        'kept_n_rows': len(kept_rows),
+        'kept_rows_hash': _frame_hash(kept_rows),
+        'bps_factor': ticker_bps_factor,
+        'month_day_filter': month_day_filter,
+        'events_hash': events_hash,
+        'output_mode': output_mode,
+    }
 
-        (final_data, final_data_path) = _get_distribution_of_returns(
+    result = None
+    if incremental and previous_state is not None and all(
+        previous_state.get(key) == new_state[key] for key in ['bps_factor', 'month_day_filter', 'events_hash', 'output_mode']
+    ):
+        # The rows kept by the splice (before the splice start of the previous high-water mark) must be exactly the
+        # ones processed last time. Rows revised after it (e.g. the still-forming last bar) are redone by the splice.
+        kept_rows = _get_kept_rows(csvdata, previous_state['high_water_mark'], tickersymbol)
+        if (new_state['n_rows']==previous_state['n_rows'] and new_state['rows_hash']==previous_state['rows_hash']):
+            print(f"No new rows for {tickersymbol} {tickerinterval}, stats and plots are up to date.")
+            return new_state
+        if (len(kept_rows)==previous_state.get('kept_n_rows') and
+                _frame_hash(kept_rows)==previous_state.get('kept_rows_hash')):
+            result = _update_distribution_of_returns(
+                ticker_bps_factor,
+                previous_state,
+                combined_excel_target_tz=final_events_data,
+                processed_data_folder=processed_folder,
+                pre_fed_data=[csvdata, tickersymbol],
+                myoutput_folder=output_folder,
+                interval=tickerinterval,
+                month_day_filter=month_day_filter,
+                output_mode=output_mode,
+            )
+
+    if result is None:
+        result = _get_distribution_of_returns(
             ticker_bps_factor,
             combined_excel_target_tz=final_events_data,
             processed_data_folder=processed_folder,
@@ -146,11 +356,13 @@ def scan_folder_and_calculate_returns(
             skip_data_fetching=True,
             myoutput_folder=output_folder,
             interval=tickerinterval,
-            month_day_filter=[],#[12, 15, 31] 12: December, 15: Start Date, 31: End Date
-            
+            month_day_filter=month_day_filter,
+            output_mode=output_mode,
         )
-        print(f"Processed files saved at: {final_data_path}")
-        #print(final_data)
+    (final_data, final_data_path) = result
+    print(f"Processed files saved at: {final_data_path}")
+    #print(final_data)
+    return new_state
 
 def _get_distribution_of_returns(
     bps_factor,
@@ -163,7 +375,8 @@ def _get_distribution_of_returns(
     myoutput_folder="NotDefined",
     skip_data_fetching=False,
     pre_fed_data="",
-    month_day_filter=[]#Don't filter dates by default
+    month_day_filter=[],#Don't filter dates by default
+    output_mode="png"
 ):
     """
     Processes intraday data for a given list of tickers, performs tagging, filtering, and generates output files.
@@ -175,6 +388,7 @@ def _get_distribution_of_returns(
         end_intraday (int): End date offset in days for fetching intraday data.
         combined_excel_target_tz (str): Path to the events Excel file with target timezone data.
         processed_data_folder (str): Folder path to save processed files.
+        output_mode (str): "png", "chart_data" or "both", see Returns.
 
     Returns:
         dict: Paths of the processed files.
@@ -202,19 +416,17 @@ def _get_distribution_of_returns(
     # Data Preprocessing: Change the timezone of the historical data to target timezone
     preprocessing_obj = ManipulateTimezone(data)
 
-    if ticker_symbol=='FGBL':
-        current_tz=get_localzone()
-    else:
-        current_tz='UTC'
+    current_tz = _get_source_tz(ticker_symbol)
 
     data_target_tz = preprocessing_obj.change_timezone(
         checkdf=data, tz_col="timestamp", default_tz=current_tz, target_tz="US/Eastern"
     )
 
     # Event Tagging
-    returns_obj = Returns(dataframe=data_target_tz,output_folder=myoutput_folder)
+    returns_obj = Returns(dataframe=data_target_tz,output_folder=myoutput_folder,output_mode=output_mode)
+    tag_tolerance, tag_direction = _get_tag_tolerance(interval)
     tagged_data = returns_obj.tag_events(
-        (combined_excel_target_tz), returns_obj.dataframe.copy()
+        (combined_excel_target_tz), returns_obj.dataframe, tolerance=tag_tolerance, direction=tag_direction
     )
 
     # Filtering Data
@@ -237,11 +449,10 @@ def _get_distribution_of_returns(
     # filtered_data.to_csv(filtered_data_path, index=False)
 
     # saving the parquet for event data.
-    filtered_data_path_pq = os.path.join(
-        processed_data_folder,
-        f"{ticker_symbol}_{interval}{filtered_dates}_events_tagged_target_tz.parquet",
+    filtered_data_path_pq = _get_processed_path(
+        processed_data_folder, ticker_symbol, interval, filtered_dates, "events_tagged_target_tz"
     )
-    filtered_data.to_parquet(filtered_data_path_pq , engine = 'pyarrow' ,  index = False)
+    filtered_data.to_parquet(filtered_data_path_pq , engine = 'pyarrow' ,  index = False , row_group_size = row_group_size)
 
     # Filtering Nonevents
     nonevents_obj = Nonevents(filtered_data)
@@ -258,11 +469,164 @@ def _get_distribution_of_returns(
     # ne_filtered_data.to_csv(ne_filtered_data_path, index=False)
 
     #saving the parquet for NE data.
-    ne_filtered_data_path_pq = os.path.join(
-        processed_data_folder,
-        f"{ticker_symbol}_{interval}{filtered_dates}_events_tagged_target_tz_nonevents.parquet",
+    ne_filtered_data_path_pq = _get_processed_path(
+        processed_data_folder, ticker_symbol, interval, filtered_dates, "events_tagged_target_tz_nonevents"
+    )
+    ne_filtered_data.to_parquet(ne_filtered_data_path_pq , engine = 'pyarrow' , index = False , row_group_size = row_group_size)
+
+    # Session-bar store: one row per date x session with OHLC/volume of all and non-event bars and the event flags.
+    # Stats and plots below are computed from it instead of the raw bars.
+    session_bars = returns_obj.get_session_bar_store(ne_filtered_data, bps_factor, tagged_df=filtered_data)
+    session_bars_path_pq = _get_processed_path(
+        processed_data_folder, ticker_symbol, interval, filtered_dates, "session_bars"
+    )
+    session_bars.to_parquet(session_bars_path_pq , engine = 'pyarrow' , index = False , row_group_size = row_group_size)
+
+    # Summaries per session, metric and month: the stats of the plots/csvs are merged from them.
+    session_stats = SessionStats.from_session_bars(session_bars)
+    session_stats.save(_get_session_stats_path(processed_data_folder, ticker_symbol, interval, filtered_dates))
+
+    _get_stats_plots(
+        returns_obj,
+        ne_filtered_data,
+        bps_factor,
+        tickersymbol=ticker_symbol,
+        interval=interval,
+        session_bars=session_bars,
+        session_stats=session_stats,
+    )
+
+    return (ne_filtered_data, ne_filtered_data_path_pq)
+
+def _update_distribution_of_returns(
+    bps_factor,
+    previous_state,
+    combined_excel_target_tz,
+    processed_data_folder,
+    pre_fed_data,
+    myoutput_folder,
+    interval,
+    month_day_filter=[],
+    output_mode="png"
+):
+    """
+    Incremental version of _get_distribution_of_returns for data that only grew since the last run.
+
+    Only the rows after the previous high-water mark (plus enough context for the non-event windows) are
+    converted to the target timezone, tagged and filtered. They replace the tail of the existing processed
+    parquets, from the first day the new rows can affect. Stats and plots are then recomputed from the spliced
+    session-bar store.
+
+    Args:
+        bps_factor (int): Multiplier to convert price differences to bps.
+        previous_state (dict): State of the last run of this ticker/interval (see scan_folder_and_calculate_returns).
+        combined_excel_target_tz (pd.DataFrame): Events data with timestamps in the target timezone.
+        processed_data_folder (str): Folder of the processed parquets.
+        pre_fed_data (list): [raw data, ticker symbol].
+        myoutput_folder (str): Folder for the stats and plots.
+        interval (str): Interval of the data (e.g. '1h').
+        month_day_filter (list): [month, start day, end day] filter, [] for no filter.
+        output_mode (str): "png", "chart_data" or "both", see Returns.
+
+    Returns:
+        tuple: (ne_filtered_data, path of its parquet), or None if the processed parquets are missing.
+    """
+    data, ticker_symbol = pre_fed_data
+    filtered_dates = "" if month_day_filter==[] else "_filtered_dates"
+    filtered_data_path_pq = _get_processed_path(
+        processed_data_folder, ticker_symbol, interval, filtered_dates, "events_tagged_target_tz"
+    )
+    ne_filtered_data_path_pq = _get_processed_path(
+        processed_data_folder, ticker_symbol, interval, filtered_dates, "events_tagged_target_tz_nonevents"
+    )
+    session_bars_path_pq = _get_processed_path(
+        processed_data_folder, ticker_symbol, interval, filtered_dates, "session_bars"
+    )
+    if not all(os.path.exists(path) for path in [filtered_data_path_pq, ne_filtered_data_path_pq, session_bars_path_pq]):
+        return None
+
+    current_tz = _get_source_tz(ticker_symbol)
+    high_water_mark = pd.Timestamp(previous_state['high_water_mark'])
+
+    # Days from start_day on are re-done (with max_window of context), see _get_splice_start.
+    max_window = max(Nonevents.default_tier_windows.values())
+    start_day = _get_splice_start(high_water_mark, ticker_symbol)
+    context_start = start_day - max_window
+    # Bars up to one tag tolerance earlier can contain the events of start_day.
+    tag_tolerance, tag_direction = _get_tag_tolerance(interval)
+    bars_start = context_start - tag_tolerance
+
+    # Raw rows from 2 days before the bars start, whatever the offset of the raw timezone.
+    tail = data[data['timestamp'] > high_water_mark - max_window - tag_tolerance - pd.Timedelta(days=2)]
+    preprocessing_obj = ManipulateTimezone(tail)
+    tail_target_tz = preprocessing_obj.change_timezone(
+        checkdf=tail, tz_col="timestamp", default_tz=current_tz, target_tz="US/Eastern"
+    )
+    tail_target_tz = tail_target_tz[tail_target_tz["timestamp"] >= bars_start]
+
+    # Event Tagging: events without a timestamp are kept, as in the full run.
+    events_tail = combined_excel_target_tz[~(combined_excel_target_tz["datetime"] < context_start)]
+    returns_obj = Returns(
+        dataframe=tail_target_tz[tail_target_tz["timestamp"] >= start_day], output_folder=myoutput_folder,
+        output_mode=output_mode,
+    )
+    tagged_data = returns_obj.tag_events(events_tail, tail_target_tz, tolerance=tag_tolerance, direction=tag_direction)
+
+    # Filtering Data
+    filtered_tail = returns_obj.filter_date(
+        filter_df=tagged_data, month_day_filter=month_day_filter, to_sessions=True
     )
-    ne_filtered_data.to_parquet(ne_filtered_data_path_pq , engine = 'pyarrow' , index = False)
+    if "Datetime" in (filtered_tail.columns):
+        filtered_tail.drop(axis=1, columns=["Datetime"], inplace=True)
+
+    # Tagged timestamps are naive target timezone times.
+    start = start_day.tz_localize(None)
+
+    def _splice(path, new_rows):
+        # old rows before start_day + recomputed rows from start_day on (and the rows without timestamp)
+        # Only the row groups before start_day are read.
+        old_rows = pd.read_parquet(path, engine='pyarrow', filters=[("timestamp", "<", start)])
+        spliced = pd.concat(
+            [old_rows, new_rows[~(new_rows["timestamp"] < start)]],
+            ignore_index=True,
+        )
+        if "session" in spliced.columns and not isinstance(spliced["session"].dtype, pd.CategoricalDtype):
+            spliced["session"] = pd.Categorical(spliced["session"], categories=returns_obj.session_categories)
+        spliced.to_parquet(path, engine='pyarrow', index=False, row_group_size=row_group_size)
+        return spliced
+
+    filtered_data = _splice(filtered_data_path_pq, filtered_tail)
+
+    # Filtering Nonevents
+    nonevents_obj = Nonevents(filtered_tail)
+    nonevents_data = nonevents_obj.filter_nonevents(nonevents_obj.dataframe)
+    ne_filtered_tail = nonevents_data[
+        ((nonevents_data["IND_NE_remove"] == 0) & (~nonevents_data["Volume"].isnull()))
+    ]
+    ne_filtered_data = _splice(ne_filtered_data_path_pq, ne_filtered_tail)
+
+    # Session-bar store: rows of the days from start_day on are rebuilt from the tail.
+    session_bars_tail = returns_obj.get_session_bar_store(
+        ne_filtered_tail[ne_filtered_tail["timestamp"] >= start],
+        bps_factor,
+        tagged_df=nonevents_data[~(nonevents_data["timestamp"] < start)],
+    )
+    session_bars = pd.read_parquet(session_bars_path_pq, engine='pyarrow', filters=[("date", "<", start.date())])
+    session_bars = pd.concat([session_bars, session_bars_tail], ignore_index=True)
+    session_bars["session"] = pd.Categorical(session_bars["session"], categories=session_bars_tail["session"].cat.categories)
+    session_bars = session_bars.sort_values(["date", "session"]).reset_index(drop=True)
+    session_bars.to_parquet(session_bars_path_pq , engine = 'pyarrow' , index = False , row_group_size = row_group_size)
+
+    # Only the summaries of the months from start_day on are rebuilt, the older ones are merged as saved.
+    session_stats_path = _get_session_stats_path(processed_data_folder, ticker_symbol, interval, filtered_dates)
+    session_stats = SessionStats.load(session_stats_path)
+    if session_stats is None:
+        session_stats = SessionStats.from_session_bars(session_bars)
+    else:
+        session_stats.update(session_bars, start.date())
+    session_stats.save(session_stats_path)
+    print(f"{ticker_symbol} {interval}: processed {len(data[data['timestamp'] > high_water_mark])} new rows, "
+          f"{len(filtered_data)} tagged rows in total.")
 
     _get_stats_plots(
         returns_obj,
@@ -270,6 +634,8 @@ def _get_distribution_of_returns(
         bps_factor,
         tickersymbol=ticker_symbol,
         interval=interval,
+        session_bars=session_bars,
+        session_stats=session_stats,
     )
 
     return (ne_filtered_data, ne_filtered_data_path_pq)
@@ -278,24 +644,23 @@ def _get_stats_plots(my_returns_object,
                     ne_filtered_data, 
                     bps_factor,
                     tickersymbol, 
-                    interval):
+                    interval,
+                    session_bars=None,
+                    session_stats=None):
     
     # Data Visualization:
     # 1. Daily Session Returns
 
     if "m" in interval or "h" in interval:  # interval<1d
-        daily_session_returns = my_returns_object.get_daily_session_returns(ne_filtered_data,bps_factor) # NEEDED??
-        my_returns_object.plot_daily_session_returns(ne_filtered_data, tickersymbol, interval,bps_factor)
+        my_returns_object.plot_daily_session_returns(ne_filtered_data, tickersymbol, interval,bps_factor,session_bars=session_bars,session_stats=session_stats)
 
     elif "d" in interval:  # interval=1d
         # 1. Daily Returns
-        daily_returns = my_returns_object.get_daily_returns(ne_filtered_data,bps_factor) # NEEDED?? 
-
-        my_returns_object.plot_daily_session_returns(ne_filtered_data, tickersymbol, interval,bps_factor)
+        my_returns_object.plot_daily_session_returns(ne_filtered_data, tickersymbol, interval,bps_factor,session_bars=session_bars,session_stats=session_stats)
 
     # 2. Daily Session Volatility Returns
-    my_returns_object.plot_daily_session_volatility_returns(ne_filtered_data, tickersymbol, interval,bps_factor
-)
+    my_returns_object.plot_daily_session_volatility_returns(ne_filtered_data, tickersymbol, interval,bps_factor,session_bars=session_bars,
+                                                            session_stats=session_stats)
     
 folder_events= 'Input_data'
 folder_input = Intraday_data_files + '_pq'
@@ -320,38 +685,52 @@ if __name__ == "__main__":
 
     # Intraday_data_files is not a string for the last 3 because it is imported from another folder.
    
-    # Delete the directory and its contents
-    try:
-        shutil.rmtree(folder_output)
-        print(f"Directory '{folder_output}' and its contents have been deleted successfully.")
-    except FileNotFoundError:
-        print(f"Directory '{folder_output}' does not exist.")
-    except PermissionError:
-        print(f"Permission denied to delete '{folder_output}'.")
-
-    # # REMOVE THIS WHEN CONVERSION WORKS FINE.
-    # try:
-    #     shutil.rmtree(folder_processed)
-    #     print(f"Directory '{folder_processed}' and its contents have been deleted successfully.")
-    # except FileNotFoundError:
-    #     print(f"Directory '{folder_processed}' does not exist.")
-    # except PermissionError:
-    #     print(f"Permission denied to delete '{folder_processed}'.")
-
-    try:
-        shutil.rmtree(folder_processed_pq)
-        print(f"Directory '{folder_processed_pq}' and its contents have been deleted successfully.")
-    except FileNotFoundError:
-        print(f"Directory '{folder_processed_pq}' does not exist.")
-    except PermissionError:
-        print(f"Permission denied to delete '{folder_processed_pq}'.")
+    # Incremental by default: only the rows added since the last run are processed and the existing stats/plots
+    # are kept. Pass --full to delete the output folders and rebuild everything from scratch.
+    incremental = '--full' not in sys.argv
+    # Worker processes for the (ticker, interval) pairs: --workers=N, default one per CPU. --workers=1 runs them here.
+    workers = next((int(arg.split('=')[1]) for arg in sys.argv if arg.startswith('--workers=')), os.cpu_count())
+    # Chart data (histogram/KDE json) for the dashboard by default; --png also renders the static 300 dpi plots.
+    output_mode = 'both' if '--png' in sys.argv else 'chart_data'
+
+    if not incremental:
+        # Delete the directory and its contents
+        try:
+            shutil.rmtree(folder_output)
+            print(f"Directory '{folder_output}' and its contents have been deleted successfully.")
+        except FileNotFoundError:
+            print(f"Directory '{folder_output}' does not exist.")
+        except PermissionError:
+            print(f"Permission denied to delete '{folder_output}'.")
+
+        # # REMOVE THIS WHEN CONVERSION WORKS FINE.
+        # try:
+        #     shutil.rmtree(folder_processed)
+        #     print(f"Directory '{folder_processed}' and its contents have been deleted successfully.")
+        # except FileNotFoundError:
+        #     print(f"Directory '{folder_processed}' does not exist.")
+        # except PermissionError:
+        #     print(f"Permission denied to delete '{folder_processed}'.")
+
+        try:
+            shutil.rmtree(folder_processed_pq)
+            print(f"Directory '{folder_processed_pq}' and its contents have been deleted successfully.")
+        except FileNotFoundError:
+            print(f"Directory '{folder_processed_pq}' does not exist.")
+        except PermissionError:
+            print(f"Permission denied to delete '{folder_processed_pq}'.")
 
 
     # os.makedirs(folder_processed)#exist_ok=True)
-    os.makedirs(folder_output)#exist_ok=True)
-    os.makedirs(folder_processed_pq)
+    os.makedirs(folder_output, exist_ok=True)
+    os.makedirs(folder_processed_pq, exist_ok=True)
    
     myevents_path = "EconomicEventsSheet15-24.xlsx"
+    # The combined events files carry their date range in the name: drop the ones of the previous run.
+    for entry in os.scandir(folder_processed_pq):
+        if entry.name.startswith(myevents_path.split(".", maxsplit=1)[0]) and entry.name.endswith('.csv'):
+            os.remove(entry.path)
+
     ticker_match_tuple=(("ZN",'1m',16),
                         ("ZN",'15m',16),
                         ("ZN",'1h',16),
@@ -376,5 +755,14 @@ if __name__ == "__main__":
         folder_input,
         folder_processed_pq,
         folder_output,
-        final_events_data
-    )
\ No newline at end of file
+        final_events_data,
+        incremental=incremental,
+        max_workers=workers,
+        output_mode=output_mode,
+    )
+
+    # Returns around every major event for every instrument and offset, sliced by tab 5 of the dashboard
+    build_event_study_cube(final_events_data, ticker_match_tuple, folder_processed_pq)
+
+    # Index the plots, stats and parquets for the dashboard
+    build_catalog(folders=(folder_output, folder_processed_pq, folder_input))
@@ -0,0 +1,101 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+# Windows of the custom sessions of the dashboard (tab 4): the bar at a session start time opens a window over the
+# next N hours/minutes, every day (or every given weekday). The bar timestamps are sorted once, the start bars of
+# all the sessions are found in one pass over the time of day/weekday arrays and the window ends by binary search,
+# so a window is a (first, stop) pair of positions. Overlapping windows share the bars: the filtered frame is one take of the positions of all
+# the windows, instead of one boolean mask and one copy of the frame per window.
+day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def parse_session_start(start):
+    """
+    Time of day of a session start: an hour (9) or, to the minute, 'HH:MM' ('09:30') or a datetime.time. An integer
+    is always an hour, also on minute bars.
+
+    Returns:
+        tuple: (hour, minute), minute None for an hour.
+
+    Raises:
+        ValueError: If the hour is not in 0-23 or the minute not in 0-59.
+    """
+    if isinstance(start, (datetime.time, pd.Timestamp)):
+        return (start.hour, start.minute)
+    if isinstance(start, str):
+        (hour, minute) = start.strip().split(':')[:2]
+        (hour, minute) = (int(hour), int(minute))
+    else:
+        (hour, minute) = (int(start), None)
+    if not 0 <= hour <= 23:
+        raise ValueError(f"Invalid session start {start!r}: the hour must be in 0-23 (use 'HH:MM' for a minute).")
+    if minute is not None and not 0 <= minute <= 59:
+        raise ValueError(f"Invalid session start {start!r}: the minute must be in 0-59.")
+    return (hour, minute)
+
+
+class SessionWindows:
+    """
+    Session windows over the bars of a frame.
+
+    Args:
+        times (pd.Series): Bar timestamps, in the timezone of the session start times (e.g. US/Eastern). Bars
+                           without a timestamp are in no window.
+    """
+    def __init__(self, times):
+        times = pd.Series(pd.to_datetime(times)).reset_index(drop=True)
+        rows = np.flatnonzero(times.notna().to_numpy())
+        times = times.iloc[rows]
+        times_ns = pd.DatetimeIndex(times).as_unit('ns').asi8
+        order = np.argsort(times_ns, kind='stable')
+        self.rows = rows[order]          # positions in the frame, in time order
+        self.times_ns = times_ns[order]
+        times = times.iloc[order]
+        self.hour = times.dt.hour.to_numpy()
+        self.minute = times.dt.minute.to_numpy()
+        self.weekday = times.dt.dayofweek.to_numpy()
+        # First bar of each (date, hour): the start bar of an hour, e.g. 09:30 on the days the hour opens late.
+        hour_keys = times.dt.tz_localize(None).dt.floor('h').to_numpy().astype(np.int64)
+        self.first_in_hour = np.concatenate([[True], hour_keys[1:] != hour_keys[:-1]])
+
+    def get_windows(self, sessions):
+        """
+        Args:
+            sessions (list): (start, length, start_day) tuples: start as in parse_session_start (an hour starts
+                             at the first bar of the hour, 'HH:MM' at the bar of that minute), length a
+                             pd.Timedelta, start_day a day name or "" (any day).
+
+        Returns:
+            tuple: (first, stop) sorted positions of the windows [start bar time, start bar time + length), in
+                   start order. Windows repeated by several sessions are kept once.
+        """
+        starts, ends = [], []
+        for (start, length, start_day) in sessions:
+            (hour, minute) = parse_session_start(start)
+            condition = self.hour == hour
+            condition &= self.first_in_hour if minute is None else self.minute == minute
+            if start_day:
+                condition &= self.weekday == day_names.index(start_day)
+            starts.append(self.times_ns[condition])
+            ends.append(self.times_ns[condition] + pd.Timedelta(length).value)
+        if len(starts) == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        windows = np.unique(np.column_stack([np.concatenate(starts), np.concatenate(ends)]), axis=0)
+        return (np.searchsorted(self.times_ns, windows[:, 0], side='left'),
+                np.searchsorted(self.times_ns, windows[:, 1], side='left'))
+
+    def get_positions(self, sessions):
+        """
+        Rows of the frame in every window of the sessions, see get_windows.
+
+        Returns:
+            tuple: (rows, groups) arrays: positions in the frame and window number (0, 1, ... in start order) of
+                   every row of every window. A row in several windows is repeated, once per window.
+        """
+        (first, stop) = self.get_windows(sessions)
+        lengths = stop - first
+        groups = np.repeat(np.arange(len(first)), lengths)
+        # first[g], first[g]+1, ..., stop[g]-1 for every window g, without a python loop.
+        window_offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(lengths) else lengths
+        positions = np.arange(lengths.sum()) - np.repeat(window_offsets - first, lengths)
+        return self.rows[positions], groups
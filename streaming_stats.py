@@ -0,0 +1,251 @@
+import os
+import numpy as np
+import pandas as pd
+from ecdf_index import ECDFIndex
+
+# One-pass, mergeable descriptive statistics of the session distributions. A DistributionSummary holds the
+# central moments (MomentsAccumulator) and the ECDF of the sample (the exact, mergeable quantile sketch: returns
+# are multiples of the tick size, so the distinct values stay few). The pipeline keeps one summary per
+# (session, metric, month) next to the session-bar store: incremental runs only rebuild the months they touch
+# and merge the others, and the stats csvs, plots and ECDF indexes are all read from the merged summaries.
+stats_percentiles = [0.05, 0.25, 0.5, 0.68, 0.90, 0.95, 0.99, 0.997]           # {ticker}_{interval}_*_stats.csv
+custom_days_percentiles = [0.1, 0.25, 0.5, 0.75, 0.95, 0.99]                    # latest custom days stats
+summary_metrics = ["ne_abs_return", "ne_volatility"]                            # session-bar store columns
+
+def _zero_out_fperr(value):
+    # As pandas' skew/kurtosis: sums below 1e-14 are floating point noise.
+    return 0.0 if np.abs(value) < 1e-14 else value
+
+def _format_percentile(percentile):
+    # Index labels of pd.Series.describe: 0.05 -> '5%', 0.997 -> '99.7%'
+    return f"{round(percentile * 100, 10):g}%"
+
+
+class MomentsAccumulator:
+    """
+    Count, mean, min, max and the sums of the 2nd/3rd/4th powers of the deviations from the mean (M2, M3, M4).
+    Updated by batches and merged with the pairwise formulas of Pebay (2008), so two accumulators of disjoint
+    samples give the moments of the union without the samples. A single batch gives the same values as pandas.
+    """
+    def __init__(self, count=0, mean=0.0, m2=0.0, m3=0.0, m4=0.0, min=np.inf, max=-np.inf):
+        self.count = int(count)
+        self.mean, self.m2, self.m3, self.m4 = float(mean), float(m2), float(m3), float(m4)
+        self.min, self.max = float(min), float(max)
+
+    @classmethod
+    def from_values(cls, values, counts=None):
+        # Two passes over the batch (mean, then the deviations), NaNs dropped. counts: occurrences of each value.
+        values = np.asarray(values, dtype=float).ravel()
+        if counts is None:
+            values = values[np.isfinite(values)]
+            if len(values) == 0:
+                return cls()
+            mean = values.sum() / len(values)
+            deviation2 = (values - mean) ** 2
+            return cls(len(values), mean, deviation2.sum(), (deviation2 * (values - mean)).sum(),
+                       (deviation2 ** 2).sum(), values.min(), values.max())
+        counts = np.asarray(counts, dtype=float).ravel()
+        keep = np.isfinite(values) & (counts > 0)
+        values, counts = values[keep], counts[keep]
+        if len(values) == 0:
+            return cls()
+        count = counts.sum()
+        mean = (values * counts).sum() / count
+        deviation2 = (values - mean) ** 2
+        return cls(count, mean, (deviation2 * counts).sum(), (deviation2 * (values - mean) * counts).sum(),
+                   (deviation2 ** 2 * counts).sum(), values.min(), values.max())
+
+    def update(self, values):
+        return self.merge(MomentsAccumulator.from_values(values))
+
+    def merge(self, other):
+        # In place, returns self.
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.__dict__)
+            return self
+        na, nb = self.count, other.count
+        n = na + nb
+        delta = other.mean - self.mean
+        m2 = self.m2 + other.m2 + delta ** 2 * na * nb / n
+        m3 = (self.m3 + other.m3 + delta ** 3 * na * nb * (na - nb) / n ** 2
+              + 3 * delta * (na * other.m2 - nb * self.m2) / n)
+        m4 = (self.m4 + other.m4 + delta ** 4 * na * nb * (na ** 2 - na * nb + nb ** 2) / n ** 3
+              + 6 * delta ** 2 * (na ** 2 * other.m2 + nb ** 2 * self.m2) / n ** 2
+              + 4 * delta * (na * other.m3 - nb * self.m3) / n)
+        self.count, self.mean = n, self.mean + delta * nb / n
+        self.m2, self.m3, self.m4 = m2, m3, m4
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    @property
+    def std(self):
+        # Sample standard deviation (ddof=1), as pd.Series.std
+        return np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+
+    @property
+    def skew(self):
+        # Adjusted Fisher-Pearson skewness, as pd.Series.skew
+        if self.count < 3:
+            return np.nan
+        m2, m3 = _zero_out_fperr(self.m2), _zero_out_fperr(self.m3)
+        if m2 == 0:
+            return 0.0
+        n = self.count
+        return (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5)
+
+    @property
+    def kurtosis(self):
+        # Excess kurtosis with the unbiased estimator, as pd.Series.kurtosis
+        if self.count < 4:
+            return np.nan
+        n = self.count
+        adj = 3 * (n - 1) ** 2 / ((n - 2) * (n - 3))
+        numerator = _zero_out_fperr(n * (n + 1) * (n - 1) * self.m4)
+        denominator = _zero_out_fperr((n - 2) * (n - 3) * self.m2 ** 2)
+        if denominator == 0:
+            return 0.0
+        return numerator / denominator - adj
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean, "m2": self.m2, "m3": self.m3, "m4": self.m4,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, dic):
+        return cls(**dic)
+
+
+class DistributionSummary:
+    """
+    Moments + ECDF of a sample: everything the stats csvs, plots and percentile lookups need, from one pass
+    over the values. Mergeable.
+
+    Args:
+        moments (MomentsAccumulator): Moments of the sample.
+        ecdf (ECDFIndex): ECDF of the same sample.
+    """
+    def __init__(self, moments=None, ecdf=None):
+        self.moments = moments if moments is not None else MomentsAccumulator()
+        self.ecdf = ecdf if ecdf is not None else ECDFIndex([])
+
+    @classmethod
+    def from_values(cls, values):
+        return cls(MomentsAccumulator.from_values(values), ECDFIndex(values))
+
+    @classmethod
+    def from_ecdf(cls, ecdf):
+        # E.g. the pooled movements of the probability matrix, given as counts per bps level.
+        return cls(MomentsAccumulator.from_values(ecdf.values, ecdf.counts), ecdf)
+
+    def merge(self, other):
+        # New summary of the union of both samples.
+        moments = MomentsAccumulator.from_dict(self.moments.to_dict()).merge(other.moments)
+        return DistributionSummary(moments, self.ecdf.merge(other.ecdf))
+
+    def __len__(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean if self.moments.count else np.nan
+
+    def describe(self, percentiles=stats_percentiles, name=None):
+        """
+        Same rows as pd.Series.describe: count, mean, std, min, percentiles, max.
+
+        Returns:
+            pd.Series: Descriptive statistics.
+        """
+        percentiles = sorted(set([0.5] + list(percentiles)))
+        quantiles = self.ecdf.quantile(np.array(percentiles)) if len(self) else np.full(len(percentiles), np.nan)
+        return pd.Series(
+            [float(self.moments.count), self.mean, self.moments.std, self.ecdf.quantile(0) if len(self) else np.nan]
+            + list(quantiles) + [self.ecdf.quantile(1) if len(self) else np.nan],
+            index=["count", "mean", "std", "min"] + [_format_percentile(p) for p in percentiles] + ["max"],
+            name=name,
+        )
+
+    def get_descriptive_stats(self, percentiles=custom_days_percentiles, name=None):
+        # describe + skewness and kurtosis, the rows of Returns.get_descriptive_stats
+        stats = self.describe(percentiles, name)
+        stats.loc["skewness"] = self.moments.skew
+        stats.loc["kurtosis"] = self.moments.kurtosis
+        stats.index.name = "Volatility of Returns Statistic"
+        return stats
+
+    def get_chart_stats(self):
+        # Stats box of the distribution plots
+        return {"count": len(self), "mean": self.mean, "median": self.ecdf.quantile(0.5) if len(self) else np.nan,
+                "std": self.moments.std, "perc95": self.ecdf.quantile(0.95) if len(self) else np.nan,
+                "perc99": self.ecdf.quantile(0.99) if len(self) else np.nan,
+                "skew": self.moments.skew, "kurt": self.moments.kurtosis}
+
+    def to_dict(self):
+        return {**self.moments.to_dict(), "values": self.ecdf.values, "counts": self.ecdf.counts}
+
+    @classmethod
+    def from_dict(cls, dic):
+        moments = MomentsAccumulator.from_dict({key: dic[key] for key in ["count", "mean", "m2", "m3", "m4", "min", "max"]})
+        return cls(moments, ECDFIndex(dic["values"], dic["counts"]))
+
+
+class SessionStats:
+    """
+    DistributionSummary per (session, metric, month) of a session-bar store (see Returns.get_session_bar_store),
+    with the rows of each metric where the session had non-event bars.
+
+    Args:
+        blocks (dict): {(session, metric, 'YYYY-MM'): DistributionSummary}.
+    """
+    def __init__(self, blocks=None):
+        self.blocks = blocks if blocks is not None else {}
+        self._merged = {}
+
+    @classmethod
+    def from_session_bars(cls, session_bars, metrics=summary_metrics):
+        rows = session_bars[session_bars["ne_n_bars"] > 0]
+        months = pd.to_datetime(rows["date"]).dt.strftime("%Y-%m")
+        blocks = {}
+        for (session, month), group in rows.groupby([rows["session"].astype(str), months], sort=True):
+            for metric in metrics:
+                blocks[(session, metric, month)] = DistributionSummary.from_values(group[metric].to_numpy())
+        return cls(blocks)
+
+    def update(self, session_bars, start_date, metrics=summary_metrics):
+        """
+        Replaces the blocks of the months from start_date on with the ones of session_bars (the rebuilt rows of
+        an incremental run). The older months are kept as they are.
+        """
+        start_month = pd.Timestamp(start_date).strftime("%Y-%m")
+        kept = {key: summary for key, summary in self.blocks.items() if key[2] < start_month}
+        rows = session_bars[pd.to_datetime(session_bars["date"]) >= pd.Timestamp(start_month + "-01")]
+        kept.update(SessionStats.from_session_bars(rows, metrics).blocks)
+        self.blocks = kept
+        self._merged = {}
+        return self
+
+    def get(self, session, metric):
+        # Summary of all the months of one session and metric.
+        if (session, metric) not in self._merged:
+            summary = DistributionSummary()
+            for (block_session, block_metric, _), block in sorted(self.blocks.items()):
+                if block_session == session and block_metric == metric:
+                    summary = summary.merge(block)
+            self._merged[(session, metric)] = summary
+        return self._merged[(session, metric)]
+
+    def save(self, path):
+        # One row per block: session, metric, month, the moments and the ECDF as list columns (values, counts).
+        pd.DataFrame([{"session": session, "metric": metric, "month": month, **summary.to_dict()}
+                      for (session, metric, month), summary in sorted(self.blocks.items())]
+                     ).to_parquet(path, engine="pyarrow", index=False)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return None
+        blocks = pd.read_parquet(path, engine="pyarrow").to_dict("records")
+        return cls({(block["session"], block["metric"], block["month"]): DistributionSummary.from_dict(block)
+                    for block in blocks})
@@ -1,41 +1,45 @@
 import streamlit as st
 import os
 import pandas as pd
-import requests
 import openpyxl
 from io import BytesIO
 from zipfile import ZipFile
-from PIL import Image
-from concurrent.futures import ThreadPoolExecutor
 from probability_matrix import GetMatrix,ProbabilityMatrix
 import custom_filtering_dataframe
 from returns_main import folder_input,folder_processed_pq
-import requests
-import re
+import artifact_catalog
+import artifact_storage
+import distribution_charts
+import density_estimation
+from streaming_stats import DistributionSummary
+from event_windows import EventWindowEngine
+from event_isolation import EventTimeline
+import event_study
+import dataset_registry
+import ecdf_index
 from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
 
 
-st.cache_data.clear()
-
 # Defining custom functions to modify generated data as per user input
 def get_volatility_returns_csv_stats_custom_days(target_csv,target_column):
-        
-    stats_csv=target_csv[target_column].describe(percentiles=[0.1,0.25,0.5,0.75,0.95,0.99])
-    # Add additional statistics to the DataFrame
-    stats_csv.loc['mean'] = target_csv[target_column].mean()
-    stats_csv.loc['skewness'] = target_csv[target_column].skew()
-    stats_csv.loc['kurtosis'] = target_csv[target_column].kurtosis()
-
-    stats_csv.index.name = 'Volatility of Returns Statistic'
-    return stats_csv
+    # describe (10/25/50/75/95/99%) + skewness and kurtosis, in one pass
+    return DistributionSummary.from_values(target_csv[target_column]).get_descriptive_stats(name=target_column)
 
 def get_volatility_returns_csv_custom_days(target_csv,target_column):
     target_csv['ZScore wrt Given Days']=(target_csv[target_column]-target_csv[target_column].mean())/target_csv[target_column].std()
     return target_csv
 
+def get_ecdf_lookup(session_ecdfs,bps):
+    # Probability of a movement <= / > bps and its z-score in the whole history of every session (binary searches).
+    return pd.DataFrame(
+        [{'Session':session,
+          f'Prob bps<={bps} (%ile)':ecdf.percentile(bps),
+          f'Prob bps>{bps} (%ile)':ecdf.exceedance(bps),
+          'Z Score':ecdf.zscore(bps)} for session,ecdf in session_ecdfs.items()]
+    ).round(2)
+
 # Defining functions to download the data
 
 # 1. Function to convert DataFrame to Excel file with multiple sheets
@@ -55,37 +59,43 @@ def download_combined_excel(df_list,sheet_names,skip_index_sheet=[]):
     return output
 
 
-# 2. Main function to read image url and download as png files
-def process_images(image_url_list):
+# 2. Main function to read the plot images and download as png files
+def process_images(image_plot_list,store):
     # Logic for downloading image bytes
-    st.session_state["image_bytes_list"] = get_image_bytes(image_url_list)
+    st.session_state["image_bytes_list"] = get_image_bytes(image_plot_list,store)
     st.session_state["button_clicked"] = False  # Reset the button state after processing is complete
 
-# 2.1 Function to get image bytes from list of images.
-def get_image_bytes(image_url_list):
+# 2.1 Function to get image bytes from list of plots.
+def get_image_bytes(image_plot_list,store):
     image_bytes = []
-    with ThreadPoolExecutor() as executor:
-        results = executor.map(fetch_image, image_url_list)
-        for result in results:
-            if result:
-                image_bytes.append(result)
+    for plot in image_plot_list:
+        result = fetch_image(plot,store)
+        if result:
+            image_bytes.append(result)
     return image_bytes
 
-# 2.2 Function to fetch image url
-def fetch_image(url):
+# 2.2 Function to fetch the image of a plot: the saved png as is, else rendered from its chart data (on demand)
+def fetch_image(plot,store):
     try:
-        response = requests.get(url, timeout=10)  # Add a timeout to prevent hanging
-        response.raise_for_status()  # Raise HTTP errors if any
-        image = Image.open(BytesIO(response.content))  # Open the image
-        output = BytesIO()
-        image.save(output, format='PNG')  # Save the image in PNG format
-        output.seek(0)
-        return output
+        if plot['path']:
+            return BytesIO(store.read_image(plot['path']))
+        return distribution_charts.render_png(store.read_json(plot['chart_path']))
     except Exception as e:
-        st.error(f"Error processing image {url}: {e}")
+        st.error(f"Error processing image {plot['path'] or plot['chart_path']}: {e}")
         return None
+
+# 2.3 Function to draw the session distributions of a plot's chart data client side (Vega-Lite), two per row
+def draw_distribution_charts(chart_data):
+    st.caption(chart_data['title'])
+    sessions_data=chart_data['sessions']
+    for row in range(0,len(sessions_data),2):
+        for col,session_data in zip(st.columns(2),sessions_data[row:row+2]):
+            with col:
+                spec=distribution_charts.get_vega_lite_spec(session_data,chart_data['x_title'])
+                spec['height']=300
+                st.vega_lite_chart(spec=spec,use_container_width=True)
     
-# 2.3 Function to download image created via matplotlib.
+# 2.4 Function to download image created via matplotlib.
 def download_img_via_matplotlib(plt_object):
     buf=BytesIO()
     plt_object.savefig(buf, format="png",bbox_inches='tight')
@@ -105,88 +115,75 @@ def create_zip(excel_file_list, image_bytes_list):
     zip_buffer.seek(0)
     return zip_buffer
 
-#5.0 helper function for 5.1
+#5.0 helper functions for 5.1
 def add_start_end_ts(all_event_ts , delta):
 
+    # Event bar as in the event study cube (event_study.get_event_anchors): the event time rounded to the minute (the
+    # workbook times are 10s early, 09:59:50 is the 10:00 bar) and floored to the hour, in the events timezone.
+    event_bar = event_study.get_event_anchors(all_event_ts['timestamp'] , '1h').tz_convert(all_event_ts['timestamp'].dt.tz)
+    event_bar = pd.Series(event_bar , index = all_event_ts.index)
+
     if(delta < 0):  # pre event + custom with delta < 0
 
-        all_event_ts['end'] = all_event_ts['timestamp'].apply(lambda x: x.replace(minute=0, second=0, microsecond=0)) 
+        all_event_ts['end'] = event_bar
         all_event_ts['start'] = all_event_ts['end'] + pd.Timedelta(hours = delta)
 
     else:   # immediate reaction + custom with delta > 0
 
-        all_event_ts['start'] = all_event_ts['timestamp'].apply(lambda x: x.replace(minute=0, second=0, microsecond=0))
+        all_event_ts['start'] = event_bar
         all_event_ts['end'] = all_event_ts['start'] + pd.Timedelta(hours = delta)
 
     return all_event_ts
     
-#5.1 calculating the returns for event specific distros
-def calc_event_spec_returns(selected_event , all_event_ts , ohcl_1h , mode , event_list, delta = 0, filter_out_other_events=False,  time_gap_hours=2):
-
-    event_ts = all_event_ts.copy()
-
-    event_ts.events = event_ts.events.astype(str)
-
-
-    ############## Added by Yaman #######################################################################################################
+# Tab 5 data: every tab runs on each rerun, so the parquets are read once per file version (path, mtime) and then
+# served from the cache.
+@st.cache_data
+def load_all_event_ts(path , kind , mtime):
+    if kind == 'events_store':
+        all_event_ts = pd.read_parquet(path , columns = ['datetime' , 'events'] , engine = 'pyarrow')
+        all_event_ts = all_event_ts.rename(columns = {'datetime' : 'timestamp'})
+        all_event_ts['timestamp'] = all_event_ts['timestamp'].dt.tz_convert('US/Eastern')
+    else:
+        all_event_ts = pd.read_parquet(path , columns = ['timestamp' , 'events'] , engine = 'pyarrow')
+        all_event_ts['timestamp'] = pd.to_datetime(all_event_ts.timestamp , errors='coerce').dt.tz_localize('US/Eastern')
+    return all_event_ts
 
-    event_list_lower = [e.strip().lower() for e in event_list]
+def load_ohcl_1h():
+    # ZN 1h bars, only the columns of the event window engine (memoized by dataset_registry per file version).
+    ohcl_1h = dataset_registry.load('ZN' , '1h' , 'raw' , columns = ['Open' , 'High' , 'Low' , 'Close'])
+    # convert US/Eastern Timezone from string data type to a [datetime , ET] datatype. (str --> UTC --> ET)
+    ohcl_1h['US/Eastern Timezone'] = pd.to_datetime(ohcl_1h.index,errors='coerce',utc=True)  #Datetime col has strings. so first convert that to UTC datetime.
+    ohcl_1h['US/Eastern Timezone'] = ohcl_1h['US/Eastern Timezone'].dt.tz_convert('US/Eastern')
+    return ohcl_1h
 
-    def pick_event(x):
-        x_l = x.lower()
-        for e in event_list_lower:
-            if e in x_l:
-                return e
-        return None
+# Events classified into the tab 5 event types. Built once per file version (not copied).
+@st.cache_resource
+def load_event_timeline(path , kind , mtime , event_list):
+    return EventTimeline(load_all_event_ts(path , kind , mtime) , list(event_list))
 
-    event_ts['events'] = event_ts['events'].apply(pick_event)
+# High/low sparse tables of the 1h bars, built once per file version and shared by the reruns (not copied).
+@st.cache_resource
+def load_event_window_engine(path , mtime):
+    return EventWindowEngine(load_ohcl_1h() , time_col = 'US/Eastern Timezone')
 
-    event_ts = event_ts.dropna(subset=['events'])
+#5.1 calculating the returns for event specific distros
+def calc_event_spec_returns(selected_event , event_timeline , window_engine , mode , delta = 0, filter_out_other_events=False,  time_gap_hours=2):
 
-    event_ts = event_ts.drop_duplicates(subset=['timestamp','events'], keep='first')
+    ############## Added by Yaman #######################################################################################################
 
+    # Events classified into the types of event_list (see load_event_timeline), from the start of the 1h data on.
+    event_ts_filtered = event_timeline.occurrences(selected_event)
     cutoff_time = pd.to_datetime('2022-12-20 00:00:00-05:00', errors='coerce')
-    event_ts = event_ts[event_ts['timestamp'] >= cutoff_time]
-
-
-    event_ts_filtered = event_ts.loc[event_ts['events'].str.strip().str.lower().str.contains(selected_event , case=False, na=False)]
+    event_ts_filtered = event_ts_filtered[event_ts_filtered['timestamp'] >= cutoff_time].copy()
 
     if filter_out_other_events:
-            
-            event_list_lower = [e.strip().lower() for e in event_list if e.strip().lower() != selected_event.lower()]
-
-            clean_rows = []
-            counter1 = 0
-            counter2 = 0
-            for _, row in event_ts_filtered.iterrows():
-                t = row['timestamp']
-                t_minus = t - pd.Timedelta(hours=time_gap_hours)
-                t_plus = t + pd.Timedelta(hours=time_gap_hours)
-
-                # Get full window, including current row
-                nearby_events = event_ts[
-                    (event_ts['timestamp'] >= t_minus) &
-                    (event_ts['timestamp'] <= t_plus)
-                ]
-
-                # Now: Check if any disallowed event appears in the entire window
-                contains_unwanted_event = (
-                    nearby_events['events']
-                    .str.lower()
-                    .apply(lambda x: any(e in x for e in event_list_lower))
-                    .any()
-                )
 
-                if not contains_unwanted_event:
-                    clean_rows.append(row)
-                    counter1 += 1
-                else:
-                    counter2 += 1
-
-            print(f"Out of {counter1+counter2} times we see this event, only {counter2} times do we see another major event within +- 2 hours interval of it.")
+            # time_gap_hours: hours, or {event type: hours} to widen/narrow the window per type of the other event.
+            isolated = event_timeline.is_isolated(event_ts_filtered , selected_event , time_gap_hours)
+            print(f"Out of {len(isolated)} times we see this event, only {(~isolated).sum()} times do we see another major event within +- {time_gap_hours} hours interval of it.")
 
             # Keep only rows with no unwanted overlap
-            event_ts_filtered = pd.DataFrame(clean_rows)
+            event_ts_filtered = event_ts_filtered[isolated].copy()
 
     event_ts = event_ts_filtered     #Setting event_ts to event_ts_filtered so that the rest of the code below works as it was.
 
@@ -208,37 +205,8 @@ def calc_event_spec_returns(selected_event , all_event_ts , ohcl_1h , mode , eve
     cutoff_time = pd.to_datetime('2022-12-20 00:00:00-05:00', errors='coerce')
     event_ts = event_ts[event_ts['start'] >= cutoff_time]
 
-    final_df=pd.DataFrame()
-    vol_ret = []
-    abs_ret = []
-    ret = []
-    start_date = []
-    end_date = []
-
-    for end , start in zip(event_ts['end'], event_ts['start']):
-
-        temp_df = ohcl_1h[(ohcl_1h['US/Eastern Timezone'] >= start) & (ohcl_1h['US/Eastern Timezone'] < end)] #equality removed for 'end'. Otherwise 1 extra hour in taken.
-        
-        if(temp_df.empty):
-            vol_ret.append(np.nan)
-            abs_ret.append(np.nan)
-            ret.append(np.nan)
-            start_date.append(np.nan)
-            end_date.append(np.nan)
-        else:
-            vol_ret.append((temp_df['High'].max() - temp_df['Low'].min())*16)
-            abs_ret.append(abs(temp_df['Close'].iloc[-1] - temp_df['Open'].iloc[0])*16)
-            ret.append((temp_df['Close'].iloc[-1] - temp_df['Open'].iloc[0])*16)
-            start_date.append(temp_df['US/Eastern Timezone'].iloc[0])
-            end_date.append(temp_df['US/Eastern Timezone'].iloc[-1])
-
-    final_df['Volatility Return'] = vol_ret
-    final_df['Absolute Return'] = abs_ret
-    final_df['Return'] = ret
-    final_df['Start_Date'] = start_date
-    final_df['End_Date'] = end_date
-    # print(final_df.head())
-
+    # [start, end) windows: 'end' is excluded, otherwise 1 extra hour is taken.
+    final_df = window_engine.window_returns(event_ts['start'], event_ts['end'], bps_factor=16)
     final_df.dropna(inplace=True)
 
     print("SELECTED EVENT: ", selected_event)
@@ -247,6 +215,46 @@ def calc_event_spec_returns(selected_event , all_event_ts , ohcl_1h , mode , eve
 
     return final_df
         
+# (ticker, interval) pairs of the event study cube, e.g. 'ZB 1m'.
+@st.cache_data
+def load_event_study_instruments(path , mtime):
+    pairs = event_study.load_event_study_cube(path , columns = ['ticker' , 'interval']).drop_duplicates()
+    return [f"{ticker} {interval}" for ticker , interval in zip(pairs['ticker'] , pairs['interval'])]
+
+# One (instrument, offset) slice of the event study cube, all events. Only the matching row groups are read.
+@st.cache_data
+def load_event_study_slice(path , mtime , ticker , interval , offset_minutes):
+    return event_study.load_event_study_cube(path , ticker = ticker , interval = interval , offset = pd.Timedelta(minutes = offset_minutes))
+
+#5.1b event specific returns of the other instruments, from the event study cube (same modes as 5.1)
+def calc_event_spec_returns_from_cube(selected_event , event_timeline , cube_artifact , ticker , interval , mode , delta = 0, filter_out_other_events=False,  time_gap_hours=2):
+
+    # Daily bars: the day before the event (pre event) and the event day (immediate reaction).
+    if pd.Timedelta(interval) >= pd.Timedelta(days = 1):
+        offset = {1: pd.Timedelta(days = -1) , 2: pd.Timedelta(days = 1)}.get(mode , pd.Timedelta(hours = delta))
+    else:
+        offset = pd.Timedelta(hours = {1: -8 , 2: 1}.get(mode , delta))
+    if offset not in event_study.get_offsets(interval):
+        st.markdown(f"<p style='color:red;'>{event_study.format_offset(offset)} is not precomputed for {ticker} {interval}. Available: {', '.join(event_study.format_offset(o) for o in event_study.get_offsets(interval))}.</p>", unsafe_allow_html=True)
+        return pd.DataFrame(columns = ['Volatility Return' , 'Absolute Return' , 'Return' , 'Start_Date'])
+
+    cube = load_event_study_slice(cube_artifact['path'] , cube_artifact['mtime'] , ticker , interval , int(offset / pd.Timedelta(minutes = 1)))
+    event_ts = cube[cube['event'].map(lambda event: selected_event.strip().lower() in event).astype(bool)]
+    event_ts = event_ts.drop_duplicates(subset = ['datetime'] , keep = 'first').assign(timestamp = lambda df: df['datetime'])
+
+    if filter_out_other_events:
+        isolated = event_timeline.is_isolated(event_ts , selected_event , time_gap_hours)
+        print(f"Out of {len(isolated)} times we see this event, only {(~isolated).sum()} times do we see another major event within +- {time_gap_hours} hours interval of it.")
+        event_ts = event_ts[isolated]
+
+    final_df = event_ts[['Volatility Return' , 'Absolute Return' , 'Return']].reset_index(drop = True)
+    final_df['Start_Date'] = event_ts['datetime'].dt.tz_convert('US/Eastern').to_numpy()
+
+    print("SELECTED EVENT: ", selected_event , ticker , interval , event_study.format_offset(offset))
+    print('No of Data points: ' , len(final_df))
+
+    return final_df
+
 #5.2 plot the event specific returns
 def plot_event_spec_returns(final_df , selected_event , dur):
         
@@ -256,8 +264,9 @@ def plot_event_spec_returns(final_df , selected_event , dur):
         fig, ax = plt.subplots(figsize=(6, 4))
         
         # Plot histogram and KDE
-        sns.histplot(final_df[col], kde=True, stat="density", linewidth=0, color="skyblue", ax=ax)
-        sns.kdeplot(final_df[col], color="darkblue", linewidth=2, ax=ax)
+        sns.histplot(final_df[col], stat="density", linewidth=0, color="skyblue", ax=ax)
+        grid, pdf, _ = density_estimation.get_kde(final_df[col])
+        ax.plot(grid, pdf, color="darkblue", linewidth=2)
 
         #number of instances.
         print(len(final_df[col]))  
@@ -283,7 +292,7 @@ def plot_event_spec_returns(final_df , selected_event , dur):
 
 
         # Statistics
-        stats = final_df[col].describe()
+        stats = DistributionSummary.from_values(final_df[col]).describe([0.25, 0.5, 0.75, 0.95, 0.99])
         mean = stats['mean']
         std = stats['std']
         current_value = final_df[col].iloc[-1]
@@ -330,8 +339,8 @@ def plot_event_spec_returns(final_df , selected_event , dur):
             f"25%: {stats['25%']:.2f}\n"
             f"Median: {stats['50%']:.2f}\n"
             f"75%: {stats['75%']:.2f}\n"
-            f"95%: {final_df[col].quantile(0.95):.2f}\n"
-            f"99%: {final_df[col].quantile(0.99):.2f}\n"
+            f"95%: {stats['95%']:.2f}\n"
+            f"99%: {stats['99%']:.2f}\n"
             f"Max: {stats['max']:.2f}"
         )
 
@@ -380,11 +389,27 @@ tab1, tab2, tab3,tab4,tab5 = st.tabs(["Session and Volatility Returns for all se
                                  'Event Specific Distro'])
 
 
-# Defining GitHub Repo
-repo_name='DistributionProject'
-branch='main'
 plots_directory="Intraday_data_files_stats_and_plots_folder"
-plot_url_base=f"https://raw.githubusercontent.com/krishangguptafibonacciresearch/{repo_name}/{branch}/{plots_directory}/"
+
+# Artifact catalog written by returns_main.py, loaded once per version and shared by all sessions/reruns.
+@st.cache_resource
+def get_artifact_catalog(catalog_version):
+    return artifact_catalog.load_catalog()
+
+catalog=get_artifact_catalog(artifact_catalog.catalog_version())
+
+# Plots and csvs are read from the local files (ARTIFACT_STORAGE=remote reads them from GitHub raw instead) and
+# kept decoded in a byte bounded LRU cache. Recreated for every catalog version.
+@st.cache_resource
+def get_artifact_store(catalog_version):
+    return artifact_storage.get_artifact_store()
+
+artifact_store=get_artifact_store(artifact_catalog.catalog_version())
+
+# ECDFs of the sessions of a distribution plot (ecdf_index.py), read once per file version (path, mtime).
+@st.cache_resource
+def load_ecdf_indexes(path,mtime):
+    return ecdf_index.load_ecdf_indexes(BytesIO(artifact_store.read_bytes(path)))
 
 # Storing data in the form of links to be displayed later in separate tabs.
 plot_urls=[]
@@ -394,45 +419,45 @@ return_types=[]
 
 sessions=[]
 latest_custom_days_urls=[]
-for file in os.scandir(plots_directory):
-    if file.is_file():
-        if file.name.endswith('.png'):
-            plotfile_content=file.name.split('_')
-            plot_url=plot_url_base+file.name
-            instrument=plotfile_content[0]
-            interval=plotfile_content[1]
-            return_type=plotfile_content[2]
-
-            intervals.append(interval)
-            instruments.append(instrument)
-            plot_urls.append({
-                "url": plot_url,
-                "instrument": instrument,
-                "interval": interval,
-                "return_type": return_type,
-                "stats_url": 
-                (plot_url_base+f'{instrument}_{interval}_{return_type}_stats.csv').replace('Volatility', 'Volatility_Returns')
-            })
-        elif file.name.endswith('.csv') and 'latest_custom_days' in file.name:
-            if 'stats' not in str(file.name):
-                latest_custom_days_content=file.name.split('_')
-                latest_custom_days_url=plot_url_base+file.name
-                joined_session="_".join((latest_custom_days_content[0:-7:1]))
-                spaced_session=" ".join(joined_session.split('_'))
-                instrument=(latest_custom_days_content[-1])
-                instrument=instrument.replace('.csv','')
-                interval=latest_custom_days_content[-2]
-                return_type=latest_custom_days_content[-4]
-
-                sessions.append(spaced_session)
-                latest_custom_days_urls.append({
-                "url": latest_custom_days_url,
-                'stats_url':plot_url_base+(file.name).split('.')[0]+'_stats.csv',
-                "instrument": instrument,
-                "interval": interval,
-                "return_type": return_type,
-                "session": [joined_session,spaced_session]
-            })
+# One entry per plot: its png ("path") and/or its chart data ("chart_path"), the chart data is drawn when available.
+plots_by_key={}
+for artifact in artifact_catalog.find_artifacts(catalog,kind='plot')+artifact_catalog.find_artifacts(catalog,kind='chart_data'):
+    instrument=artifact['ticker']
+    interval=artifact['interval']
+    return_type=artifact['return_type']
+
+    if (instrument,interval,return_type) not in plots_by_key:
+        intervals.append(interval)
+        instruments.append(instrument)
+        plots_by_key[(instrument,interval,return_type)]={
+            "path": None,
+            "chart_path": None,
+            "instrument": instrument,
+            "interval": interval,
+            "return_type": return_type,
+            "ecdf_index": None,
+            "stats_path": 
+            os.path.join(plots_directory,f'{instrument}_{interval}_{return_type}_stats.csv'.replace('Volatility', 'Volatility_Returns'))
+        }
+        plot_urls.append(plots_by_key[(instrument,interval,return_type)])
+    plots_by_key[(instrument,interval,return_type)]['chart_path' if artifact['kind']=='chart_data' else 'path']=artifact['path']
+for artifact in artifact_catalog.find_artifacts(catalog,kind='ecdf_index'):
+    if (artifact['ticker'],artifact['interval'],artifact['return_type']) in plots_by_key:
+        plots_by_key[(artifact['ticker'],artifact['interval'],artifact['return_type'])]['ecdf_index']=artifact
+
+for artifact in artifact_catalog.find_artifacts(catalog,kind='latest_custom_days'):
+    spaced_session=artifact['session']
+    joined_session="_".join(spaced_session.split(' '))
+
+    sessions.append(spaced_session)
+    latest_custom_days_urls.append({
+    "path": artifact['path'],
+    'stats_path':os.path.join(plots_directory,(artifact['name']).split('.')[0]+'_stats.csv'),
+    "instrument": artifact['ticker'],
+    "interval": artifact['interval'],
+    "return_type": artifact['return_type'],
+    "session": [joined_session,spaced_session]
+    })
             
 # Storing unique lists to be used later in separate drop-downs
 unique_intervals=list(set(intervals)) #Interval drop-down (1hr,15min,etc)
@@ -530,24 +555,33 @@ with tab1:
             if filtered_plots:
                 all_dataframes=[]
                 tab1_sheet_names=[]
-                image_url_list=[]
+                image_plot_list=[]
                 tab1_image_names=[]
                 for plot in filtered_plots:
                     caption = f"{plot['return_type'].replace('Returns', 'Returns Distribution').replace('Volatility', 'Volatility Distribution')}"
                     st.subheader(caption + ' Plot')
-                    st.image(plot['url'],caption=caption,use_container_width=True)
+                    if plot['chart_path']:
+                        draw_distribution_charts(artifact_store.read_json(plot['chart_path']))
+                    else:
+                        st.image(artifact_store.read_image(plot['path']),caption=caption,use_container_width=True)
                     st.subheader('Descriptive Statistics')
+                    stats_df=artifact_store.read_csv(plot['stats_path'])
                     st.dataframe(
-                        pd.read_csv(plot['stats_url']),
+                        stats_df,
                         use_container_width=True
                     )
+                    if plot['ecdf_index']:
+                        enter_bps=st.number_input(label="Enter the observed movement in bps:",min_value=0.0,step=0.5,
+                                                  key=f"tab1_bps_{plot['return_type']}")
+                        session_ecdfs=load_ecdf_indexes(plot['ecdf_index']['path'],plot['ecdf_index']['mtime'])
+                        st.dataframe(get_ecdf_lookup(session_ecdfs,enter_bps),use_container_width=True,hide_index=True)
 
                     # Save Stats dataframes into a list
-                    all_dataframes.append(pd.read_csv(plot['stats_url']))
+                    all_dataframes.append(stats_df)
                     tab1_sheet_names.append(caption+' Stats')
 
                     # Save images into a list
-                    image_url_list.append(plot['url'])
+                    image_plot_list.append(plot)
                     tab1_image_names.append(f'{y}_{x}_{caption}')
 
                 # Download Stats dataframes as Excel
@@ -580,7 +614,7 @@ with tab1:
                     # Display "Please wait..." in red
                     wait_placeholder.markdown("<span style='color: green;'>Please wait...</span>", unsafe_allow_html=True)
 
-                    process_images(image_url_list)
+                    process_images(image_plot_list,artifact_store)
                         
                     # Remove the "Please wait..." message
                     wait_placeholder.empty()
@@ -633,7 +667,7 @@ with tab2:
                 for latest_custom_day_csv in filtered_latest_custom_days_csvs:
                     st.subheader(f"Volatility Returns for Latest {get_days_val} day(s) of the session: {(latest_custom_day_csv['session'])[1]}")
         
-                    df=(pd.read_csv(latest_custom_day_csv['url']))
+                    df=(artifact_store.read_csv(latest_custom_day_csv['path']))
                     latest_custom_data_csv=get_volatility_returns_csv_custom_days(target_csv=df.iloc[-1*get_days_val:],
                                                                                 target_column=df.columns[1]
                     )
@@ -641,13 +675,21 @@ with tab2:
                     st.dataframe(latest_custom_data_csv,use_container_width=True)
 
                     st.subheader("Descriptive Statistics")
-                    whole_data_stats_csv=(pd.read_csv(latest_custom_day_csv['stats_url'])) #originally generated
+                    whole_data_stats_csv=(artifact_store.read_csv(latest_custom_day_csv['stats_path'])) #originally generated
 
                     latest_custom_data_stats_csv=get_volatility_returns_csv_stats_custom_days(target_csv=latest_custom_data_csv,
                                                                     target_column=latest_custom_data_csv.columns[1])
 
                     st.dataframe(latest_custom_data_stats_csv,use_container_width=True)
 
+                    # Typed movement against the whole history of the session (ECDF of the Volatility plot).
+                    volatility_plot=plots_by_key.get((y,x,'Volatility'))
+                    if volatility_plot and volatility_plot['ecdf_index']:
+                        session_ecdfs=load_ecdf_indexes(volatility_plot['ecdf_index']['path'],volatility_plot['ecdf_index']['mtime'])
+                        if z in session_ecdfs:
+                            enter_bps=st.number_input(label="Enter the observed movement in bps:",min_value=0.0,step=0.5,key='tab2_bps')
+                            st.dataframe(get_ecdf_lookup({z:session_ecdfs[z]},enter_bps),use_container_width=True,hide_index=True)
+
                 
                     # Combine the DataFrames into an Excel file
                     excel_file = download_combined_excel(
@@ -721,7 +763,9 @@ with tab3:
                 my_matrix.columns=[str(i)+' hr' for i in my_matrix.columns]
                 my_matrix.index=[str(i)+' bps' for i in my_matrix.index]
                 st.subheader(f"Probability Matrix of Pr(bps ({v}) >)")
-                st.dataframe(my_matrix)
+                # Matrix is stored as floats (in %); format on display only.
+                st.dataframe(my_matrix,
+                             column_config={col: st.column_config.NumberColumn(col, format="%.2f%%") for col in my_matrix.columns})
 
 
                 # Combine the DataFrames into an Excel file
@@ -883,7 +927,11 @@ with tab4:
                             # 1. Select Start time in ET
                             enter_start=st.number_input(label="Enter the start time in ET",min_value=0, max_value=23, step=1)
                             st.caption("Note: The value must be an integer and increase in steps of 1. Eg 1, 2, 3, 4, etc.")
-                            
+                            if 'm' in x:
+                                # Minute intervals: the session can start at any minute of the hour, e.g. 09:30 ET
+                                enter_start_minute=st.number_input(label="Enter the start minute",min_value=0, max_value=59, step=1)
+                                enter_start=f'{enter_start:02d}:{enter_start_minute:02d}'
+
 
                             # 2. Select number of hours to analyse post the start time
                             enter_hrs=st.number_input(label=f"Enter the time (multiple of {x}) to be searched post the selected time",min_value=0, step=1)
@@ -920,7 +968,7 @@ with tab4:
                         finalname=f'{default_text} for session:{mysession}'
 
                     # Select the dataframe for Hour interval
-                    selected_df=custom_filtering_dataframe.get_dataframe(x,y,'Intraday_data_files_pq')
+                    selected_df=custom_filtering_dataframe.get_dataframe(x,y,columns=['Open','High','Low','Close','US/Eastern Timezone'])
 
                     # Extract start and end dates
                     finalcsv=selected_df.copy()
@@ -1051,13 +1099,21 @@ with tab4:
 
 with tab5:
         
-    events = ['CPI', 'PPI', 'PCE Price Index', 'Non Farm Payrolls', 'ISM Manufacturing PMI', 'ISM Services PMI',
-              'S&P Global Manufacturing PMI', 'S&P Global Services PMI', 'Michigan',
-              'Jobless Claims' , 'ADP' , 'JOLTs' , 'Challenger Job Cuts' , 'Fed Interest Rate Decision' , 
-              'GDP Price Index QoQ Adv' , 'Retail Sales' , 'Fed Press Conference', 'FOMC Minutes']
+    events = list(event_study.major_events)
     
     selected_event = st.selectbox("Select an event:" , events)
-    duration = ['pre event (8 hr before event)' , 'immediate reaction (1 hr after the event)']
+
+    # ZN 1h: computed from the bars for any number of hours. The other instruments/intervals of returns_main are
+    # read from the event study cube (offsets of event_study.get_offsets).
+    cube_artifacts = artifact_catalog.find_artifacts(catalog , kind = 'event_study_cube')
+    instruments = ['ZN 1h']
+    if cube_artifacts:
+        instruments += [instrument for instrument in load_event_study_instruments(cube_artifacts[0]['path'] , cube_artifacts[0]['mtime']) if instrument != 'ZN 1h']
+    instrument = st.selectbox("Select instrument:" , instruments)
+    if pd.Timedelta(instrument.split(' ')[1]) >= pd.Timedelta(days = 1):
+        duration = ['pre event (1 day before event)' , 'immediate reaction (event day)']
+    else:
+        duration = ['pre event (8 hr before event)' , 'immediate reaction (1 hr after the event)']
     dur = st.selectbox("Select duration: " , duration)
 
     ############## Added by Yaman ########################################################################
@@ -1074,15 +1130,10 @@ with tab5:
     # plots_directory="Intraday_data_files_processed_folder"
     # link=f"https://raw.githubusercontent.com/krishangguptafibonacciresearch/{repo_name}/{branch}/{plots_directory}/{fname}"
 
-    # all event timestamps
-    for file in os.scandir("Intraday_data_files_processed_folder_pq"):
-        if file.name == "ZN_1h_events_tagged_target_tz.parquet":
-            all_event_ts = pd.read_parquet(file.path , engine = 'pyarrow')
-
-    # all_event_ts['US/Eastern Timezone'] = pd.to_datetime(all_event_ts.timestamp,errors='coerce',utc=True)
-    # all_event_ts['US/Eastern Timezone'] = all_event_ts['US/Eastern Timezone'].dt.tz_convert('US/Eastern')
-
-    all_event_ts['timestamp'] = pd.to_datetime(all_event_ts.timestamp , errors='coerce').dt.tz_localize('US/Eastern')
+    # all event timestamps: compiled events store (UTC) written by returns_main, else the events of the ZN 1h tagged data
+    events_artifacts = (artifact_catalog.find_artifacts(catalog , kind = 'events_store') or
+                        artifact_catalog.find_artifacts(catalog , kind = 'events_tagged' , ticker = 'ZN' , interval = '1h' , filtered_dates = False))
+    event_timeline = load_event_timeline(events_artifacts[0]['path'] , events_artifacts[0]['kind'] , events_artifacts[0]['mtime'] , tuple(events))
 
     # finding the price movements:
     repo_name = "DistributionProject"
@@ -1092,16 +1143,13 @@ with tab5:
     # GitHub API URL to list contents of the directory
     # api_url = f"https://api.github.com/repos/krishangguptafibonacciresearch/{repo_name}/contents/{plots_directory2}?ref={branch}"
 
-    # Regular expression to match file pattern. Has to be used since the file name changes.
-    pattern = re.compile(r"Intraday_data_ZN_1h_2022-12-20_to_(\d{4}-\d{2}-\d{2})\.parquet")
-    ohcl_1h = pd.DataFrame()
-
-    for file in os.scandir('Intraday_data_files_pq'):
-        if file.is_file():
-            match = pattern.match(file.name)
-            if match:
-               print("File used:" , file.name)
-               ohcl_1h = pd.read_parquet(os.path.join("Intraday_data_files_pq" , file.name) , engine = 'pyarrow')
+    # Latest raw ZN 1h parquet (the file name changes with its end date).
+    ohcl_dataset = dataset_registry.get_dataset_registry().find('ZN' , '1h' , 'raw')
+    if ohcl_dataset is not None:
+        print("File used:" , ohcl_dataset['name'])
+        window_engine = load_event_window_engine(ohcl_dataset['path'] , ohcl_dataset['mtime'])
+    else:
+        window_engine = EventWindowEngine(pd.DataFrame())
 
     # # Fetch file list from GitHub
     # response = requests.get(api_url)
@@ -1132,21 +1180,27 @@ with tab5:
     # # OHCL data for 1h freq
     # ohcl_1h = pd.read_csv(link2)
 
-    # convert US/Eastern Timezone from string data type to a [datetime , ET] datatype. (str --> UTC --> ET)
-    ohcl_1h['US/Eastern Timezone'] = pd.to_datetime(ohcl_1h.index,errors='coerce',utc=True)  #Datetime col has strings. so first convert that to UTC datetime.
-    ohcl_1h['US/Eastern Timezone'] = ohcl_1h['US/Eastern Timezone'].dt.tz_convert('US/Eastern')
-
-    my_dict = {"pre event (8 hr before event)": 1 , "immediate reaction (1 hr after the event)": 2}
+    my_dict = dict(zip(duration , [1 , 2]))
 
 
     ############################################### Changed a bit by Yaman ##########################################################################
     custom = st.checkbox('Custom time')
     if(custom):
         delta = st.number_input("Enter the number of hours:", min_value=-1000, max_value=1000 , value=0, step=1)
-        final_df = calc_event_spec_returns(selected_event, all_event_ts, ohcl_1h , 3 , events, delta, filter_isolated , 2)
+        mode = 3
     else:
-        final_df = calc_event_spec_returns(selected_event, all_event_ts, ohcl_1h , my_dict[dur], events, 0 , filter_isolated , 2)
+        delta = 0
+        mode = my_dict[dur]
 
-    plot_event_spec_returns(final_df , selected_event , dur)
+    if instrument == 'ZN 1h':
+        final_df = calc_event_spec_returns(selected_event, event_timeline, window_engine , mode , delta, filter_isolated , 2)
+    else:
+        (cube_ticker , cube_interval) = instrument.split(' ')
+        final_df = calc_event_spec_returns_from_cube(selected_event, event_timeline, cube_artifacts[0] , cube_ticker , cube_interval , mode , delta, filter_isolated , 2)
+
+    if final_df.empty:
+        st.markdown("<p style='color:red;'>No data points for these parameters.</p>", unsafe_allow_html=True)
+    else:
+        plot_event_spec_returns(final_df , selected_event , dur)
 
 ##########################################################
\ No newline at end of file
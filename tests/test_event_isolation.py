@@ -0,0 +1,58 @@
+import os
+import pandas as pd
+import pytest
+from event_isolation import EventTimeline
+from event_study import major_events
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cutoff_time = pd.Timestamp('2022-12-20 00:00:00-05:00')
+
+@pytest.fixture(scope='module')
+def calendar():
+    # Events of the ZN 1h tagged data, as tab 5 loads them when there is no events store.
+    path = os.path.join(repo_folder, 'Intraday_data_files_processed_folder_pq', 'ZN_1h_events_tagged_target_tz.parquet')
+    event_ts = pd.read_parquet(path, columns=['timestamp', 'events']).dropna()
+    event_ts['timestamp'] = event_ts['timestamp'].dt.tz_localize('US/Eastern', ambiguous='NaT', nonexistent='NaT')
+    return event_ts.dropna().reset_index(drop=True)
+
+def _old_isolated(all_event_ts, selected_event, event_list, time_gap_hours):
+    # The previous iterrows filter of calc_event_spec_returns.
+    event_list_lower = [e.strip().lower() for e in event_list]
+    def pick_event(x):
+        x_l = x.lower()
+        for e in event_list_lower:
+            if e in x_l:
+                return e
+        return None
+    event_ts = all_event_ts.copy()
+    event_ts['events'] = event_ts['events'].astype(str).apply(pick_event)
+    event_ts = event_ts.dropna(subset=['events']).drop_duplicates(subset=['timestamp', 'events'], keep='first')
+    event_ts = event_ts[event_ts['timestamp'] >= cutoff_time]
+    event_ts_filtered = event_ts.loc[event_ts['events'].str.contains(selected_event, case=False, na=False)]
+    others = [e for e in event_list_lower if e != selected_event.lower()]
+    clean_rows = []
+    for _, row in event_ts_filtered.iterrows():
+        nearby_events = event_ts[(event_ts['timestamp'] >= row['timestamp'] - pd.Timedelta(hours=time_gap_hours)) &
+                                 (event_ts['timestamp'] <= row['timestamp'] + pd.Timedelta(hours=time_gap_hours))]
+        if not nearby_events['events'].str.lower().apply(lambda x: any(e in x for e in others)).any():
+            clean_rows.append(row)
+    return pd.DataFrame(clean_rows, columns=event_ts.columns)
+
+@pytest.mark.parametrize('time_gap_hours', [2, 6])
+def test_is_isolated_matches_old_filter(calendar, time_gap_hours):
+    timeline = EventTimeline(calendar, major_events, start=cutoff_time)
+    for selected_event in major_events:
+        occurrences = timeline.occurrences(selected_event)
+        isolated = occurrences[timeline.is_isolated(occurrences, selected_event, time_gap_hours)]
+        expected = _old_isolated(calendar, selected_event, major_events, time_gap_hours)
+        pd.testing.assert_frame_equal(isolated.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_dtype=False, obj=selected_event)
+
+def test_gap_per_event_type(calendar):
+    timeline = EventTimeline(calendar, major_events, start=cutoff_time)
+    occurrences = timeline.occurrences('CPI')
+    # A dict with only a default is the same as a number of hours.
+    assert (timeline.is_isolated(occurrences, 'CPI', {'default': 2}) == timeline.is_isolated(occurrences, 'CPI', 2)).all()
+    # A wider window for one type only removes occurrences.
+    wide = timeline.is_isolated(occurrences, 'CPI', {'PPI': 48, 'default': 2})
+    assert (wide <= timeline.is_isolated(occurrences, 'CPI', 2)).all()
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from event_windows import SparseTable, EventWindowEngine
+
+def _bars(n=2000, seed=0):
+    # Hourly bars with gaps (weekends, missing hours) and a few NaN highs/lows.
+    rng = np.random.default_rng(seed)
+    times = pd.date_range('2024-01-01', periods=3 * n, freq='h', tz='UTC')
+    times = times[np.sort(rng.choice(len(times), n, replace=False))]
+    close = 110 + rng.standard_normal(n).cumsum() / 16
+    bars = pd.DataFrame({'Open': close - rng.random(n) / 32, 'High': close + rng.random(n) / 16,
+                         'Low': close - rng.random(n) / 16, 'Close': close}, index=times)
+    bars.iloc[rng.choice(n, 20, replace=False), [1, 2]] = np.nan
+    return bars
+
+def test_sparse_table_matches_nanmax():
+    rng = np.random.default_rng(1)
+    values = rng.standard_normal(1000)
+    values[rng.choice(1000, 50, replace=False)] = np.nan
+    first = rng.integers(0, 999, 3000)
+    stop = first + rng.integers(1, 1000 - first + 1)
+    with np.errstate(all='ignore'):
+        np.testing.assert_array_equal(SparseTable(values, np.fmax).query(first, stop),
+                                      [np.nanmax(values[a:b]) if np.isfinite(values[a:b]).any() else np.nan
+                                       for a, b in zip(first, stop)])
+        np.testing.assert_array_equal(SparseTable(values, np.fmin).query(first, stop),
+                                      [np.nanmin(values[a:b]) if np.isfinite(values[a:b]).any() else np.nan
+                                       for a, b in zip(first, stop)])
+
+def test_window_returns_match_loop():
+    bars = _bars()
+    rng = np.random.default_rng(2)
+    starts = bars.index[0] - pd.Timedelta(hours=5) + pd.to_timedelta(rng.integers(0, 6000, 3000), unit='h')
+    ends = starts + pd.to_timedelta(rng.integers(1, 49, 3000), unit='h')
+    result = EventWindowEngine(bars).window_returns(starts, ends, bps_factor=16)
+
+    # The previous per window loop of the dashboard.
+    rows = []
+    for start, end in zip(starts, ends):
+        window = bars[(bars.index >= start) & (bars.index < end)]
+        if window.empty:
+            rows.append([np.nan, np.nan, np.nan, pd.NaT, pd.NaT])
+            continue
+        change = (window['Close'].iloc[-1] - window['Open'].iloc[0]) * 16
+        rows.append([(window['High'].max() - window['Low'].min()) * 16, abs(change), change,
+                     window.index[0], window.index[-1]])
+    expected = pd.DataFrame(rows, columns=['Volatility Return', 'Absolute Return', 'Return', 'Start_Date', 'End_Date'])
+    expected[['Start_Date', 'End_Date']] = expected[['Start_Date', 'End_Date']].apply(pd.to_datetime, utc=True)
+    assert result['Volatility Return'].notna().sum() > 2000
+    pd.testing.assert_frame_equal(result, expected, check_exact=True)
+
+def test_window_returns_time_column():
+    bars = _bars(200).reset_index(names='US/Eastern Timezone')
+    bars['US/Eastern Timezone'] = bars['US/Eastern Timezone'].dt.tz_convert('US/Eastern')
+    bars = bars.sample(frac=1, random_state=0)   # unsorted bars
+    starts = pd.DatetimeIndex(bars['US/Eastern Timezone']).sort_values()[:50]
+    result = EventWindowEngine(bars, time_col='US/Eastern Timezone').window_returns(starts, starts + pd.Timedelta(hours=1))
+    by_time = bars.set_index('US/Eastern Timezone').loc[starts]
+    np.testing.assert_array_equal(result['Return'], (by_time['Close'] - by_time['Open']).to_numpy() * 16)
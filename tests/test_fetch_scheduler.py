@@ -0,0 +1,111 @@
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+import fetch_scheduler
+from fetch_scheduler import FetchScheduler, HttpSource
+
+
+class FlakySource:
+    # Fails the first n_failures calls with the given error, then returns one bar.
+    def __init__(self, n_failures, error):
+        self.n_failures = n_failures
+        self.error = error
+        self.calls = 0
+
+    def fetch(self, ticker, interval, start, end, timeout):
+        self.calls += 1
+        if self.calls <= self.n_failures:
+            raise self.error
+        return pd.DataFrame({'Close': [1.0]}, index=pd.DatetimeIndex(['2025-01-02'], name='Datetime'))
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(fetch_scheduler.time, 'sleep', delays.append)
+    return delays
+
+def test_retries_with_backoff(sleeps):
+    source = FlakySource(2, requests.ConnectionError('connection reset'))
+    result = FetchScheduler(source, retries=3, backoff=1.0).fetch_all([('ZN=F', '1h', None, None)])
+    assert source.calls == 3
+    assert len(result[('ZN=F', '1h', None, None)]) == 1
+    # backoff, 2*backoff, ... plus up to 10% jitter
+    assert len(sleeps) == 2
+    assert 1.0 <= sleeps[0] <= 1.1 and 2.0 <= sleeps[1] <= 2.2
+
+def test_empty_frame_after_the_last_retry(sleeps):
+    source = FlakySource(10, fetch_scheduler.EmptyResponseError('No data returned'))
+    result = FetchScheduler(source, retries=2, backoff=0.5).fetch_all([('ZN=F', '1h', None, None)])
+    assert source.calls == 3 and len(sleeps) == 2
+    assert result[('ZN=F', '1h', None, None)].empty
+
+def test_other_errors_are_not_retried(sleeps):
+    source = FlakySource(1, ValueError('Invalid interval'))
+    with pytest.raises(ValueError):
+        FetchScheduler(source, retries=3).fetch_all([('ZN=F', '7h', None, None)])
+    assert source.calls == 1 and sleeps == []
+
+
+def _download_frame():
+    # Two tickers as yf.download returns them: (Price, Ticker) columns, NaN rows where only the other one trades.
+    index = pd.date_range('2025-01-02 00:00', periods=48, freq='h', tz='UTC', name='Datetime')
+    rng = np.random.default_rng(0)
+    frames = {}
+    for ticker in ['ZN=F', 'ZB=F']:
+        close = 110 + rng.standard_normal(len(index)).cumsum() / 10
+        frames[ticker] = pd.DataFrame({'Open': close - 0.05, 'High': close + 0.1, 'Low': close - 0.1,
+                                       'Close': close, 'Volume': rng.integers(100, 1000, len(index))}, index=index)
+    frames['ZB=F'].iloc[::5] = np.nan
+    data = pd.concat(frames, axis=1, names=['Ticker', 'Price']).swaplevel(axis=1).sort_index(axis=1)
+    return data
+
+def _old_split(data):
+    # Per ticker frames of the previous Intraday.fetch_data_yfinance (one yf.download for all the tickers).
+    alltickerdata = {}
+    stackeddata = data.stack(level=0, future_stack=False)
+    stackeddata.index.names = ['Datetime', 'Price']
+    for col in stackeddata.columns:
+        col_data = stackeddata[col].unstack()
+        col_data.columns.name = None
+        alltickerdata[col] = col_data
+    return alltickerdata
+
+@pytest.fixture
+def fixture_server(tmp_path):
+    # {ticker}_{interval}.csv of every ticker, in the column order and timezone of Ticker.history.
+    data = _download_frame()
+    for ticker in ['ZN=F', 'ZB=F']:
+        rows = data.xs(ticker, axis=1, level=1).dropna(how='all')[['Open', 'High', 'Low', 'Close', 'Volume']]
+        rows.index = rows.index.tz_convert('America/New_York')
+        rows.to_csv(tmp_path / f'{ticker}_1h.csv')
+    handler = partial(SimpleHTTPRequestHandler, directory=str(tmp_path))
+    handler.log_message = lambda *args: None
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield (f'http://127.0.0.1:{server.server_port}', data)
+    server.shutdown()
+    server.server_close()
+
+def test_http_source_matches_the_old_frames(fixture_server):
+    (base_url, data) = fixture_server
+    (start, end) = ('2025-01-02', '2025-01-03')
+    old_frames = _old_split(data[(data.index >= pd.Timestamp(start, tz='UTC')) & (data.index < pd.Timestamp(end, tz='UTC'))])
+    fetch_requests = [(ticker, '1h', start, end) for ticker in ['ZN=F', 'ZB=F']]
+    result = FetchScheduler(HttpSource(base_url)).fetch_all(fetch_requests)
+    for (ticker, _, _, _) in fetch_requests:
+        frame = result[(ticker, '1h', start, end)]
+        assert frame.index.min() >= pd.Timestamp(start, tz='UTC') and frame.index.max() < pd.Timestamp(end, tz='UTC')
+        # The old frames also hold all-NaN rows at the bars of the other tickers (dropped by data_acquisition),
+        # and so a float Volume.
+        pd.testing.assert_frame_equal(frame, old_frames[ticker].dropna(how='all'), check_dtype=False, check_freq=False)
+    assert len(result[('ZN=F', '1h', start, end)]) == 24
+
+def test_http_source_missing_ticker(fixture_server, sleeps):
+    (base_url, _) = fixture_server
+    with pytest.raises(requests.HTTPError):
+        FetchScheduler(HttpSource(base_url)).fetch_all([('ZT=F', '1h', None, None)])
+    assert sleeps == []
@@ -0,0 +1,55 @@
+import os
+import shutil
+import matplotlib
+matplotlib.use('Agg')
+import pandas as pd
+import returns_main
+
+repo_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+raw_name = 'Intraday_data_ZN_1h_2022-12-20_to_2025-07-04.parquet'
+processed_names = ['ZN_1h_events_tagged_target_tz', 'ZN_1h_events_tagged_target_tz_nonevents', 'ZN_1h_session_bars']
+
+def _write_raw(df, folder):
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    df.to_parquet(os.path.join(folder, raw_name))
+
+def _run(raw, processed, events, incremental):
+    returns_main.scan_folder_and_calculate_returns((('ZN', '1h', 16),), raw, processed, 'stats', events,
+                                                   incremental=incremental)
+
+def test_incremental_run_with_revised_last_bar(tmp_path, monkeypatch):
+    # The still-forming last bar of a fetch is replaced by the next fetch (periodic_runner_main.py keeps the last
+    # duplicate): the incremental run must splice it instead of falling back to a full run.
+    # The Probability Matrix cache is not under test here.
+    monkeypatch.setattr(returns_main, 'update_prob_matrix_cache', lambda *args: None)
+    os.makedirs(tmp_path / 'processed')
+    monkeypatch.chdir(repo_folder)
+    (events, _) = returns_main._change_event_tiers(events_data_folder='Input_data',
+                                                   processed_data_folder=str(tmp_path / 'processed'),
+                                                   events_data_path="EconomicEventsSheet15-24.xlsx",
+                                                   change_tiers_bool=True)
+    bars = pd.read_parquet(os.path.join('Intraday_data_files_pq', raw_name))
+    bars = bars[(bars.index >= '2025-03-01') & (bars.index < '2025-06-01')]
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('stats')
+    first_fetch = bars[bars.index < '2025-05-20']
+    _write_raw(first_fetch, 'raw')
+    _run('raw', 'processed', events, incremental=False)
+
+    second_fetch = bars.copy()
+    second_fetch.loc[first_fetch.index[-1], 'Close'] += 0.25
+    _write_raw(second_fetch, 'raw')
+    updates = []
+    update = returns_main._update_distribution_of_returns
+    monkeypatch.setattr(returns_main, '_update_distribution_of_returns',
+                        lambda *args, **kwargs: updates.append(1) or update(*args, **kwargs))
+    _run('raw', 'processed', events, incremental=True)
+    assert len(updates) == 1
+
+    shutil.copytree('processed', 'full', ignore=shutil.ignore_patterns('*.parquet', '*.json'))
+    _run('raw', 'full', events, incremental=False)
+    for name in processed_names:
+        incremental_rows = pd.read_parquet(os.path.join('processed', f'{name}.parquet'))
+        full_rows = pd.read_parquet(os.path.join('full', f'{name}.parquet'))
+        pd.testing.assert_frame_equal(incremental_rows.reset_index(drop=True), full_rows.reset_index(drop=True))
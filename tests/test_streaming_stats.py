@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from streaming_stats import MomentsAccumulator, DistributionSummary, stats_percentiles
+
+def _returns(n, seed):
+    # Session returns in bps: multiples of the tick (16 * 1/64), skewed.
+    rng = np.random.default_rng(seed)
+    return np.round(rng.gamma(2.0, 3.0, n) * 4) / 4
+
+def test_merged_moments_match_pandas():
+    values = _returns(5000, 0)
+    splits = np.sort(np.random.default_rng(1).choice(np.arange(1, len(values)), 9, replace=False))
+    moments = MomentsAccumulator()
+    for chunk in np.split(values, splits):
+        moments.merge(MomentsAccumulator.from_values(chunk))
+    series = pd.Series(values)
+    assert moments.count == len(series)
+    np.testing.assert_allclose([moments.mean, moments.std, moments.skew, moments.kurtosis, moments.min, moments.max],
+                               [series.mean(), series.std(), series.skew(), series.kurtosis(), series.min(), series.max()],
+                               rtol=1e-12)
+
+def test_merge_with_empty_and_nans():
+    values = _returns(100, 2)
+    moments = MomentsAccumulator().merge(MomentsAccumulator.from_values(np.append(values, np.nan)))
+    moments.merge(MomentsAccumulator())
+    series = pd.Series(values)
+    np.testing.assert_allclose([moments.mean, moments.std, moments.skew, moments.kurtosis],
+                               [series.mean(), series.std(), series.skew(), series.kurtosis()], rtol=1e-12)
+
+def test_merged_summary_describe_matches_pandas():
+    (first, second) = (_returns(700, 3), _returns(1300, 4))
+    summary = DistributionSummary.from_values(first).merge(DistributionSummary.from_values(second))
+    expected = pd.Series(np.concatenate([first, second])).describe(percentiles=stats_percentiles)
+    pd.testing.assert_series_equal(summary.describe(), expected, check_names=False, rtol=1e-12)